@@ -0,0 +1,134 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, ContextManager, Dict, Optional, Tuple
+
+ConnectionFactory = Callable[[], ContextManager[Any]]
+
+
+class GenerationCache:
+    """
+    LRU cache for LLM generations, optionally backed by a SQLite table so
+    entries survive restarts.
+
+    Values must be JSON‑serializable. ``connection_factory`` is a callable
+    returning a context manager that yields a sqlite3 connection (for
+    example ``db.get_connection``); without it the cache is memory‑only.
+    The ``table`` is created by ``migrations.py``.
+    """
+
+    def __init__(
+        self,
+        connection_factory: Optional[ConnectionFactory] = None,
+        max_entries: int = 512,
+        ttl_seconds: Optional[float] = 7 * 24 * 3600,
+        table: str = "generation_cache",
+    ) -> None:
+        self._connection_factory = connection_factory
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.table = table
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(**parts: Any) -> str:
+        """Stable hash of the given keyword arguments."""
+        payload = json.dumps(parts, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._expired(entry[0], now):
+                    del self._entries[key]
+                    entry = None
+                else:
+                    self._entries.move_to_end(key)
+
+        if entry is None:
+            entry = self._load(key, now)
+            if entry is not None:
+                with self._lock:
+                    self._remember(key, entry)
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(entry[1])
+
+    def set(self, key: str, value: Any) -> None:
+        entry = (time.time(), json.dumps(value))
+        with self._lock:
+            self._remember(key, entry)
+        self._store(key, entry)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self._connection_factory is not None:
+            with self._connection_factory() as conn:
+                conn.execute(f"DELETE FROM {self.table}")
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+            }
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, entry: Tuple[float, str]) -> None:
+        # Caller must hold self._lock.
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, key: str, now: float) -> Optional[Tuple[float, str]]:
+        if self._connection_factory is None:
+            return None
+        with self._connection_factory() as conn:
+            row = conn.execute(
+                f"SELECT created_at, value FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self._expired(row[0], now):
+                conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                return None
+        return row[0], row[1]
+
+    def _store(self, key: str, entry: Tuple[float, str]) -> None:
+        if self._connection_factory is None:
+            return
+        with self._connection_factory() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, created_at) "
+                "VALUES (?, ?, ?)",
+                (key, entry[1], entry[0]),
+            )
+            # Keep the persisted table within the same size cap, dropping
+            # the oldest rows first.
+            conn.execute(
+                f"""
+                DELETE FROM {self.table} WHERE key IN (
+                    SELECT key FROM {self.table}
+                    ORDER BY created_at DESC
+                    LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
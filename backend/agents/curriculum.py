@@ -1,28 +1,35 @@
+import asyncio
 import json
 import os
-from io import BytesIO
-from typing import Dict, List, Optional
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import zip_longest
+from typing import Any, Dict, List, Optional, Tuple
 
-try:
-    # Preferred PDF reader
-    from PyPDF2 import PdfReader  # type: ignore
-except ImportError:  # pragma: no cover - optional dependency
-    PdfReader = None  # type: ignore
+from .cache import GenerationCache
+from .documents import CurriculumStore, sha256_hex
+from .llm import LLM_TIMEOUT_SECONDS, ainvoke_text, create_chat_model, invoke_text
+from .passages import PassageIndex, estimate_tokens, split_sections
+from .pdf_text import PdfSource, iter_page_text
+from .singleflight import SingleFlight
 
 try:
-    # Preferred with modern LangChain
-    from langchain_openai import ChatOpenAI  # type: ignore
+    from ..metrics import LLM_FALLBACKS, PDF_EXTRACT_SECONDS  # type: ignore
 except ImportError:
-    try:
-        # Fallback for older LangChain versions
-        from langchain.chat_models import ChatOpenAI  # type: ignore
-    except Exception:  # pragma: no cover - very defensive
-        ChatOpenAI = None  # type: ignore
+    from metrics import LLM_FALLBACKS, PDF_EXTRACT_SECONDS  # type: ignore
 
-try:
-    from dotenv import load_dotenv  # type: ignore
-except ImportError:  # pragma: no cover - optional dependency
-    load_dotenv = None  # type: ignore
+# Sections of one document summarized at the same time (the process-wide
+# LLM limit in agents.llm still applies on top).
+CURRICULUM_MAP_CONCURRENCY = int(os.getenv("CURRICULUM_MAP_CONCURRENCY", "4"))
+# Most topics / learning objectives in a result.
+MAX_ITEMS = 8
+
+_JSON_INSTRUCTIONS = (
+    "Return JSON ONLY with this exact structure:\n"
+    '{\"topics\": [\"...\"], \"learningObjectives\": [\"...\"]}\n'
+    "- Do not include any explanation or text outside the JSON.\n"
+    "- Keep each string short (max ~120 characters)."
+)
 
 
 class CurriculumAgent:
@@ -31,28 +38,37 @@ class CurriculumAgent:
     (topics and learning objectives) from an uploaded PDF.
     """
 
-    def __init__(self) -> None:
-        # Best‑effort .env loading (optional)
-        if load_dotenv is not None:
-            load_dotenv()
+    model_name = "gpt-4o-mini"
+    temperature = 0.1
+    # Estimated tokens per section summarized in one LLM call; documents
+    # longer than max_sections sections get proportionally larger ones.
+    section_tokens = 3000
+    max_sections = 24
 
-        api_key = os.getenv("OPENAI_API_KEY")
-        self._llm = None
-
-        # Initialize an OpenAI chat model if dependencies and key are available.
-        if ChatOpenAI is not None and api_key:
-            try:
-                # Newer langchain‑openai signature
-                self._llm = ChatOpenAI(model="gpt-4o-mini", temperature=0.1)
-            except TypeError:
-                # Older langchain signature
-                self._llm = ChatOpenAI(model_name="gpt-4o-mini", temperature=0.1)
+    def __init__(
+        self,
+        store: Optional[CurriculumStore] = None,
+        passages: Optional[PassageIndex] = None,
+        section_cache: Optional[GenerationCache] = None,
+        map_concurrency: int = CURRICULUM_MAP_CONCURRENCY,
+    ) -> None:
+        self._store = store
+        self._passages = passages
+        self._section_cache = section_cache
+        self.map_concurrency = max(1, map_concurrency)
+        self._flights = SingleFlight("curriculum")
+        # OpenAI chat model, if dependencies and key are available.
+        self._llm = create_chat_model(self.model_name, self.temperature)
 
     def extract_curriculum(
-        self, pdf_bytes: bytes, filename: Optional[str] = None
+        self,
+        pdf: PdfSource,
+        filename: Optional[str] = None,
+        digest: Optional[str] = None,
     ) -> Dict[str, List[str]]:
         """
-        Given raw PDF bytes, return a dictionary:
+        Given a PDF (raw bytes or a seekable binary file, which is parsed
+        in place rather than copied into memory), return a dictionary:
         {
             "topics": [str, ...],
             "learningObjectives": [str, ...]
@@ -60,39 +76,331 @@ class CurriculumAgent:
 
         Uses the LLM (and PDF text when available) with a safe fallback
         to static mock values if anything fails.
+
+        The whole document is read, map-reduce style: a document longer
+        than one section is split into sections (``split_sections``) that
+        are summarized ``map_concurrency`` at a time, then the section
+        summaries are merged, by a final LLM call when they hold more than
+        ``MAX_ITEMS`` topics or objectives. With a ``section_cache``, section
+        summaries are cached by the section's text, so re-uploading an
+        edited PDF only summarizes the sections that changed.
+
+        When a store is configured, results are keyed by the SHA‑256 of the
+        PDF (``digest``, computed if not given): a previously seen PDF is
+        answered from the store without parsing it or calling the LLM.
+        With a passage index, the text is also split into passages that
+        quiz generation can retrieve later.
         """
-        text = self._extract_text(pdf_bytes)
+        digest, text, stored = self._prepare(pdf, filename, digest)
+        if stored is not None:
+            return stored
 
         if self._llm is not None and text.strip():
             try:
-                # Truncate to keep prompts small while remaining useful
-                truncated = text[:6000]
-                name_part = f" titled '{filename}'" if filename else ""
-                prompt = (
-                    "You are an assistant that reads a school curriculum PDF "
-                    "and summarizes its structure.\n\n"
-                    f"PDF{name_part} contents (possibly truncated):\n"
-                    "----------------\n"
-                    f"{truncated}\n"
-                    "----------------\n\n"
-                    "From this, identify:\n"
-                    "1. 4‑8 high‑level topics (short phrases).\n"
-                    "2. 4‑8 concise learning objectives (student‑friendly).\n\n"
-                    "Return JSON ONLY with this exact structure:\n"
-                    '{\"topics\": [\"...\"], \"learningObjectives\": [\"...\"]}\n'
-                    "- Do not include any explanation or text outside the JSON.\n"
-                    "- Keep each string short (max ~120 characters)."
-                )
-                response = self._llm.invoke(prompt)  # type: ignore[arg-type]
-                content = getattr(response, "content", str(response))
-                parsed = self._parse_llm_output(content)
+                parsed, complete = self._summarize(text, filename)
                 if parsed:
+                    if complete:
+                        self._save_curriculum(digest, parsed)
                     return parsed
             except Exception:
                 # Fall back to deterministic mocks if anything goes wrong
                 pass
 
-        # Fallback: simple static curriculum so the UI keeps working.
+        return self._fallback_curriculum()
+
+    async def aextract_curriculum(
+        self,
+        pdf: PdfSource,
+        filename: Optional[str] = None,
+        digest: Optional[str] = None,
+        timeout: Optional[float] = None,
+    ) -> Dict[str, List[str]]:
+        """
+        Async variant of ``extract_curriculum``. PDF parsing is offloaded to
+        a worker thread and the LLM calls go through ``agents.llm`` so the
+        event loop stays responsive. ``timeout`` bounds the whole
+        extraction: sections not summarized by then are left out of the
+        result (which is then not stored), and with none the fallback is
+        returned.
+
+        Calls for a ``digest`` that is already being extracted wait for that
+        extraction instead of parsing the PDF again, so duplicate uploads
+        made at the same time cost one LLM call.
+        """
+        if digest is None:
+            return await self._aextract(pdf, filename, digest, timeout)
+        return await self._flights.run(
+            digest, lambda: self._aextract(pdf, filename, digest, timeout)
+        )
+
+    async def _aextract(
+        self,
+        pdf: PdfSource,
+        filename: Optional[str],
+        digest: Optional[str],
+        timeout: Optional[float],
+    ) -> Dict[str, List[str]]:
+        digest, text, stored = await asyncio.to_thread(
+            self._prepare, pdf, filename, digest
+        )
+        if stored is not None:
+            return stored
+
+        if self._llm is not None and text.strip():
+            try:
+                parsed, complete = await self._asummarize(text, filename, timeout)
+                if parsed:
+                    if complete:
+                        await asyncio.to_thread(self._save_curriculum, digest, parsed)
+                    return parsed
+            except Exception:
+                # Includes asyncio.TimeoutError and CircuitOpenError (logged by
+                # the gateway); fall back to mocks
+                pass
+
+        return self._fallback_curriculum()
+
+    def _prepare(
+        self, pdf: PdfSource, filename: Optional[str], digest: Optional[str]
+    ) -> Tuple[Optional[str], str, Optional[Dict[str, List[str]]]]:
+        """
+        Return ``(digest, text, stored_curriculum)``, reading the text from
+        the store when this PDF has been seen before and parsing (then
+        storing) it otherwise.
+        """
+        if self._store is None:
+            return digest, self._extract_text(pdf), None
+
+        if digest is None:
+            digest = sha256_hex(pdf)
+
+        document: Optional[Dict[str, Any]] = None
+        try:
+            document = self._store.get(digest)
+        except Exception:
+            # A broken store must never break extraction
+            pass
+        if document is not None:
+            # Documents stored before passages existed are indexed now
+            self._index_passages(digest, document["text"], only_missing=True)
+            return digest, document["text"], document["curriculum"]
+
+        text = self._extract_text(pdf)
+        if text.strip():
+            try:
+                self._store.put_text(digest, text, filename)
+            except Exception:
+                pass
+            self._index_passages(digest, text)
+        return digest, text, None
+
+    def _index_passages(self, digest: str, text: str, only_missing: bool = False) -> None:
+        if self._passages is None or not text.strip():
+            return
+        try:
+            if only_missing and self._passages.has(digest):
+                return
+            self._passages.index_text(digest, text)
+        except Exception:
+            pass
+
+    def _save_curriculum(
+        self, digest: Optional[str], curriculum: Dict[str, List[str]]
+    ) -> None:
+        if self._store is None or digest is None:
+            return
+        try:
+            self._store.put_curriculum(digest, curriculum)
+        except Exception:
+            pass
+
+    def _sections(self, text: str) -> List[str]:
+        target = self.section_tokens
+        # Doubling (rather than dividing exactly) keeps section boundaries,
+        # and so cached summaries, stable when an edit changes the length
+        while estimate_tokens(text) > target * self.max_sections:
+            target *= 2
+        return split_sections(text, target)
+
+    def _summarize(
+        self, text: str, filename: Optional[str]
+    ) -> Tuple[Optional[Dict[str, List[str]]], bool]:
+        """
+        Return ``(curriculum, complete)`` for the document ``text``;
+        ``complete`` is False when some sections could not be summarized.
+        """
+        deadline = time.monotonic() + LLM_TIMEOUT_SECONDS
+        sections = self._sections(text)
+        if len(sections) == 1:
+            content = invoke_text(self._llm, self._build_prompt(text, filename))
+            return self._parse_llm_output(content), True
+
+        def summarize(section: str) -> Optional[Dict[str, List[str]]]:
+            key = self._section_key(section)
+            summary = self._section_cache_get(key)
+            if summary is None:
+                try:
+                    prompt = self._build_section_prompt(section)
+                    content = invoke_text(self._llm, prompt, deadline - time.monotonic())
+                except Exception:
+                    return None
+                summary = self._parse_llm_output(content)
+                if summary:
+                    self._section_cache_set(key, summary)
+            return summary
+
+        with ThreadPoolExecutor(self.map_concurrency) as pool:
+            summaries = list(pool.map(summarize, sections))
+        merged, prompt = self._merge(summaries, filename)
+        if prompt is not None:
+            try:
+                reduced = invoke_text(self._llm, prompt, deadline - time.monotonic())
+                merged = self._parse_llm_output(reduced) or merged
+            except Exception:
+                pass
+        return merged, merged is not None and None not in summaries
+
+    async def _asummarize(
+        self, text: str, filename: Optional[str], timeout: Optional[float]
+    ) -> Tuple[Optional[Dict[str, List[str]]], bool]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (LLM_TIMEOUT_SECONDS if timeout is None else timeout)
+        sections = self._sections(text)
+        if len(sections) == 1:
+            prompt = self._build_prompt(text, filename)
+            content = await ainvoke_text(self._llm, prompt, timeout=deadline - loop.time())
+            return self._parse_llm_output(content), True
+
+        semaphore = asyncio.Semaphore(self.map_concurrency)
+
+        async def summarize(section: str) -> Optional[Dict[str, List[str]]]:
+            key = self._section_key(section)
+            summary = await asyncio.to_thread(self._section_cache_get, key)
+            if summary is not None:
+                return summary
+            async with semaphore:
+                try:
+                    content = await ainvoke_text(
+                        self._llm,
+                        self._build_section_prompt(section),
+                        timeout=deadline - loop.time(),
+                    )
+                except Exception:
+                    # Includes timeouts; the other sections still count
+                    return None
+            summary = self._parse_llm_output(content)
+            if summary:
+                await asyncio.to_thread(self._section_cache_set, key, summary)
+            return summary
+
+        summaries = await asyncio.gather(*(summarize(section) for section in sections))
+        merged, prompt = self._merge(summaries, filename)
+        if prompt is not None:
+            try:
+                reduced = await ainvoke_text(self._llm, prompt, timeout=deadline - loop.time())
+                merged = self._parse_llm_output(reduced) or merged
+            except Exception:
+                pass
+        return merged, merged is not None and None not in summaries
+
+    def _merge(
+        self, summaries: List[Optional[Dict[str, List[str]]]], filename: Optional[str]
+    ) -> Tuple[Optional[Dict[str, List[str]]], Optional[str]]:
+        """
+        Combine section summaries, in document order, into
+        ``(curriculum, reduce_prompt)``. When they hold more than
+        ``MAX_ITEMS`` distinct topics or objectives, ``curriculum`` takes
+        items from each section in turn (so every part is represented) and
+        ``reduce_prompt`` asks the LLM for a better consolidation;
+        otherwise ``reduce_prompt`` is None.
+        """
+        done = [summary for summary in summaries if summary]
+        if not done:
+            return None, None
+        topics = _interleave([summary["topics"] for summary in done])
+        objectives = _interleave([summary["learningObjectives"] for summary in done])
+        merged = {"topics": topics[:MAX_ITEMS], "learningObjectives": objectives[:MAX_ITEMS]}
+        if len(topics) <= MAX_ITEMS and len(objectives) <= MAX_ITEMS:
+            return merged, None
+        return merged, self._build_reduce_prompt(done, filename)
+
+    def _section_key(self, section: str) -> str:
+        return GenerationCache.make_key(
+            kind="curriculum-section",
+            model=self.model_name,
+            section=sha256_hex(section.encode("utf-8")),
+        )
+
+    def _section_cache_get(self, key: str) -> Optional[Dict[str, List[str]]]:
+        if self._section_cache is None:
+            return None
+        try:
+            return self._section_cache.get(key)
+        except Exception:
+            return None
+
+    def _section_cache_set(self, key: str, summary: Dict[str, List[str]]) -> None:
+        if self._section_cache is None:
+            return
+        try:
+            self._section_cache.set(key, summary)
+        except Exception:
+            pass
+
+    def _build_prompt(self, text: str, filename: Optional[str]) -> str:
+        name_part = f" titled '{filename}'" if filename else ""
+        return (
+            "You are an assistant that reads a school curriculum PDF "
+            "and summarizes its structure.\n\n"
+            f"PDF{name_part} contents:\n"
+            "----------------\n"
+            f"{text}\n"
+            "----------------\n\n"
+            "From this, identify:\n"
+            "1. 4‑8 high‑level topics (short phrases).\n"
+            "2. 4‑8 concise learning objectives (student‑friendly).\n\n"
+            f"{_JSON_INSTRUCTIONS}"
+        )
+
+    def _build_section_prompt(self, section: str) -> str:
+        # Depends on the section text only, so its summary can be reused
+        # wherever the same text appears
+        return (
+            "You are an assistant that reads a school curriculum PDF "
+            "and summarizes its structure.\n\n"
+            "This is one section of a longer curriculum document:\n"
+            "----------------\n"
+            f"{section}\n"
+            "----------------\n\n"
+            "From this section, identify:\n"
+            "1. 2‑6 high‑level topics (short phrases).\n"
+            "2. 2‑6 concise learning objectives (student‑friendly).\n\n"
+            f"{_JSON_INSTRUCTIONS}"
+        )
+
+    def _build_reduce_prompt(self, summaries: List[Dict[str, List[str]]], filename: Optional[str]) -> str:
+        name_part = f" titled '{filename}'" if filename else ""
+        parts = "\n\n".join(
+            f"Section {number}\n"
+            f"Topics: {'; '.join(summary['topics'])}\n"
+            f"Objectives: {'; '.join(summary['learningObjectives'])}"
+            for number, summary in enumerate(summaries, 1)
+        )
+        return (
+            "You are an assistant that summarizes the structure of a school "
+            f"curriculum PDF{name_part}.\n\n"
+            "Each section of the document was summarized separately; in "
+            "document order:\n\n"
+            f"{parts}\n\n"
+            "Combine these into:\n"
+            "1. 4‑8 high‑level topics covering the whole document, in course order.\n"
+            "2. 4‑8 concise learning objectives (student‑friendly).\n\n"
+            f"{_JSON_INSTRUCTIONS}"
+        )
+
+    def _fallback_curriculum(self) -> Dict[str, List[str]]:
+        # Simple static curriculum so the UI keeps working.
+        LLM_FALLBACKS.inc("curriculum")
         return {
             "topics": [
                 "Algebra",
@@ -110,26 +418,21 @@ class CurriculumAgent:
             ],
         }
 
-    def _extract_text(self, pdf_bytes: bytes) -> str:
+    def _extract_text(self, pdf: PdfSource) -> str:
         """
         Extract raw text from the PDF using PyPDF2 when available.
         Returns an empty string on failure.
         """
-        if not pdf_bytes or PdfReader is None:
+        if isinstance(pdf, (bytes, bytearray)) and not pdf:
             return ""
 
         try:
-            reader = PdfReader(BytesIO(pdf_bytes))
-            chunks: List[str] = []
-            # Limit to first few pages for speed and token safety
-            for page in reader.pages[:5]:
-                try:
-                    page_text = page.extract_text() or ""
-                except Exception:
-                    page_text = ""
-                if page_text:
-                    chunks.append(page_text)
-            return "\n\n".join(chunks)
+            # Whole document, parsed in worker processes for long PDFs and
+            # bounded by the page cap and time budget in agents.pdf_text.
+            with PDF_EXTRACT_SECONDS.time():
+                return "\n\n".join(
+                    page_text for _, page_text in iter_page_text(pdf) if page_text
+                )
         except Exception:
             return ""
 
@@ -168,3 +471,14 @@ class CurriculumAgent:
             "learningObjectives": objectives,
         }
 
+
+def _interleave(lists: List[List[str]]) -> List[str]:
+    # Items from each list in turn, without case-insensitive duplicates
+    items: List[str] = []
+    seen = set()
+    for row in zip_longest(*lists):
+        for item in row:
+            if item is not None and item.lower() not in seen:
+                seen.add(item.lower())
+                items.append(item)
+    return items
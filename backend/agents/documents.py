@@ -0,0 +1,99 @@
+import hashlib
+import json
+import time
+from typing import Any, BinaryIO, Dict, List, Optional, Union
+
+from .cache import ConnectionFactory
+
+
+def sha256_hex(data: Union[bytes, BinaryIO], chunk_size: int = 1024 * 1024) -> str:
+    """SHA‑256 of raw bytes, or of a seekable file read in chunks."""
+    if isinstance(data, (bytes, bytearray)):
+        return hashlib.sha256(data).hexdigest()
+    digest = hashlib.sha256()
+    data.seek(0)
+    for chunk in iter(lambda: data.read(chunk_size), b""):
+        digest.update(chunk)
+    data.seek(0)
+    return digest.hexdigest()
+
+
+class CurriculumStore:
+    """
+    Content‑addressed store for uploaded curriculum PDFs.
+
+    Rows are keyed by the SHA‑256 of the PDF bytes and hold the extracted
+    text and, once the LLM has produced one, the parsed curriculum
+    (topics and learning objectives). Repeat uploads of the same file can
+    then skip both PDF parsing and the LLM call, and later features can
+    reuse the stored text. The ``table`` is created by ``migrations.py``.
+    """
+
+    def __init__(
+        self,
+        connection_factory: ConnectionFactory,
+        table: str = "curriculum_documents",
+    ) -> None:
+        self._connection_factory = connection_factory
+        self.table = table
+
+    def get(self, digest: str) -> Optional[Dict[str, Any]]:
+        """
+        Return ``{"digest", "filename", "text", "curriculum"}`` for a stored
+        document, where ``curriculum`` is None until a result is saved.
+        """
+        with self._connection_factory() as conn:
+            row = conn.execute(
+                f"SELECT digest, filename, text, curriculum FROM {self.table} "
+                "WHERE digest = ?",
+                (digest,),
+            ).fetchone()
+        return self._row_to_dict(row)
+
+    def get_text(self, digest: str) -> Optional[str]:
+        document = self.get(digest)
+        return document["text"] if document else None
+
+    def find_by_filename(self, filename: str) -> Optional[Dict[str, Any]]:
+        """Most recently stored document uploaded under ``filename``."""
+        with self._connection_factory() as conn:
+            row = conn.execute(
+                f"SELECT digest, filename, text, curriculum FROM {self.table} "
+                "WHERE filename = ? ORDER BY updated_at DESC LIMIT 1",
+                (filename,),
+            ).fetchone()
+        return self._row_to_dict(row)
+
+    def put_text(self, digest: str, text: str, filename: Optional[str] = None) -> None:
+        now = time.time()
+        with self._connection_factory() as conn:
+            conn.execute(
+                f"""
+                INSERT INTO {self.table} (digest, filename, text, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(digest) DO UPDATE SET
+                    text = excluded.text,
+                    filename = COALESCE(excluded.filename, filename),
+                    updated_at = excluded.updated_at
+                """,
+                (digest, filename, text, now, now),
+            )
+
+    def put_curriculum(self, digest: str, curriculum: Dict[str, List[str]]) -> None:
+        with self._connection_factory() as conn:
+            conn.execute(
+                f"UPDATE {self.table} SET curriculum = ?, updated_at = ? "
+                "WHERE digest = ?",
+                (json.dumps(curriculum), time.time(), digest),
+            )
+
+    def _row_to_dict(self, row: Any) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        digest, filename, text, curriculum = row
+        return {
+            "digest": digest,
+            "filename": filename,
+            "text": text or "",
+            "curriculum": json.loads(curriculum) if curriculum else None,
+        }
@@ -0,0 +1,175 @@
+import json
+from typing import Any, List, Optional
+
+
+class JsonArrayStream:
+    """
+    Incremental parser for a JSON array arriving in arbitrary text chunks.
+
+    ``feed`` returns the top-level array elements completed by the new
+    text, so callers can act on each element before the array is closed.
+    Where the array starts depends on the text before it:
+
+    - output starting with ``[`` is the array itself;
+    - output starting with ``{`` is a wrapper object, and the array is the
+      value of its first member that holds one (``{"quiz": "Unit [1]",
+      "questions": [...]}``);
+    - anything else (prose, markdown fences) is skipped up to the first
+      ``[`` that opens an array of objects, so bracketed text such as
+      "Here are [5] questions" is not mistaken for it.
+
+    String and escape state is tracked from the first character, so a
+    ``[`` inside a string never starts the array. Each character is
+    scanned once; only the text of a completed element is handed to
+    ``json.loads``.
+    """
+
+    def __init__(self) -> None:
+        self._buffer = ""
+        self._pos = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._element_start = -1
+        # Before the array starts: "object" or "text" once the first
+        # non-blank character is seen, the wrapper object's nesting, and
+        # whether a wrapper member's value or a "[" in text is pending.
+        self._mode: Optional[str] = None
+        self._outer_depth = 0
+        self._expect_value = False
+        self._bracket = False
+        self.closed = False
+
+    def feed(self, chunk: str) -> List[Any]:
+        if self.closed:
+            return []
+        self._buffer += chunk
+        elements: List[Any] = []
+        buffer = self._buffer
+        pos = self._pos
+
+        if not self._started:
+            pos = self._find_start(buffer, pos)
+            if not self._started:
+                # Nothing before the array is needed again
+                self._buffer = ""
+                self._pos = 0
+                return elements
+            self._in_string = False
+            self._escape = False
+
+        while pos < len(buffer):
+            char = buffer[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    self._element_start = pos
+            elif char in "[{":
+                if self._depth == 1:
+                    self._element_start = pos
+                self._depth += 1
+            elif char in "]}":
+                self._depth -= 1
+                if self._depth == 1:
+                    elements.extend(self._take(buffer, pos + 1))
+                elif self._depth == 0:
+                    # Closing bracket of the array itself
+                    elements.extend(self._take(buffer, pos))
+                    self.closed = True
+                    break
+            elif char == "," and self._depth == 1:
+                elements.extend(self._take(buffer, pos))
+            elif self._depth == 1 and not char.isspace() and self._element_start < 0:
+                # Bare scalar (number, true, false, null)
+                self._element_start = pos
+            pos += 1
+
+        # Drop text that is fully consumed so the buffer stays small
+        keep = self._element_start if self._element_start >= 0 else pos
+        self._buffer = buffer[keep:]
+        self._pos = pos - keep
+        if self._element_start >= 0:
+            self._element_start = 0
+        return elements
+
+    def _find_start(self, buffer: str, pos: int) -> int:
+        """
+        Scan the text before the array. Returns the position of the first
+        array element once the array has started (``_started`` is set),
+        else the end of ``buffer``.
+        """
+        while pos < len(buffer):
+            char = buffer[pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                pos += 1
+                continue
+            if char.isspace():
+                pos += 1
+                continue
+
+            if self._mode is None:
+                if char == "[":
+                    return self._start(pos + 1)
+                self._mode = "object" if char == "{" else "text"
+
+            if self._mode == "object":
+                if self._expect_value:
+                    self._expect_value = False
+                    if char == "[" and self._outer_depth == 1:
+                        return self._start(pos + 1)
+                if char == '"':
+                    self._in_string = True
+                elif char in "[{":
+                    self._outer_depth += 1
+                elif char in "]}":
+                    self._outer_depth -= 1
+                    if self._outer_depth == 0:
+                        # The wrapper closed without holding an array
+                        self.closed = True
+                        return len(buffer)
+                elif char == ":" and self._outer_depth == 1:
+                    self._expect_value = True
+            else:
+                if self._bracket:
+                    self._bracket = False
+                    if char == "{":
+                        # The "[" before this was the array's
+                        return self._start(pos)
+                if char == '"':
+                    self._in_string = True
+                elif char == "[":
+                    self._bracket = True
+            pos += 1
+        return pos
+
+    def _start(self, pos: int) -> int:
+        self._started = True
+        self._depth = 1
+        return pos
+
+    def _take(self, buffer: str, end: int) -> List[Any]:
+        start, self._element_start = self._element_start, -1
+        if start < 0:
+            return []
+        text = buffer[start:end].strip()
+        if not text:
+            return []
+        try:
+            return [json.loads(text)]
+        except json.JSONDecodeError:
+            # Malformed element: skip it, keep parsing the rest
+            return []
@@ -0,0 +1,540 @@
+"""
+The shared gateway every agent uses to reach the LLM provider.
+
+``LLMGateway`` owns what should exist once per process rather than once per
+agent: the ``.env`` loading, the pooled HTTP connections to the provider,
+the concurrency limit, and a circuit breaker. Each call gets a hard
+deadline (``timeout``, default ``LLM_TIMEOUT_SECONDS``) that covers its
+retries: transient failures (timeouts, connection errors, 429 and 5xx
+responses) are retried up to ``LLM_MAX_RETRIES`` times with full-jitter
+exponential backoff while the deadline allows. After
+``LLM_CIRCUIT_FAILURES`` failed attempts in a row the breaker opens and
+calls raise ``CircuitOpenError`` at once, so the agents answer with their
+fallback immediately instead of after a timeout, until a probe call gets
+through ``LLM_CIRCUIT_RESET_SECONDS`` later.
+
+The agents use the module-level ``create_chat_model`` / ``invoke_text`` /
+``ainvoke_text`` / ``astream_text``, which go through ``get_gateway()``.
+Set ``OPENAI_BASE_URL`` to point the client at another endpoint, such as
+``benchmarks/llm_stub.py``.
+"""
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+try:
+    from ..metrics import (  # type: ignore
+        LLM_CIRCUIT_OPENED,
+        LLM_CIRCUIT_REJECTED,
+        LLM_REQUEST_SECONDS,
+        LLM_RETRIES,
+        LLM_TOKENS,
+    )
+except ImportError:
+    from metrics import (  # type: ignore
+        LLM_CIRCUIT_OPENED,
+        LLM_CIRCUIT_REJECTED,
+        LLM_REQUEST_SECONDS,
+        LLM_RETRIES,
+        LLM_TOKENS,
+    )
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of LLM calls in flight per process (also the size of the
+# connection pool), and the per-call deadline (seconds), retries included.
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_CONNECT_TIMEOUT_SECONDS = 5.0
+# Retries after the first attempt, and the backoff before retry n: a
+# random delay up to min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2**n).
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "8"))
+# Consecutive failed attempts that open the circuit, and how long it stays
+# open before a probe call is let through.
+LLM_CIRCUIT_FAILURES = int(os.getenv("LLM_CIRCUIT_FAILURES", "5"))
+LLM_CIRCUIT_RESET_SECONDS = float(os.getenv("LLM_CIRCUIT_RESET_SECONDS", "30"))
+
+RETRYABLE_STATUS = frozenset({408, 409, 429})
+# Exception classes (matched by name, so neither openai nor httpx has to be
+# importable) raised when the provider could not be reached or timed out.
+TRANSIENT_ERRORS = frozenset({"APIConnectionError", "APITimeoutError", "TransportError"})
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling the provider while the circuit is open."""
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether ``exc`` says the provider is down or overloaded, so a retry may succeed."""
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None)
+    if isinstance(status, int):
+        return status in RETRYABLE_STATUS or status >= 500
+    return any(cls.__name__ in TRANSIENT_ERRORS for cls in type(exc).__mro__)
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    Closed, every call is allowed. ``failure_threshold`` transient failures
+    in a row open it: calls are refused for ``reset_seconds``, after which
+    it is half-open and lets a single probe call through. The probe's
+    success closes the circuit; its failure opens it again.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = LLM_CIRCUIT_FAILURES,
+        reset_seconds: float = LLM_CIRCUIT_RESET_SECONDS,
+    ) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at < self.reset_seconds:
+                return "open"
+            return "half_open"
+
+    def rejecting(self) -> bool:
+        """Whether a call made now would be refused, without claiming the probe."""
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            return self._probing or time.monotonic() - self._opened_at < self.reset_seconds
+
+    def allow(self) -> bool:
+        """Whether to make a call now; when half-open, the caller becomes the probe."""
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.reset_seconds:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("LLM circuit closed")
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if not self._probing and (
+                self._opened_at is not None or self._failures < self.failure_threshold
+            ):
+                return
+            self._opened_at = time.monotonic()
+            self._probing = False
+        LLM_CIRCUIT_OPENED.inc()
+        logger.warning(
+            "LLM circuit opened after %d consecutive failures; failing fast for %.0fs",
+            self._failures,
+            self.reset_seconds,
+        )
+
+    def release(self) -> None:
+        """Give up the probe without a verdict (the call was cancelled)."""
+        with self._lock:
+            self._probing = False
+
+
+def record_usage(message: Any) -> None:
+    """
+    Add the token counts reported on a LangChain message (or stream
+    chunk) to ``llm_tokens_total``. Messages without usage are skipped.
+    """
+    usage = getattr(message, "usage_metadata", None)
+    if usage:
+        prompt, completion = usage.get("input_tokens"), usage.get("output_tokens")
+    else:
+        metadata = getattr(message, "response_metadata", None) or {}
+        usage = metadata.get("token_usage") if isinstance(metadata, dict) else None
+        if not usage:
+            return
+        prompt, completion = usage.get("prompt_tokens"), usage.get("completion_tokens")
+    if prompt:
+        LLM_TOKENS.inc("prompt", amount=prompt)
+    if completion:
+        LLM_TOKENS.inc("completion", amount=completion)
+
+
+def _outcome(exc: Optional[BaseException]) -> str:
+    if exc is None or isinstance(exc, GeneratorExit):
+        # A stream closed early by its consumer still succeeded
+        return "ok"
+    if isinstance(exc, asyncio.TimeoutError):
+        return "timeout"
+    if isinstance(exc, asyncio.CancelledError):
+        return "cancelled"
+    return "error"
+
+
+class LLMGateway:
+    """
+    Process-wide access to the LLM provider; see the module docstring.
+
+    The async HTTP connection pool is tied to the event loop that first
+    uses it, which is the server's loop in production.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = LLM_MAX_CONCURRENCY,
+        max_retries: int = LLM_MAX_RETRIES,
+        retry_base: float = LLM_RETRY_BASE_SECONDS,
+        retry_max: float = LLM_RETRY_MAX_SECONDS,
+        breaker: Optional[CircuitBreaker] = None,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.breaker = breaker if breaker is not None else CircuitBreaker()
+        self._models: Dict[Tuple[str, float], Any] = {}
+        self._http_clients: Optional[Tuple[Any, Any]] = None
+        self._env_loaded = False
+        self._lock = threading.Lock()
+        self._semaphores: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    # -- clients -----------------------------------------------------------
+
+    def chat_model(self, model_name: str, temperature: float) -> Optional[Any]:
+        """
+        The shared LangChain ``ChatOpenAI`` client for ``model_name`` at
+        ``temperature``, or None when LangChain or ``OPENAI_API_KEY`` is
+        unavailable. Its own retries are disabled: the gateway retries.
+
+        LangChain takes over a second to import, so it is imported here, on
+        first use, rather than when the agents module is loaded.
+        """
+        with self._lock:
+            self._load_env()
+            if not os.getenv("OPENAI_API_KEY"):
+                return None
+            key = (model_name, temperature)
+            if key not in self._models:
+                self._models[key] = self._build_chat_model(model_name, temperature)
+            return self._models[key]
+
+    def _load_env(self) -> None:
+        if self._env_loaded:
+            return
+        self._env_loaded = True
+        try:
+            from dotenv import load_dotenv  # type: ignore
+        except ImportError:  # pragma: no cover - optional dependency
+            return
+        # Best‑effort .env loading (optional)
+        load_dotenv()
+
+    def _build_chat_model(self, model_name: str, temperature: float) -> Optional[Any]:
+        try:
+            # Preferred with modern LangChain
+            from langchain_openai import ChatOpenAI  # type: ignore
+        except ImportError:
+            try:
+                # Fallback for older LangChain versions
+                from langchain.chat_models import ChatOpenAI  # type: ignore
+            except Exception:  # pragma: no cover - very defensive
+                return None
+
+        try:
+            import httpx
+
+            http_client, http_async_client = self._pooled_clients(httpx)
+            # Newer langchain‑openai signature
+            return ChatOpenAI(
+                model=model_name,
+                temperature=temperature,
+                max_retries=0,
+                timeout=httpx.Timeout(LLM_TIMEOUT_SECONDS, connect=LLM_CONNECT_TIMEOUT_SECONDS),
+                http_client=http_client,
+                http_async_client=http_async_client,
+            )
+        except (ImportError, TypeError):
+            # Older langchain signature
+            return ChatOpenAI(model_name=model_name, temperature=temperature, max_retries=0)
+
+    def _pooled_clients(self, httpx: Any) -> Tuple[Any, Any]:
+        # One keep-alive pool per process, shared by every model, so calls
+        # reuse warm TLS connections instead of each agent opening its own.
+        if self._http_clients is None:
+            limits = httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency,
+            )
+            self._http_clients = (
+                httpx.Client(limits=limits),
+                httpx.AsyncClient(limits=limits),
+            )
+        return self._http_clients
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # One semaphore per event loop, since asyncio primitives are loop-bound.
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    # -- resilience --------------------------------------------------------
+
+    def _reject_if_open(self) -> None:
+        if self.breaker.rejecting():
+            LLM_CIRCUIT_REJECTED.inc()
+            raise CircuitOpenError("LLM circuit is open")
+
+    def _claim(self, remaining: float) -> None:
+        # Called right before an attempt, so a claimed probe is always settled
+        if remaining <= 0:
+            raise asyncio.TimeoutError()
+        if not self.breaker.allow():
+            LLM_CIRCUIT_REJECTED.inc()
+            raise CircuitOpenError("LLM circuit is open")
+
+    def _settle(self, exc: Optional[BaseException]) -> None:
+        if exc is None or isinstance(exc, GeneratorExit):
+            self.breaker.record_success()
+        elif isinstance(exc, asyncio.CancelledError):
+            self.breaker.release()
+        elif is_transient(exc):
+            self.breaker.record_failure()
+        else:
+            # The provider answered; the request itself was bad
+            self.breaker.record_success()
+
+    def _retry_delay(self, call: str, exc: Exception, attempt: int, remaining: float) -> Optional[float]:
+        """Seconds to wait before retrying after ``exc``, or None to give up."""
+        if attempt < self.max_retries and is_transient(exc):
+            delay = random.uniform(0, min(self.retry_max, self.retry_base * 2 ** attempt))
+            if delay < remaining:
+                LLM_RETRIES.inc(call)
+                return delay
+        if not isinstance(exc, CircuitOpenError):
+            logger.warning("LLM %s failed after %d attempt(s): %r", call, attempt + 1, exc)
+        return None
+
+    # -- calls -------------------------------------------------------------
+
+    def invoke(self, llm: Any, prompt: str, timeout: Optional[float] = None) -> str:
+        """
+        Call ``llm`` synchronously and return the response text. A blocked
+        attempt cannot be interrupted, so the deadline is enforced between
+        attempts; the HTTP client's own timeout bounds each one.
+        """
+        deadline = time.monotonic() + (LLM_TIMEOUT_SECONDS if timeout is None else timeout)
+        attempt = 0
+        while True:
+            self._claim(deadline - time.monotonic())
+            start = time.perf_counter()
+            error: Optional[BaseException] = None
+            try:
+                response = llm.invoke(prompt)
+            except BaseException as exc:
+                error = exc
+                delay = (
+                    self._retry_delay("invoke", exc, attempt, deadline - time.monotonic())
+                    if isinstance(exc, Exception)
+                    else None
+                )
+                if delay is None:
+                    raise
+            finally:
+                LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, "invoke", _outcome(error))
+                self._settle(error)
+            if error is None:
+                record_usage(response)
+                return getattr(response, "content", str(response))
+            time.sleep(delay)
+            attempt += 1
+
+    async def ainvoke(self, llm: Any, prompt: str, timeout: Optional[float] = None) -> str:
+        """
+        Call ``llm`` without blocking the event loop and return the response
+        text. Uses the model's native ``ainvoke`` when it has one, otherwise
+        offloads the synchronous ``invoke`` to a worker thread. Each attempt
+        holds a concurrency slot; the backoff between attempts does not.
+        Raises ``asyncio.TimeoutError`` when the deadline passes.
+        """
+        return await self._with_retries(
+            "ainvoke", timeout, lambda remaining: self._ainvoke_once(llm, prompt, remaining)
+        )
+
+    async def _with_retries(
+        self,
+        call: str,
+        timeout: Optional[float],
+        attempt_once: Callable[[float], Awaitable[str]],
+    ) -> str:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (LLM_TIMEOUT_SECONDS if timeout is None else timeout)
+        attempt = 0
+        while True:
+            self._reject_if_open()
+            try:
+                async with self._semaphore():
+                    remaining = deadline - loop.time()
+                    self._claim(remaining)
+                    return await attempt_once(remaining)
+            except Exception as exc:
+                delay = self._retry_delay(call, exc, attempt, deadline - loop.time())
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _ainvoke_once(self, llm: Any, prompt: str, remaining: float) -> str:
+        if hasattr(llm, "ainvoke"):
+            call = llm.ainvoke(prompt)
+        else:
+            call = asyncio.to_thread(llm.invoke, prompt)
+        start = time.perf_counter()
+        error: Optional[BaseException] = None
+        try:
+            response = await asyncio.wait_for(call, remaining)
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, "ainvoke", _outcome(error))
+            self._settle(error)
+        record_usage(response)
+        return getattr(response, "content", str(response))
+
+    async def astream(
+        self, llm: Any, prompt: str, timeout: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """
+        Yield the response text of ``llm`` in chunks as it is generated.
+
+        Uses the model's ``astream`` when it has one; otherwise the whole
+        response arrives as a single chunk. A failure before the first chunk
+        is retried like ``ainvoke``; after it, text has been handed out and
+        the error propagates. Holds a concurrency slot for the duration of
+        the stream and raises ``asyncio.TimeoutError`` at the deadline.
+        """
+        if not hasattr(llm, "astream"):
+            yield await self.ainvoke(llm, prompt, timeout)
+            return
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (LLM_TIMEOUT_SECONDS if timeout is None else timeout)
+        attempt = 0
+        while True:
+            self._reject_if_open()
+            started = False
+            try:
+                async with self._semaphore():
+                    self._claim(deadline - loop.time())
+                    stream = self._astream_once(llm, prompt, deadline)
+                    try:
+                        async for text in stream:
+                            started = True
+                            yield text
+                    finally:
+                        # Settle the attempt now rather than at garbage collection
+                        await stream.aclose()
+                    return
+            except Exception as exc:
+                if started:
+                    raise
+                delay = self._retry_delay("astream", exc, attempt, deadline - loop.time())
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _astream_once(self, llm: Any, prompt: str, deadline: float) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        error: Optional[BaseException] = None
+        stream = llm.astream(prompt).__aiter__()
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), remaining)
+                except StopAsyncIteration:
+                    return
+                record_usage(chunk)
+                text = getattr(chunk, "content", chunk)
+                if isinstance(text, str) and text:
+                    yield text
+        except BaseException as exc:
+            error = exc
+            raise
+        finally:
+            LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, "astream", _outcome(error))
+            self._settle(error)
+
+
+_gateway: Optional[LLMGateway] = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway() -> LLMGateway:
+    """The process-wide gateway, created on first use."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
+
+
+def create_chat_model(model_name: str, temperature: float) -> Optional[Any]:
+    """The gateway's shared client for ``model_name``; see ``LLMGateway.chat_model``."""
+    return get_gateway().chat_model(model_name, temperature)
+
+
+def invoke_text(llm: Any, prompt: str, timeout: Optional[float] = None) -> str:
+    """Call ``llm`` synchronously through the gateway and return the response text."""
+    return get_gateway().invoke(llm, prompt, timeout)
+
+
+async def ainvoke_text(
+    llm: Any, prompt: str, timeout: Optional[float] = None
+) -> str:
+    """
+    Call ``llm`` through the gateway without blocking the event loop and
+    return the response text. Raises ``asyncio.TimeoutError`` after
+    ``timeout`` seconds (default ``LLM_TIMEOUT_SECONDS``), retries included,
+    and ``CircuitOpenError`` at once while the provider is failing.
+    """
+    return await get_gateway().ainvoke(llm, prompt, timeout)
+
+
+def astream_text(
+    llm: Any, prompt: str, timeout: Optional[float] = None
+) -> AsyncIterator[str]:
+    """
+    Stream the response text of ``llm`` in chunks through the gateway; see
+    ``LLMGateway.astream``. Close the iterator (``aclose``) when stopping
+    early so its concurrency slot is released.
+    """
+    return get_gateway().astream(llm, prompt, timeout)
@@ -0,0 +1,236 @@
+import hashlib
+import math
+import re
+from typing import Any, List, Tuple
+
+from .cache import ConnectionFactory
+
+# Target size of one stored passage, in estimated tokens.
+PASSAGE_TOKENS = 200
+# Characters per token assumed by ``estimate_tokens``; close to what
+# OpenAI tokenizers average on English prose.
+CHARS_PER_TOKEN = 4
+
+_WORD = re.compile(r"\w+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _pieces(text: str, max_chars: int) -> List[str]:
+    # Paragraphs of at most max_chars, with longer ones broken at sentence
+    # (then word) boundaries; whitespace is normalized.
+    pieces: List[str] = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = " ".join(paragraph.split())
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            pieces.append(paragraph)
+            continue
+        for sentence in _SENTENCE_END.split(paragraph):
+            while len(sentence) > max_chars:
+                cut = sentence.rfind(" ", 0, max_chars)
+                cut = cut if cut > 0 else max_chars
+                pieces.append(sentence[:cut])
+                sentence = sentence[cut:].lstrip()
+            if sentence:
+                pieces.append(sentence)
+    return pieces
+
+
+def chunk_text(text: str, max_tokens: int = PASSAGE_TOKENS) -> List[str]:
+    """
+    Split ``text`` into passages of at most about ``max_tokens`` tokens,
+    keeping paragraphs together where they fit and breaking long ones at
+    sentence (then word) boundaries.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    pieces = _pieces(text, max_chars)
+    passages: List[str] = []
+    current = ""
+    for piece in pieces:
+        if current and len(current) + 1 + len(piece) > max_chars:
+            passages.append(current)
+            current = piece
+        else:
+            current = f"{current} {piece}" if current else piece
+    if current:
+        passages.append(current)
+    return passages
+
+
+def split_sections(text: str, target_tokens: int) -> List[str]:
+    """
+    Split ``text`` into sections of about ``target_tokens`` tokens (between
+    half and twice that), made of whole paragraphs where possible.
+
+    Whether a section ends after a paragraph depends on that paragraph's
+    content, not on its position in the document, so editing one part of a
+    document changes only the sections covering the edit (and at times the
+    one after): the others keep exactly the same text, and their hashes.
+    """
+    target_chars = target_tokens * CHARS_PER_TOKEN
+    min_chars, max_chars = target_chars // 2, target_chars * 2
+    # Past the minimum, each character ends the section with this
+    # probability, so sections average about target_chars
+    rate = 1.0 / max(1, target_chars - min_chars)
+    sections: List[str] = []
+    current: List[str] = []
+    size = 0
+    for piece in _pieces(text, PASSAGE_TOKENS * CHARS_PER_TOKEN):
+        if current and size + len(piece) > max_chars:
+            sections.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(piece)
+        size += len(piece) + 2
+        if size >= min_chars and _draw(piece) < len(piece) * rate:
+            sections.append("\n\n".join(current))
+            current, size = [], 0
+    if current:
+        sections.append("\n\n".join(current))
+    return sections
+
+
+def _draw(piece: str) -> float:
+    # Uniform in [0, 1), but fixed for a given text
+    digest = hashlib.blake2b(piece.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64
+
+
+def _spread_positions(token_counts: List[int], token_budget: int) -> List[int]:
+    # Evenly spaced passage positions whose token counts fit the budget
+    if not token_counts:
+        return []
+    average = max(1, sum(token_counts) // len(token_counts))
+    count = max(1, min(len(token_counts), token_budget // average))
+    step = len(token_counts) / count
+    picked: List[int] = []
+    used = 0
+    for i in range(count):
+        position = int(i * step)
+        if used + token_counts[position] > token_budget:
+            continue
+        picked.append(position)
+        used += token_counts[position]
+    return picked
+
+
+def spread(passages: List[str], token_budget: int) -> List[str]:
+    """
+    Passages sampled evenly from start to end of a document that fit in
+    ``token_budget`` tokens together, in document order.
+    """
+    positions = _spread_positions([estimate_tokens(p) for p in passages], token_budget)
+    return [passages[position] for position in positions]
+
+
+class PassageIndex:
+    """
+    Curriculum text split into passages, with an FTS5 (BM25) index for
+    picking the passages relevant to a quiz.
+
+    Passages are keyed by the document's SHA‑256 (as in
+    ``CurriculumStore``) and stored in document order, so a document's
+    rows normally occupy one contiguous id range, which searches use to
+    narrow the index scan before filtering by digest. The
+    ``table`` and its ``_fts`` index are created by ``migrations.py``.
+    """
+
+    def __init__(
+        self,
+        connection_factory: ConnectionFactory,
+        table: str = "curriculum_passages",
+    ) -> None:
+        self._connection_factory = connection_factory
+        self.table = table
+
+    def has(self, digest: str) -> bool:
+        with self._connection_factory() as conn:
+            return conn.execute(
+                f"SELECT 1 FROM {self.table} WHERE digest = ? LIMIT 1", (digest,)
+            ).fetchone() is not None
+
+    def put(self, digest: str, passages: List[str]) -> None:
+        """Replace the stored passages of a document."""
+        with self._connection_factory() as conn:
+            conn.execute(f"DELETE FROM {self.table} WHERE digest = ?", (digest,))
+            conn.executemany(
+                f"INSERT INTO {self.table} (digest, position, text, tokens) VALUES (?, ?, ?, ?)",
+                [
+                    (digest, position, passage, estimate_tokens(passage))
+                    for position, passage in enumerate(passages)
+                ],
+            )
+
+    def index_text(self, digest: str, text: str) -> None:
+        self.put(digest, chunk_text(text))
+
+    def search(
+        self, digest: str, query: str, token_budget: int, limit: int = 50
+    ) -> List[str]:
+        """
+        The passages of a document most relevant to ``query`` by BM25 that
+        fit in ``token_budget`` tokens together, in document order. When
+        nothing matches, passages spread evenly over the document are
+        returned instead.
+        """
+        terms = sorted(set(_WORD.findall(query.lower())))
+        with self._connection_factory() as conn:
+            first, last = conn.execute(
+                f"SELECT MIN(id), MAX(id) FROM {self.table} WHERE digest = ?", (digest,)
+            ).fetchone()
+            if first is None:
+                return []
+            ranked: List[Tuple[int, str, int]] = []
+            if terms:
+                # The rowid range narrows the FTS scan to this document's
+                # passages; the digest check keeps results right even if
+                # another document's rowids fall inside that range.
+                ranked = conn.execute(
+                    f"""
+                    SELECT p.position, p.text, p.tokens
+                    FROM {self.table}_fts f JOIN {self.table} p ON p.id = f.rowid
+                    WHERE {self.table}_fts MATCH ? AND f.rowid BETWEEN ? AND ?
+                        AND p.digest = ?
+                    ORDER BY f.rank
+                    LIMIT ?
+                    """,
+                    (" OR ".join(f'"{term}"' for term in terms), first, last, digest, limit),
+                ).fetchall()
+            if not ranked:
+                return self._spread(conn, digest, token_budget)
+
+        chosen: List[Tuple[int, str]] = []
+        used = 0
+        for position, text, tokens in ranked:
+            if used + tokens > token_budget:
+                continue
+            chosen.append((position, text))
+            used += tokens
+        return [text for _position, text in sorted(chosen)]
+
+    def _spread(self, conn: Any, digest: str, token_budget: int) -> List[str]:
+        # Positions are 0..n-1, so list index == position
+        token_counts = [
+            tokens for (tokens,) in conn.execute(
+                f"SELECT tokens FROM {self.table} WHERE digest = ? ORDER BY position",
+                (digest,),
+            )
+        ]
+        picked = _spread_positions(token_counts, token_budget)
+        if not picked:
+            return []
+        return [
+            text for (text,) in conn.execute(
+                f"""
+                SELECT text FROM {self.table}
+                WHERE digest = ? AND position IN (SELECT value FROM json_each(?))
+                ORDER BY position
+                """,
+                (digest, "[" + ",".join(map(str, picked)) + "]"),
+            )
+        ]
+
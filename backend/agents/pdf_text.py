@@ -0,0 +1,184 @@
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from io import BytesIO
+from typing import BinaryIO, Iterator, List, Optional, Tuple, Union
+
+# Hard limits applied to every document.
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "1000"))
+PDF_TIME_BUDGET_SECONDS = float(os.getenv("PDF_TIME_BUDGET_SECONDS", "30"))
+
+
+def _usable_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:  # pragma: no cover - not available on every platform
+        return os.cpu_count() or 1
+
+
+# Worker processes used for large documents (1 disables the pool). More
+# workers than CPUs only adds start-up and reparsing cost.
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(min(4, _usable_cpus()))))
+# Documents up to this many pages are parsed inline; the pool round trip
+# and reopening the file in each worker cost more than they save for them.
+SERIAL_PAGE_LIMIT = 32
+
+# Either the raw PDF bytes or a seekable binary file holding them.
+PdfSource = Union[bytes, BinaryIO]
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn, not fork: the server process is multi-threaded.
+            _executor = ProcessPoolExecutor(
+                max_workers=PDF_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def _reset_executor() -> None:
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def shutdown_executor() -> None:
+    """Stop the worker processes (safe to call when none were started)."""
+    _reset_executor()
+
+
+def _pdf_reader_class():
+    # Imported on first use to keep application start-up fast.
+    try:
+        from PyPDF2 import PdfReader  # type: ignore
+    except ImportError:  # pragma: no cover - optional dependency
+        return None
+    return PdfReader
+
+
+def _page_text(page) -> str:
+    try:
+        return page.extract_text() or ""
+    except Exception:
+        return ""
+
+
+def _extract_range(path: str, start: int, stop: int) -> List[str]:
+    # Runs in a worker process: open the file independently and parse
+    # only the requested pages.
+    reader = _pdf_reader_class()(path)
+    return [_page_text(reader.pages[i]) for i in range(start, stop)]
+
+
+def _split(page_count: int, workers: int) -> List[Tuple[int, int]]:
+    # One contiguous range per worker: opening the file parses its whole
+    # cross-reference table, so each worker should do that only once.
+    size = math.ceil(page_count / workers)
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+
+def _as_stream(pdf: PdfSource) -> BinaryIO:
+    if isinstance(pdf, (bytes, bytearray)):
+        return BytesIO(pdf)
+    pdf.seek(0)
+    return pdf
+
+
+@contextmanager
+def _on_disk(stream: BinaryIO) -> Iterator[str]:
+    """
+    Yield a filesystem path holding the PDF so worker processes can open
+    it. Named files are used as is; anything else is copied in chunks to
+    a temporary file that is removed afterwards.
+    """
+    name = getattr(stream, "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        yield name
+        return
+
+    stream.seek(0)
+    tmp = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
+    try:
+        with tmp:
+            shutil.copyfileobj(stream, tmp, 1024 * 1024)
+        yield tmp.name
+    finally:
+        os.unlink(tmp.name)
+
+
+def iter_page_text(
+    pdf: PdfSource,
+    max_pages: Optional[int] = None,
+    time_budget: Optional[float] = None,
+    workers: Optional[int] = None,
+) -> Iterator[Tuple[int, str]]:
+    """
+    Yield ``(page_index, text)`` for every page of ``pdf``, in order.
+
+    Large documents are split into one page range per worker (at most
+    ``PDF_WORKERS``), parsed in a pool of worker processes so CPU‑bound
+    parsing doesn't hold this process's GIL; pages are yielded as soon as
+    their range completes. At most
+    ``max_pages`` pages are read (default ``PDF_MAX_PAGES``) and extraction
+    stops, keeping what it has, once ``time_budget`` seconds (default
+    ``PDF_TIME_BUDGET_SECONDS``) have elapsed.
+    """
+    PdfReader = _pdf_reader_class()
+    if PdfReader is None:
+        return
+
+    max_pages = PDF_MAX_PAGES if max_pages is None else max_pages
+    time_budget = PDF_TIME_BUDGET_SECONDS if time_budget is None else time_budget
+    workers = PDF_WORKERS if workers is None else min(workers, PDF_WORKERS)
+    deadline = time.monotonic() + time_budget
+
+    stream = _as_stream(pdf)
+    reader = PdfReader(stream)
+    page_count = min(len(reader.pages), max_pages)
+
+    next_page = 0
+    if page_count > SERIAL_PAGE_LIMIT and workers > 1:
+        with _on_disk(stream) as path:
+            executor = _get_executor()
+            futures = [
+                executor.submit(_extract_range, path, start, stop)
+                for start, stop in _split(page_count, workers)
+            ]
+            try:
+                for future in futures:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return
+                    for text in future.result(timeout=remaining):
+                        yield next_page, text
+                        next_page += 1
+                return
+            except FuturesTimeoutError:
+                return
+            except BrokenProcessPool:
+                # A worker died; finish the document inline below.
+                _reset_executor()
+            finally:
+                for future in futures:
+                    future.cancel()
+
+    for index in range(next_page, page_count):
+        if time.monotonic() > deadline:
+            return
+        yield index, _page_text(reader.pages[index])
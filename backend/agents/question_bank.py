@@ -0,0 +1,171 @@
+import json
+import math
+import re
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from .cache import ConnectionFactory
+
+_TOKEN = re.compile(r"\w+")
+# Words that say nothing about a quiz's topic.
+_TITLE_STOPWORDS = {
+    "a", "an", "and", "ai", "for", "generated", "in", "of", "on", "quiz",
+    "test", "the", "to", "unit", "week",
+}
+
+
+def tokens(text: str) -> Set[str]:
+    return set(_TOKEN.findall(str(text or "").lower()))
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def _phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+class QuestionBank:
+    """
+    Similarity search over every question already stored.
+
+    Backed by the ``question_bank`` FTS5 index (see migration 8), which a
+    trigger on ``questions`` keeps up to date as assignments are saved, so
+    there is nothing to rebuild. Queries are planned with a snapshot of
+    per-term document counts so they only walk the posting lists of rare
+    terms, which keeps lookups in the millisecond range with a million
+    questions. The snapshot is loaded on first use (under a second at a
+    million questions) and refreshed every ``stats_max_age`` seconds; the
+    counts only steer query planning, so a stale one is harmless.
+    """
+
+    # Questions whose word sets overlap at least this much are duplicates.
+    duplicate_threshold = 0.8
+    # Most stored questions compared against one new question.
+    max_candidates = 200
+    # Title words in more than this share of questions don't pick a topic.
+    common_term_share = 0.02
+    stats_max_age = 600.0
+
+    def __init__(self, connection_factory: ConnectionFactory) -> None:
+        self._connection_factory = connection_factory
+        self._doc_counts: Dict[str, int] = {}
+        self._total_docs = 0
+        self._stats_loaded_at: Optional[float] = None
+        self._stats_lock = threading.Lock()
+
+    def find_for_quiz(
+        self,
+        title: str,
+        subject: str,
+        difficulty: str,
+        limit: int,
+    ) -> List[Dict[str, Any]]:
+        """
+        Up to ``limit`` distinct stored questions from quizzes with the same
+        subject and difficulty whose text mentions the quiz title's topic
+        words, newest first, in the ``{"question", "answer", "options"}``
+        format. Questions containing every topic word come before those
+        containing only some.
+        """
+        if limit <= 0 or not subject or not difficulty:
+            return []
+        doc_counts, total = self._stats()
+        cutoff = max(100, total * self.common_term_share)
+        terms = sorted(
+            term for term in tokens(title) - _TITLE_STOPWORDS
+            if 0 < doc_counts.get(term, 1) <= cutoff
+        )
+        if not terms:
+            return []
+
+        found: List[Dict[str, Any]] = []
+        seen: List[Set[str]] = []
+        with self._connection_factory() as conn:
+            queries = [" AND ".join(map(_phrase, terms))]
+            if len(terms) > 1:
+                queries.append(" OR ".join(map(_phrase, terms)))
+            for query in queries:
+                rows = conn.execute(
+                    """
+                    SELECT q.question, q.answer, q.options
+                    FROM question_bank b
+                    JOIN questions q ON q.id = b.rowid
+                    JOIN assignments a ON a.id = q.assignment_id
+                    WHERE question_bank MATCH ?
+                        AND a.subject = ? COLLATE NOCASE AND a.difficulty = ? COLLATE NOCASE
+                    ORDER BY b.rowid DESC
+                    LIMIT ?
+                    """,
+                    # Over-fetch: the same question may be stored many times
+                    (query, subject, difficulty, limit * 4),
+                ).fetchall()
+                for question, answer, options in rows:
+                    words = tokens(question)
+                    if any(jaccard(words, other) >= self.duplicate_threshold for other in seen):
+                        continue
+                    seen.append(words)
+                    found.append({
+                        "question": question,
+                        "answer": answer or "",
+                        "options": json.loads(options) if options else [],
+                    })
+                    if len(found) >= limit:
+                        return found
+        return found
+
+    def drop_duplicates(
+        self, questions: List[Dict[str, Any]], keep: Iterable[Dict[str, Any]] = ()
+    ) -> List[Dict[str, Any]]:
+        """
+        ``questions`` without near-duplicates of stored questions, of the
+        ``keep`` questions, or of an earlier question in the list.
+        """
+        accepted: List[Set[str]] = [tokens(q.get("question", "")) for q in keep]
+        unique: List[Dict[str, Any]] = []
+        doc_counts, _total = self._stats()
+        with self._connection_factory() as conn:
+            for question in questions:
+                words = tokens(question.get("question", ""))
+                if any(jaccard(words, other) >= self.duplicate_threshold for other in accepted):
+                    continue
+                if self._is_stored(conn, words, doc_counts):
+                    continue
+                accepted.append(words)
+                unique.append(question)
+        return unique
+
+    def _is_stored(self, conn, words: Set[str], doc_counts: Dict[str, int]) -> bool:
+        if not words:
+            return False
+        # Prefix filter: a stored question with Jaccard >= t against these
+        # n words contains at least t * n of them, so it contains at least
+        # one of any n - ceil(t * n) + 1 of them. Pick the rarest.
+        prefix_size = len(words) - math.ceil(self.duplicate_threshold * len(words)) + 1
+        prefix = sorted(words, key=lambda term: (doc_counts.get(term, 0), term))[:prefix_size]
+        rows = conn.execute(
+            """
+            SELECT q.question FROM question_bank b
+            JOIN questions q ON q.id = b.rowid
+            WHERE question_bank MATCH ?
+            LIMIT ?
+            """,
+            (" OR ".join(map(_phrase, prefix)), self.max_candidates),
+        ).fetchall()
+        return any(jaccard(words, tokens(text)) >= self.duplicate_threshold for (text,) in rows)
+
+    def _stats(self):
+        with self._stats_lock:
+            now = time.monotonic()
+            if self._stats_loaded_at is None or now - self._stats_loaded_at > self.stats_max_age:
+                with self._connection_factory() as conn:
+                    self._doc_counts = dict(
+                        conn.execute("SELECT term, doc FROM question_bank_vocab").fetchall()
+                    )
+                    self._total_docs = conn.execute("SELECT COUNT(*) FROM questions").fetchone()[0]
+                self._stats_loaded_at = now
+            return self._doc_counts, self._total_docs
@@ -0,0 +1,43 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+try:
+    from ..metrics import GENERATION_COALESCED  # type: ignore
+except ImportError:
+    from metrics import GENERATION_COALESCED  # type: ignore
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls for the same key into one.
+
+    The first caller for a key starts the work as a task; callers arriving
+    while it runs await that task instead of starting their own, and all
+    of them get its result (the same object, so callers must not mutate
+    it) or its exception. The work runs to completion even if the caller
+    that started it is cancelled, so the others still get their answer.
+    Nothing is kept once the task finishes: this is deduplication of
+    in-flight work, not a cache. Joined calls are counted in
+    ``generation_coalesced_total`` under ``name``.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._tasks: Dict[Hashable, "asyncio.Task[Any]"] = {}
+
+    async def run(self, key: Hashable, work: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._tasks.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(work())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            GENERATION_COALESCED.inc(self.name)
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: "asyncio.Task[Any]") -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            # Retrieve the exception so an unawaited failure isn't logged
+            task.exception()
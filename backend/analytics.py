@@ -0,0 +1,210 @@
+"""
+Per-question and score analytics for assignments and classrooms.
+
+Counts are aggregated inside SQLite with GROUP BY over a covering index,
+so the cost is a few index scans rather than Python loops over answer
+rows. Results are cached per
+assignment/classroom and reused until the data they summarize changes:
+an assignment's entry until it gets a new submission, a classroom's
+until its submission or assignment counter (kept by
+crud.insert_submission and crud.insert_assignment) changes. The
+versions are read from the database, so this also invalidates entries
+held by other worker processes.
+"""
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from .crud import normalize_answer  # type: ignore
+except ImportError:
+    from crud import normalize_answer  # type: ignore
+
+# Number of equal-width buckets in the score histogram (0-10%, ..., 90-100%).
+HISTOGRAM_BUCKETS = 10
+# Wrong answers reported per question.
+TOP_WRONG_ANSWERS = 3
+
+
+def _question_stats(conn: sqlite3.Connection, where: str, params: tuple) -> List[Dict[str, Any]]:
+    questions = conn.execute(
+        f"SELECT id, assignment_id, question, answer FROM questions WHERE {where} ORDER BY id",
+        params,
+    ).fetchall()
+    # Aggregate straight off idx_submission_answers_question, which covers
+    # (question_id, is_correct, student_answer), so no table rows are read.
+    totals = {
+        question_id: (attempts, correct)
+        for question_id, attempts, correct in conn.execute(
+            f"""
+            SELECT question_id, COUNT(*), SUM(is_correct) FROM submission_answers
+            WHERE question_id IN (SELECT id FROM questions WHERE {where})
+            GROUP BY question_id
+            """,
+            params,
+        )
+    }
+    wrong = _common_wrong_answers(conn, where, params)
+    stats = []
+    for question_id, assignment_id, question, answer in questions:
+        attempts, correct = totals.get(question_id, (0, 0))
+        stats.append({
+            "questionId": question_id,
+            "assignmentId": assignment_id,
+            "question": question,
+            "correctAnswer": answer,
+            "attempts": attempts,
+            "correct": correct,
+            "correctRate": round(correct / attempts, 3) if attempts else None,
+            "commonWrongAnswers": wrong.get(question_id, []),
+        })
+    return stats
+
+
+def _common_wrong_answers(
+    conn: sqlite3.Connection, where: str, params: tuple
+) -> Dict[int, List[Dict[str, Any]]]:
+    # Group on the raw answer (an index-ordered scan), then merge spellings
+    # that grade the same, e.g. "Paris" and " paris", in Python; there are
+    # far fewer distinct answers than answer rows.
+    merged: Dict[int, Dict[str, int]] = {}
+    for question_id, answer, count in conn.execute(
+        f"""
+        SELECT question_id, student_answer, COUNT(*) FROM submission_answers
+        WHERE question_id IN (SELECT id FROM questions WHERE {where}) AND is_correct = 0
+        GROUP BY question_id, student_answer
+        """,
+        params,
+    ):
+        key = normalize_answer(answer)
+        if key:
+            counts = merged.setdefault(question_id, {})
+            counts[key] = counts.get(key, 0) + count
+    return {
+        question_id: [
+            {"answer": answer, "count": count}
+            for answer, count in sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:TOP_WRONG_ANSWERS]
+        ]
+        for question_id, counts in merged.items()
+    }
+
+
+def _score_histogram(conn: sqlite3.Connection, where: str, params: tuple) -> Dict[str, Any]:
+    rows = conn.execute(
+        f"""
+        SELECT MIN(s.score * {HISTOGRAM_BUCKETS} / s.total, {HISTOGRAM_BUCKETS - 1}) AS bucket,
+               COUNT(*), SUM(s.score), SUM(s.total)
+        FROM submissions s
+        JOIN assignments a ON s.assignment_id = a.id
+        WHERE {where} AND s.total > 0
+        GROUP BY bucket
+        """,
+        params,
+    ).fetchall()
+    counts = [0] * HISTOGRAM_BUCKETS
+    score_sum = total_sum = 0
+    for bucket, count, scores, totals in rows:
+        counts[bucket] = count
+        score_sum += scores
+        total_sum += totals
+    step = 100 // HISTOGRAM_BUCKETS
+    return {
+        "submissions": sum(counts),
+        "averageScore": round(100.0 * score_sum / total_sum, 1) if total_sum else None,
+        "histogram": [
+            {"range": f"{i * step}-{(i + 1) * step}%", "count": counts[i]}
+            for i in range(HISTOGRAM_BUCKETS)
+        ],
+    }
+
+
+def compute_assignment_analytics(conn: sqlite3.Connection, assignment_id: int) -> Dict[str, Any]:
+    return {
+        "assignmentId": assignment_id,
+        "scores": _score_histogram(conn, "a.id = ?", (assignment_id,)),
+        "questions": _question_stats(conn, "assignment_id = ?", (assignment_id,)),
+    }
+
+
+def compute_classroom_analytics(conn: sqlite3.Connection, classroom_id: int) -> Dict[str, Any]:
+    in_classroom = "assignment_id IN (SELECT id FROM assignments WHERE classroom_id = ?)"
+    return {
+        "classroomId": classroom_id,
+        "scores": _score_histogram(conn, "a.classroom_id = ?", (classroom_id,)),
+        "questions": _question_stats(conn, in_classroom, (classroom_id,)),
+    }
+
+
+class AnalyticsCache:
+    """
+    Small LRU of computed analytics, each entry tagged with the classroom
+    counters (its version) it was computed at.
+    """
+
+    def __init__(self, max_entries: int = 256) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[Tuple[int, ...], Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[str, int], version: Tuple[int, ...]) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: Tuple[str, int], version: Tuple[int, ...], value: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = AnalyticsCache()
+
+
+def assignment_analytics(conn: sqlite3.Connection, assignment_id: int) -> Optional[Dict[str, Any]]:
+    """Cached analytics for one assignment, or None if it doesn't exist."""
+    # Versioned by the assignment's own newest submission, so it doesn't
+    # rely on the classroom counters (the classroom may not exist)
+    row = conn.execute(
+        """
+        SELECT (SELECT MAX(id) FROM submissions WHERE assignment_id = a.id)
+        FROM assignments a WHERE a.id = ?
+        """,
+        (assignment_id,),
+    ).fetchone()
+    if row is None:
+        return None
+    key = ("assignment", assignment_id)
+    version = tuple(row)
+    result = _cache.get(key, version)
+    if result is None:
+        result = compute_assignment_analytics(conn, assignment_id)
+        _cache.set(key, version, result)
+    return result
+
+
+def classroom_analytics(conn: sqlite3.Connection, classroom_id: int) -> Optional[Dict[str, Any]]:
+    """Cached analytics for a whole classroom, or None if it doesn't exist."""
+    # New assignments add questions to the report even before anyone
+    # submits, so both counters version the entry.
+    row = conn.execute(
+        "SELECT submission_count, assignment_count FROM classroom WHERE id = ?", (classroom_id,)
+    ).fetchone()
+    if row is None:
+        return None
+    key = ("classroom", classroom_id)
+    version = tuple(row)
+    result = _cache.get(key, version)
+    if result is None:
+        result = compute_classroom_analytics(conn, classroom_id)
+        _cache.set(key, version, result)
+    return result
@@ -0,0 +1,96 @@
+"""
+Wall-clock time and LLM calls of map-reduce curriculum summarization.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_curriculum_map --llm-latency 0.2
+
+Summarizes synthetic documents of increasing length with a stand-in LLM
+that answers after ``--llm-latency`` seconds, once per map concurrency
+cap, then re-summarizes the longest document after editing one
+paragraph. Time grows with ceil(sections / cap) rounds of LLM calls
+(sections are capped at ``CurriculumAgent.max_sections``); the process-wide
+``LLM_MAX_CONCURRENCY`` limit applies on top of the cap. The edited
+document should need only the changed sections plus the merge call.
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import List
+
+from agents.cache import GenerationCache
+from agents.curriculum import CurriculumAgent
+from benchmarks.llm_stub import respond
+
+
+class FakeMessage:
+    def __init__(self, content: str) -> None:
+        self.content = content
+
+
+class FakeChatModel:
+    """Answers curriculum prompts like ``benchmarks.llm_stub`` after ``latency`` seconds."""
+
+    def __init__(self, latency: float) -> None:
+        self.latency = latency
+        self.calls = 0
+
+    async def ainvoke(self, prompt: str) -> FakeMessage:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return FakeMessage(respond(prompt))
+
+
+def document(pages: int, rng: random.Random) -> List[str]:
+    """Paragraphs of about 500 tokens per page."""
+    words = ["".join(rng.choice("abcdefghijklmnop") for _ in range(rng.randint(3, 9)))
+             for _ in range(2000)]
+    return [
+        " ".join(rng.choices(words, k=rng.randint(60, 140))) + "."
+        for _ in range(pages * 5)
+    ]
+
+
+async def summarize(agent: CurriculumAgent, text: str) -> float:
+    start = time.perf_counter()
+    result, complete = await agent._asummarize(text, "bench.pdf", timeout=600)
+    assert result and complete
+    return time.perf_counter() - start
+
+
+async def run(args: argparse.Namespace) -> None:
+    rng = random.Random(7)
+    print(f"{'pages':>6} {'sections':>8} {'cap':>4} {'seconds':>8} {'llm calls':>9}")
+    for pages in args.pages:
+        paragraphs = document(pages, rng)
+        text = "\n\n".join(paragraphs)
+        for cap in args.caps:
+            agent = CurriculumAgent(map_concurrency=cap)
+            agent._llm = FakeChatModel(args.llm_latency)
+            elapsed = await summarize(agent, text)
+            sections = len(agent._sections(text))
+            print(f"{pages:6d} {sections:8d} {cap:4d} {elapsed:8.2f} {agent._llm.calls:9d}")
+
+    agent = CurriculumAgent(section_cache=GenerationCache(), map_concurrency=max(args.caps))
+    agent._llm = FakeChatModel(args.llm_latency)
+    await summarize(agent, text)
+    first = agent._llm.calls
+    paragraphs[len(paragraphs) // 2] += " An edited sentence."
+    elapsed = await summarize(agent, "\n\n".join(paragraphs))
+    print(
+        f"re-upload after one edit: {agent._llm.calls - first} llm calls "
+        f"(first upload {first}), {elapsed:.2f}s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 200, 1000])
+    parser.add_argument("--caps", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--llm-latency", type=float, default=0.2, help="fake LLM latency (s)")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
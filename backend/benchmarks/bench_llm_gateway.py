@@ -0,0 +1,129 @@
+"""
+Behaviour of the LLM gateway against a faulty provider.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_llm_gateway
+
+Starts ``benchmarks.llm_stub`` on a local port and drives the real
+``ChatOpenAI`` client through ``LLMGateway`` in six phases: a healthy
+provider, one failing a fraction of requests (retries absorb it), an
+outage (the circuit opens and calls fail in microseconds instead of at
+the deadline), recovery through a probe call after the reset period, and
+a provider slower than the deadline. For each phase it prints successes,
+latency and how many requests actually reached the provider.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import threading
+import time
+from typing import Any, List, Tuple
+
+from agents.llm import CircuitBreaker, LLMGateway
+from benchmarks.llm_stub import create_app
+
+PROMPT = "Create 5 questions about fractions. Return a JSON array."
+
+
+def start_stub(port: int) -> Tuple[Any, Any]:
+    import uvicorn
+
+    app = create_app()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return app, server
+
+
+async def phase(
+    name: str, gateway: LLMGateway, llm: Any, app: Any, calls: int, concurrency: int, timeout: float
+) -> None:
+    semaphore = asyncio.Semaphore(concurrency)
+    results: List[Tuple[bool, float]] = []
+
+    async def one() -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await gateway.ainvoke(llm, PROMPT, timeout)
+                ok = True
+            except Exception:
+                ok = False
+            results.append((ok, (time.perf_counter() - start) * 1000))
+
+    before = app.state.requests
+    await asyncio.gather(*(one() for _ in range(calls)))
+    ok = [ms for success, ms in results if success]
+    failed = [ms for success, ms in results if not success]
+    print(
+        f"{name:10} ok {len(ok):3d}/{calls:<3d} "
+        f"ok p50 {statistics.median(ok) if ok else 0:8.2f} ms  "
+        f"failed p50 {statistics.median(failed) if failed else 0:8.2f} ms  "
+        f"provider requests {app.state.requests - before:4d}  circuit {gateway.breaker.state}"
+    )
+
+
+async def run(args: argparse.Namespace, app: Any) -> None:
+    def gateway() -> Tuple[LLMGateway, Any]:
+        instance = LLMGateway(
+            max_concurrency=args.concurrency,
+            max_retries=args.retries,
+            retry_base=args.retry_base,
+            breaker=CircuitBreaker(args.circuit_failures, args.circuit_reset),
+        )
+        return instance, instance.chat_model("gpt-4o-mini", 0.2)
+
+    faults = app.state.faults
+    common = dict(calls=args.calls, concurrency=args.concurrency, timeout=args.timeout)
+
+    faults.update(latency=args.latency, errorRate=0.0)
+    healthy, llm = gateway()
+    await phase("healthy", healthy, llm, app, **common)
+
+    faults.update(errorRate=args.error_rate)
+    flaky, llm = gateway()
+    await phase("flaky", flaky, llm, app, **common)
+
+    faults.update(errorRate=1.0)
+    down, llm = gateway()
+    await phase("outage", down, llm, app, **common)
+
+    faults.update(errorRate=0.0)
+    await asyncio.sleep(args.circuit_reset)
+    # While half-open only one probe is let through; it closes the circuit
+    await phase("probe", down, llm, app, calls=1, concurrency=1, timeout=args.timeout)
+    await phase("recovered", down, llm, app, **common)
+
+    faults.update(latency=args.timeout * 2)
+    slow, llm = gateway()
+    await phase("slow", slow, llm, app, **common)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--calls", type=int, default=20, help="calls per phase")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.1, help="provider latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.3, help="failure rate when flaky")
+    parser.add_argument("--timeout", type=float, default=1.0, help="per-call deadline (s)")
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--retry-base", type=float, default=0.05, help="backoff base (s)")
+    parser.add_argument("--circuit-failures", type=int, default=5)
+    parser.add_argument("--circuit-reset", type=float, default=1.0, help="seconds open")
+    args = parser.parse_args()
+
+    os.environ["OPENAI_API_KEY"] = "stub"
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{args.port}/v1"
+    app, server = start_stub(args.port)
+    try:
+        asyncio.run(run(args, app))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
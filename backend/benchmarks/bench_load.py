@@ -0,0 +1,374 @@
+"""
+End-to-end load test of the API with a stand-in LLM.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_load
+    python -m benchmarks.bench_load --save-baseline
+    python -m benchmarks.bench_load --check --threshold 0.5
+
+By default the app is driven in-process through httpx's ASGI transport,
+against a throwaway database, with ``FakeChatModel`` in place of
+``ChatOpenAI``. To measure a real server instead, start one with the same
+stub and point the load test at it:
+
+    python -m benchmarks.bench_load --serve 8001
+    python -m benchmarks.bench_load --url http://127.0.0.1:8001
+
+Each round, every classroom runs a live-quiz session: the teacher
+generates a quiz, students join, fetch the questions and submit in a
+burst, while the teacher's dashboard polls the classroom summary,
+assignment list and analytics. The report has p50/p95/p99 latency and
+throughput per endpoint, each the median over ``--runs`` rounds.
+``--check`` compares it with the stored baseline and exits 1 when any
+endpoint's p50 or p95 grew (or its throughput fell) by more than
+``--threshold``. Baselines are machine-specific; regenerate with
+``--save-baseline`` after changing hardware.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+BASELINE_PATH = Path(__file__).with_name("bench_load_baseline.json")
+# Latency changes smaller than this are noise, whatever the ratio.
+MIN_DELTA_MS = 5.0
+# Endpoints with fewer samples than this are compared on p50 only.
+MIN_SAMPLES = 20
+SUBJECTS = ["Mathematics", "Physics", "Biology", "History"]
+
+
+class FakeMessage:
+    def __init__(self, content: str) -> None:
+        self.content = content
+
+
+class FakeChatModel:
+    """
+    Deterministic stand-in for ``ChatOpenAI``: answers a quiz prompt with
+    as many questions as it asks for, derived from the prompt text, after
+    ``latency`` seconds. ``astream`` spreads the same delay over one chunk
+    per question, like a model writing tokens.
+    """
+
+    def __init__(self, latency: float = 0.8) -> None:
+        self.latency = latency
+        self.calls = 0
+
+    def _respond(self, prompt: str) -> str:
+        match = re.search(r"Create (\d+) questions", prompt)
+        count = int(match.group(1)) if match else 5
+        seed = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+        return json.dumps([
+            {
+                "question": f"Stub question {i + 1} ({seed}): what is {i} + {i}?",
+                "answer": str(2 * i),
+                "options": [str(2 * i), str(2 * i + 1), str(i), str(i + 2)],
+            }
+            for i in range(count)
+        ])
+
+    def invoke(self, prompt: str) -> FakeMessage:
+        self.calls += 1
+        time.sleep(self.latency)
+        return FakeMessage(self._respond(prompt))
+
+    async def ainvoke(self, prompt: str) -> FakeMessage:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return FakeMessage(self._respond(prompt))
+
+    async def astream(self, prompt: str) -> AsyncIterator[FakeMessage]:
+        self.calls += 1
+        text = self._respond(prompt)
+        chunks = re.split(r"(?<=\}),", text)
+        for i, chunk in enumerate(chunks):
+            await asyncio.sleep(self.latency / len(chunks))
+            yield FakeMessage(chunk if i == len(chunks) - 1 else chunk + ",")
+
+
+def install_fake_llm(main: Any, latency: float) -> FakeChatModel:
+    fake = FakeChatModel(latency)
+    agent = main.get_quiz_agent()
+    if agent is not None:
+        agent._llm = fake
+    return fake
+
+
+class Recorder:
+    """Latency samples and failures per endpoint."""
+
+    def __init__(self) -> None:
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    async def call(
+        self, client: httpx.AsyncClient, method: str, name: str, url: str, **kwargs: Any
+    ) -> Optional[Any]:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            return None
+        self.samples[name].append((time.perf_counter() - start) * 1000)
+        if response.status_code >= 400:
+            self.errors[name] += 1
+            return None
+        return response.json() if response.content else None
+
+    def report(self, elapsed: float) -> Dict[str, Dict[str, float]]:
+        return {
+            name: {
+                "count": len(samples),
+                "errors": self.errors.get(name, 0),
+                "p50": percentile(samples, 50),
+                "p95": percentile(samples, 95),
+                "p99": percentile(samples, 99),
+                "throughput": len(samples) / elapsed,
+            }
+            for name, samples in sorted(self.samples.items())
+        }
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    # Nearest-rank percentile
+    ordered = sorted(samples)
+    rank = max(1, -(-len(ordered) * pct // 100))
+    return ordered[int(rank) - 1]
+
+
+async def classroom_session(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    index: int,
+    args: argparse.Namespace,
+    limit: asyncio.Semaphore,
+) -> None:
+    rng = random.Random(index)
+    created = await recorder.call(
+        client, "POST", "POST /api/classrooms", "/api/classrooms",
+        json={
+            "name": f"Load test {index}",
+            "subject": rng.choice(SUBJECTS),
+            "teacherId": f"teacher-{index}",
+        },
+    )
+    if not created:
+        return
+    classroom_id, code = created["classroomId"], created["classCode"]
+    await recorder.call(
+        client, "POST", "POST /api/classrooms/{id}/generate-quiz",
+        f"/api/classrooms/{classroom_id}/generate-quiz",
+        json={
+            "title": f"Live quiz {index}",
+            "subject": rng.choice(SUBJECTS),
+            "difficulty": "Medium",
+            "questions": args.questions,
+        },
+    )
+    page = await recorder.call(
+        client, "GET", "GET /api/classrooms/{id}/assignments",
+        f"/api/classrooms/{classroom_id}/assignments",
+    )
+    if not page or not page["assignments"]:
+        return
+    assignment_id = page["assignments"][0]["id"]
+
+    async def student(number: int) -> None:
+        async with limit:
+            await recorder.call(
+                client, "POST", "POST /api/classrooms/join", "/api/classrooms/join",
+                json={"code": code, "studentName": f"Student {number}"},
+            )
+            body = await recorder.call(
+                client, "GET", "GET /api/assignments/{id}/questions",
+                f"/api/assignments/{assignment_id}/questions",
+            )
+        # Answering takes a while; the submissions then arrive together
+        await asyncio.sleep(args.think_time * rng.random())
+        questions = body["questions"] if body else []
+        answers = {
+            str(i): q["answer"] if rng.random() < 0.7 else "wrong"
+            for i, q in enumerate(questions)
+        }
+        async with limit:
+            await recorder.call(
+                client, "POST", "POST /api/quiz-submissions", "/api/quiz-submissions",
+                json={
+                    "assignmentId": assignment_id,
+                    "studentId": index * args.students + number,
+                    "answers": answers,
+                },
+            )
+
+    async def dashboard(done: asyncio.Event) -> None:
+        while not done.is_set():
+            async with limit:
+                await recorder.call(
+                    client, "GET", "GET /api/classrooms/{id}",
+                    f"/api/classrooms/{classroom_id}",
+                )
+                await recorder.call(
+                    client, "GET", "GET /api/classrooms/{id}/assignments",
+                    f"/api/classrooms/{classroom_id}/assignments",
+                )
+                await recorder.call(
+                    client, "GET", "GET /api/assignments/{id}/analytics",
+                    f"/api/assignments/{assignment_id}/analytics",
+                )
+            try:
+                await asyncio.wait_for(done.wait(), args.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    done = asyncio.Event()
+    poller = asyncio.create_task(dashboard(done))
+    await asyncio.gather(*(student(number) for number in range(args.students)))
+    done.set()
+    await poller
+
+
+async def run_load(client: httpx.AsyncClient, args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    # Each statistic is the median over --runs rounds, which steadies the
+    # tail percentiles enough to compare against a baseline
+    reports = []
+    limit = asyncio.Semaphore(args.concurrency)
+    for round_number in range(args.runs):
+        recorder = Recorder()
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(
+                classroom_session(client, recorder, round_number * args.classrooms + i, args, limit)
+                for i in range(args.classrooms)
+            )
+        )
+        reports.append(recorder.report(time.perf_counter() - start))
+    return {
+        name: {
+            key: statistics.median(report[name][key] for report in reports if name in report)
+            for key in reports[0][name]
+        }
+        for name in reports[0]
+    }
+
+
+async def run_in_process(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    import main
+
+    fake = install_fake_llm(main, args.llm_latency)
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test") as client:
+            report = await run_load(client, args)
+    print(f"fake LLM calls: {fake.calls}")
+    return report
+
+
+async def run_remote(args: argparse.Namespace) -> Dict[str, Dict[str, float]]:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60) as client:
+        return await run_load(client, args)
+
+
+def serve(port: int, llm_latency: float) -> None:
+    import uvicorn
+
+    import main
+
+    install_fake_llm(main, llm_latency)
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+def print_report(report: Dict[str, Dict[str, float]]) -> None:
+    print(f"{'endpoint':44} {'count':>6} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8}")
+    for name, stats in report.items():
+        print(
+            f"{name:44} {stats['count']:6d} {stats['errors']:4d} {stats['p50']:8.2f} "
+            f"{stats['p95']:8.2f} {stats['p99']:8.2f} {stats['throughput']:8.1f}"
+        )
+
+
+def regressions(
+    report: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    threshold: float,
+) -> List[str]:
+    problems: List[str] = []
+    for name, base in baseline.items():
+        current = report.get(name)
+        if current is None:
+            problems.append(f"{name}: not exercised")
+            continue
+        if current["errors"] > base.get("errors", 0):
+            problems.append(f"{name}: {current['errors']} errors (baseline {base.get('errors', 0)})")
+        # Tail percentiles of a handful of samples are just their maximum
+        few = min(current["count"], base["count"]) < MIN_SAMPLES
+        for key in ("p50",) if few else ("p50", "p95"):
+            if (current[key] > base[key] * (1 + threshold)
+                    and current[key] - base[key] > MIN_DELTA_MS):
+                problems.append(f"{name}: {key} {current[key]:.2f} ms vs baseline {base[key]:.2f} ms")
+        if current["throughput"] < base["throughput"] * (1 - threshold):
+            problems.append(
+                f"{name}: {current['throughput']:.1f} req/s vs baseline {base['throughput']:.1f} req/s"
+            )
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--classrooms", type=int, default=5)
+    parser.add_argument("--students", type=int, default=40, help="per classroom")
+    parser.add_argument("--questions", type=int, default=10, help="per quiz")
+    parser.add_argument("--concurrency", type=int, default=50, help="requests in flight")
+    parser.add_argument("--think-time", type=float, default=2.0,
+                        help="longest pause between fetching and submitting (s)")
+    parser.add_argument("--poll-interval", type=float, default=0.25, help="dashboard poll interval (s)")
+    parser.add_argument("--runs", type=int, default=3, help="rounds; statistics are medians")
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="fake LLM latency (s)")
+    parser.add_argument("--url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--serve", type=int, metavar="PORT",
+                        help="run the app with the fake LLM on PORT instead of a load test")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="exit 1 if the baseline regressed")
+    parser.add_argument("--threshold", type=float, default=0.5, help="allowed regression ratio")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # A throwaway database, unless pointed at one explicitly
+        os.environ.setdefault("DATABASE_PATH", str(Path(tmp) / "load.db"))
+        os.environ.setdefault("UPLOAD_DIR", str(Path(tmp) / "uploads"))
+        if args.serve:
+            serve(args.serve, args.llm_latency)
+            return
+        report = asyncio.run(run_remote(args) if args.url else run_in_process(args))
+
+    print_report(report)
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+        print(f"baseline saved to {args.baseline}")
+    if args.check:
+        baseline = json.loads(args.baseline.read_text())
+        problems = regressions(report, baseline, args.threshold)
+        for problem in problems:
+            print(f"REGRESSION {problem}")
+        if problems:
+            sys.exit(1)
+        print(f"no regressions beyond {args.threshold:.0%}")
+
+
+if __name__ == "__main__":
+    main()
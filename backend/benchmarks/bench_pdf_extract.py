@@ -0,0 +1,111 @@
+"""
+Compare serial and process-pool PDF text extraction.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_pdf_extract --pages 200 400 800
+
+A synthetic text PDF of each size is generated in memory. "serial" parses
+every page on the calling thread (workers=1); "pool" uses the worker pool
+from agents.pdf_text, one page range per worker. The old behaviour (first
+5 pages only) is shown for reference. The pool has ``PDF_WORKERS``
+processes, by default one per usable CPU up to 4; on a single CPU it is
+disabled and both columns measure the serial path.
+"""
+import argparse
+import time
+from io import BytesIO
+
+from PyPDF2 import PdfReader
+
+from agents.pdf_text import PDF_WORKERS, iter_page_text, shutdown_executor
+
+
+def make_pdf(pages: int, lines_per_page: int = 40) -> bytes:
+    """Build a minimal multi-page PDF with plain Helvetica text."""
+    font_id = 3 + 2 * pages
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        (
+            "<< /Type /Pages /Kids [%s] /Count %d >>"
+            % (" ".join(f"{3 + 2 * i} 0 R" for i in range(pages)), pages)
+        ).encode(),
+    ]
+    for i in range(pages):
+        objects.append(
+            (
+                "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                f"/Resources << /Font << /F1 {font_id} 0 R >> >> "
+                f"/Contents {4 + 2 * i} 0 R >>"
+            ).encode()
+        )
+        lines = " ".join(
+            f"(Chapter {i + 1}, line {j}: solving linear equations and graphing functions) '"
+            for j in range(lines_per_page)
+        )
+        stream = f"BT /F1 10 Tf 40 760 Td 12 TL {lines} ET".encode()
+        objects.append(
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        )
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    out = BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(
+        b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+        % (len(objects) + 1, xref)
+    )
+    return out.getvalue()
+
+
+def first_five_pages(pdf: bytes) -> int:
+    reader = PdfReader(BytesIO(pdf))
+    return sum(len(page.extract_text() or "") for page in reader.pages[:5])
+
+
+def extract(pdf: bytes, workers: int) -> int:
+    return sum(len(text) for _, text in iter_page_text(pdf, workers=workers))
+
+
+def timed(fn, *args) -> tuple:
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[100, 300, 600])
+    parser.add_argument("--workers", type=int, default=PDF_WORKERS,
+                        help="at most PDF_WORKERS")
+    args = parser.parse_args()
+    print(f"pool of {min(args.workers, PDF_WORKERS)} worker(s)")
+
+    # Warm the pool so process start-up isn't charged to the first run.
+    extract(make_pdf(64), args.workers)
+
+    print(f"{'pages':>6} {'first 5 (s)':>12} {'serial (s)':>11} {'pool (s)':>9} {'speedup':>8}")
+    for pages in args.pages:
+        pdf = make_pdf(pages)
+        old_time, _ = timed(first_five_pages, pdf)
+        serial_time, serial_chars = timed(extract, pdf, 1)
+        pool_time, pool_chars = timed(extract, pdf, args.workers)
+        assert serial_chars == pool_chars, "pool and serial output differ"
+        print(
+            f"{pages:>6} {old_time:>12.3f} {serial_time:>11.3f} "
+            f"{pool_time:>9.3f} {serial_time / pool_time:>7.2f}x"
+        )
+
+    shutdown_executor()
+
+
+if __name__ == "__main__":
+    main()
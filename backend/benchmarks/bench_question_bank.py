@@ -0,0 +1,102 @@
+"""
+Latency of question-bank lookups at scale.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_question_bank --questions 1000000
+
+Builds a throwaway database through the real migrations, inserts
+synthetic questions (the insert trigger indexes them as it goes), then
+times QuestionBank.find_for_quiz and QuestionBank.drop_duplicates.
+"""
+import argparse
+import itertools
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import crud
+import migrations
+from agents.question_bank import QuestionBank
+from db import ConnectionPool
+
+SUBJECTS = ["Mathematics", "Physics", "Chemistry", "Biology", "History", "Geography"]
+DIFFICULTIES = ["Easy", "Medium", "Hard"]
+QUESTIONS_PER_ASSIGNMENT = 20
+
+
+def vocabulary(size: int, rng: random.Random):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < size:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(3, 9))))
+    words = sorted(words)
+    # Zipf-like weights so a few words are common, as in real text
+    weights = list(itertools.accumulate(1.0 / (rank + 1) for rank in range(len(words))))
+    return words, weights
+
+
+def sentence(rng, words, weights, length=12) -> str:
+    return " ".join(rng.choices(words, cum_weights=weights, k=length)).capitalize() + "?"
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--vocabulary", type=int, default=20_000)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    words, weights = vocabulary(args.vocabulary, rng)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(Path(tmp) / "bench.db", max_size=1)
+        with pool.connection() as conn:
+            migrations.migrate(conn)
+            conn.execute("INSERT INTO classroom (id, code) VALUES (1, 'BENCH')")
+
+        start = time.perf_counter()
+        assignments = (args.questions + QUESTIONS_PER_ASSIGNMENT - 1) // QUESTIONS_PER_ASSIGNMENT
+        for batch_start in range(0, assignments, 500):
+            with pool.connection() as conn:
+                for _ in range(batch_start, min(batch_start + 500, assignments)):
+                    questions = [
+                        {"question": sentence(rng, words, weights), "answer": rng.choice(words), "options": []}
+                        for _ in range(QUESTIONS_PER_ASSIGNMENT)
+                    ]
+                    title = " ".join(rng.choices(words, cum_weights=weights, k=3))
+                    crud.insert_assignment(
+                        conn, 1, title, rng.choice(SUBJECTS), rng.choice(DIFFICULTIES), "", questions
+                    )
+        build = time.perf_counter() - start
+        print(f"indexed {assignments * QUESTIONS_PER_ASSIGNMENT} questions in {build:.1f}s "
+              f"({build / (assignments * QUESTIONS_PER_ASSIGNMENT) * 1e6:.0f}us per insert)")
+
+        bank = QuestionBank(pool.connection)
+        find, dedupe = [], []
+        for _ in range(args.queries):
+            title = " ".join(rng.choices(words, cum_weights=weights, k=2))
+            t0 = time.perf_counter()
+            bank.find_for_quiz(title, rng.choice(SUBJECTS), rng.choice(DIFFICULTIES), 5)
+            find.append((time.perf_counter() - t0) * 1000)
+
+            candidates = [{"question": sentence(rng, words, weights)} for _ in range(5)]
+            t0 = time.perf_counter()
+            bank.drop_duplicates(candidates)
+            dedupe.append((time.perf_counter() - t0) * 1000 / len(candidates))
+        pool.close()
+
+    print(f"find_for_quiz (top 5)        p50 {percentiles(find)[0]:7.2f} ms  p95 {percentiles(find)[1]:7.2f} ms")
+    print(f"drop_duplicates per question p50 {percentiles(dedupe)[0]:7.2f} ms  p95 {percentiles(dedupe)[1]:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Cold-start cost of the backend: import time and time-to-first-response.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_startup --runs 5
+
+"import" is the time to ``import main`` in a fresh interpreter. "first
+response" is measured from launching ``uvicorn main:app`` until the first
+successful GET of a read endpoint, which includes the lifespan startup
+(schema migrations). Each run uses a fresh temporary database.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); import main; "
+    "print(time.perf_counter() - start)"
+)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _env(db_path: Path) -> dict:
+    env = dict(os.environ)
+    env["DATABASE_PATH"] = str(db_path)
+    return env
+
+
+def measure_import(db_path: Path) -> float:
+    output = subprocess.check_output(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=BACKEND_DIR, env=_env(db_path)
+    )
+    return float(output.decode().strip().splitlines()[-1])
+
+
+def measure_first_response(db_path: Path, timeout: float = 30.0) -> float:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/api/classrooms/1/assignments"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        env=_env(db_path),
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - start
+            except (urllib.error.URLError, ConnectionError):
+                time.sleep(0.01)
+        raise RuntimeError(f"No response from {url} within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    imports, first_responses = [], []
+    for run in range(args.runs):
+        with tempfile.TemporaryDirectory() as tmp:
+            imports.append(measure_import(Path(tmp) / f"import-{run}.db"))
+            first_responses.append(measure_first_response(Path(tmp) / f"serve-{run}.db"))
+
+    for label, samples in (("import main", imports), ("first response", first_responses)):
+        print(
+            f"{label:>15}: median {statistics.median(samples) * 1000:7.1f} ms, "
+            f"min {min(samples) * 1000:7.1f} ms, max {max(samples) * 1000:7.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Per-submission latency of the quiz grading write path.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_submit --questions 10 50 200
+
+Compares the previous row-at-a-time path (one INSERT per answer plus a
+score UPDATE) with crud.grade_answers + crud.insert_submission, both on a
+pooled connection against a throwaway database built by the real
+migrations, so the tables, indexes and triggers match production. It
+then times importing --sheets answer sheets at once: one transaction
+per sheet versus the bulk endpoint's single crud.insert_submissions
+call.
+"""
+import argparse
+import statistics
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import crud
+import migrations
+from db import ConnectionPool
+
+
+def submit_row_at_a_time(conn, assignment_id, student_id, answers):
+    cursor = conn.cursor()
+    cursor.execute("SELECT id, answer FROM questions WHERE assignment_id = ?", (assignment_id,))
+    question_rows = cursor.fetchall()
+    score = 0
+    cursor.execute(
+        "INSERT INTO submissions (assignment_id, student_id, submitted_at, score, total, status) VALUES (?, ?, ?, ?, ?, ?)",
+        (assignment_id, student_id, datetime.utcnow().isoformat(), 0, len(question_rows), "completed"),
+    )
+    submission_id = cursor.lastrowid
+    for idx, (question_id, correct_answer) in enumerate(question_rows):
+        student_answer = answers.get(str(idx), "")
+        is_correct = int(student_answer.strip().lower() == (correct_answer or "").strip().lower())
+        score += is_correct
+        cursor.execute(
+            "INSERT INTO submission_answers (submission_id, question_id, student_answer, is_correct) VALUES (?, ?, ?, ?)",
+            (submission_id, question_id, student_answer, is_correct),
+        )
+    cursor.execute("UPDATE submissions SET score = ? WHERE id = ?", (score, submission_id))
+    return submission_id
+
+
+def submit_bulk(conn, assignment_id, student_id, answers):
+    answer_key = crud.get_answer_key(conn, assignment_id)
+    score, graded = crud.grade_answers(answer_key, answers)
+    return crud.insert_submission(conn, assignment_id, student_id, score, graded)
+
+
+def import_sheets_one_by_one(pool, assignment_id, sheets):
+    for student_id, answers in sheets:
+        with pool.connection() as conn:
+            submit_bulk(conn, assignment_id, student_id, answers)
+
+
+def import_sheets_bulk(pool, assignment_id, sheets):
+    with pool.connection() as conn:
+        answer_key = crud.get_answer_key(conn, assignment_id)
+        graded = []
+        for student_id, answers in sheets:
+            score, rows = crud.grade_answers(answer_key, answers)
+            graded.append((student_id, score, rows))
+        crud.insert_submissions(conn, assignment_id, graded)
+
+
+def measure(pool, submit, assignment_id, answers, rounds):
+    samples = []
+    for student_id in range(rounds):
+        start = time.perf_counter()
+        with pool.connection() as conn:
+            submit(conn, assignment_id, student_id, answers)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.95) - 1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--questions", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--sheets", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pool = ConnectionPool(Path(tmp) / "bench.db", max_size=1)
+        with pool.connection() as conn:
+            migrations.migrate(conn)
+            conn.execute("INSERT INTO classroom (id, code) VALUES (1, 'BENCH')")
+
+        print(f"{'questions':>9} {'row-at-a-time p50/p95 (ms)':>28} {'bulk p50/p95 (ms)':>19}")
+        for assignment_id, count in enumerate(args.questions, start=1):
+            questions = [
+                {"question": f"Q{i}", "answer": f"A{i}", "options": [f"A{i}", "B", "C", "D"]}
+                for i in range(count)
+            ]
+            with pool.connection() as conn:
+                conn.execute("INSERT INTO assignments (id, classroom_id) VALUES (?, 1)", (assignment_id,))
+                crud.insert_questions(conn, assignment_id, questions)
+            answers = {str(i): (f"A{i}" if i % 3 else "B") for i in range(count)}
+
+            old = measure(pool, submit_row_at_a_time, assignment_id, answers, args.rounds)
+            new = measure(pool, submit_bulk, assignment_id, answers, args.rounds)
+            print(
+                f"{count:>9} {old[0]:>14.3f} / {old[1]:<11.3f} {new[0]:>8.3f} / {new[1]:<8.3f}"
+            )
+
+        print(f"\nimporting {args.sheets} sheets")
+        print(f"{'questions':>9} {'one by one (ms)':>16} {'bulk (ms)':>10}")
+        for assignment_id, count in enumerate(args.questions, start=1):
+            sheets = [
+                (student_id, {str(i): (f"A{i}" if (i + student_id) % 3 else "B") for i in range(count)})
+                for student_id in range(args.sheets)
+            ]
+            timings = []
+            for run in (import_sheets_one_by_one, import_sheets_bulk):
+                start = time.perf_counter()
+                run(pool, assignment_id, sheets)
+                timings.append((time.perf_counter() - start) * 1000)
+            print(f"{count:>9} {timings[0]:>16.1f} {timings[1]:>10.1f}")
+        pool.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+OpenAI-compatible stand-in LLM server with injectable latency and errors.
+
+Run from the backend directory, then point the API (or any OpenAI client)
+at it:
+
+    python -m benchmarks.llm_stub --port 8099 --latency 0.5 --error-rate 0.2
+    OPENAI_BASE_URL=http://127.0.0.1:8099/v1 OPENAI_API_KEY=stub uvicorn main:app
+
+``POST /v1/chat/completions`` answers quiz prompts with as many questions
+as they ask for and curriculum prompts with topics and objectives, in one
+response or streamed (``"stream": true``). Before answering, it waits
+``latency`` seconds (plus up to ``jitter``), then fails with
+``errorStatus`` for a fraction ``errorRate`` of requests. Faults can be
+read and changed while it runs, e.g. to take the provider down:
+
+    curl -X POST localhost:8099/faults -H 'Content-Type: application/json' \\
+         -d '{"errorRate": 1.0}'
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Dict, List
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+def respond(prompt: str) -> str:
+    """Deterministic model output for ``prompt``."""
+    seed = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:8]
+    if '"topics"' in prompt:
+        return json.dumps({
+            "topics": [f"Stub topic {i + 1} ({seed})" for i in range(5)],
+            "learningObjectives": [f"Explain stub idea {i + 1} ({seed})" for i in range(5)],
+        })
+    match = re.search(r"Create (\d+) questions", prompt)
+    count = int(match.group(1)) if match else 5
+    return json.dumps([
+        {
+            "question": f"Stub question {i + 1} ({seed}): what is {i} + {i}?",
+            "answer": str(2 * i),
+            "options": [str(2 * i), str(2 * i + 1), str(i), str(i + 2)],
+        }
+        for i in range(count)
+    ])
+
+
+def create_app(latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+               error_status: int = 503) -> FastAPI:
+    app = FastAPI()
+    faults: Dict[str, Any] = {
+        "latency": latency,
+        "jitter": jitter,
+        "errorRate": error_rate,
+        "errorStatus": error_status,
+    }
+    app.state.faults = faults
+    app.state.requests = 0
+
+    @app.get("/faults")
+    async def get_faults():
+        return {**faults, "requests": app.state.requests}
+
+    @app.post("/faults")
+    async def set_faults(changes: Dict[str, Any]):
+        faults.update({key: value for key, value in changes.items() if key in faults})
+        return faults
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        app.state.requests += 1
+        body = await request.json()
+        await asyncio.sleep(faults["latency"] + random.uniform(0, faults["jitter"]))
+        if random.random() < faults["errorRate"]:
+            status = int(faults["errorStatus"])
+            return JSONResponse(
+                {"error": {"message": "injected failure", "type": "server_error", "code": status}},
+                status_code=status,
+            )
+
+        prompt = "\n".join(
+            message.get("content") or "" for message in body.get("messages", [])
+            if isinstance(message.get("content"), str)
+        )
+        text = respond(prompt)
+        model = body.get("model", "stub")
+        usage = {
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": len(text) // 4,
+            "total_tokens": (len(prompt) + len(text)) // 4,
+        }
+        if body.get("stream"):
+            return StreamingResponse(_stream(text, model, usage), media_type="text/event-stream")
+        return {
+            "id": f"chatcmpl-stub-{app.state.requests}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        }
+
+    return app
+
+
+async def _stream(text: str, model: str, usage: Dict[str, int]) -> AsyncIterator[str]:
+    # One chunk per JSON object, like a model writing an array of questions
+    pieces: List[str] = re.split(r"(?<=\}),", text)
+    pieces = [piece if i == len(pieces) - 1 else piece + "," for i, piece in enumerate(pieces)]
+    base = {"id": "chatcmpl-stub", "object": "chat.completion.chunk",
+            "created": int(time.time()), "model": model}
+    for piece in pieces:
+        chunk = {**base, "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+        yield f"data: {json.dumps(chunk)}\n\n"
+        await asyncio.sleep(0)
+    final = {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "usage": usage}
+    yield f"data: {json.dumps(final)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds before answering")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failed")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of failures")
+    args = parser.parse_args()
+
+    import uvicorn
+
+    app = create_app(args.latency, args.jitter, args.error_rate, args.error_status)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
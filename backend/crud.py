@@ -0,0 +1,355 @@
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+# (question_id, normalized correct answer) pairs in question order.
+AnswerKey = Tuple[Tuple[int, str], ...]
+# (question_id, student_answer, is_correct) rows ready for submission_answers.
+GradedAnswer = Tuple[int, str, int]
+# (student_id, score, graded answers) for one submission.
+GradedSubmission = Tuple[int, int, List[GradedAnswer]]
+
+# Assignments whose answer keys are kept in memory per process.
+ANSWER_KEY_CACHE_SIZE = 1024
+
+_answer_keys: "OrderedDict[int, AnswerKey]" = OrderedDict()
+_answer_keys_lock = threading.Lock()
+
+
+def normalize_answer(value: Any) -> str:
+    return str(value or "").strip().lower()
+
+
+def grade_answers(
+    answer_key: AnswerKey, answers: Dict[str, Any]
+) -> Tuple[int, List[GradedAnswer]]:
+    """
+    Grade ``answers`` (``{"<question index>": answer}``) against a key from
+    ``get_answer_key`` in memory. Returns ``(score, graded_rows)``.
+    """
+    score = 0
+    graded: List[GradedAnswer] = []
+    for idx, (question_id, correct_answer) in enumerate(answer_key):
+        student_answer = answers.get(str(idx), "")
+        is_correct = int(normalize_answer(student_answer) == correct_answer)
+        score += is_correct
+        graded.append((question_id, student_answer, is_correct))
+    return score, graded
+
+
+def encode_options(options: Any) -> str:
+    if not options:
+        return "[]"
+    if isinstance(options, str):
+        # Legacy comma-separated form
+        options = [opt.strip() for opt in options.split(",") if opt.strip()]
+    return json.dumps([str(opt) for opt in options])
+
+
+def get_questions_json(conn: sqlite3.Connection, assignment_id: int) -> str:
+    """
+    The questions of an assignment as a JSON array of
+    ``{"id", "question", "answer", "options"}`` objects, built by SQLite.
+    """
+    row = conn.execute(
+        """
+        SELECT json_group_array(
+            json_object('id', id, 'question', question, 'answer', answer, 'options', json(options))
+        )
+        FROM (SELECT id, question, answer, options FROM questions WHERE assignment_id = ? ORDER BY id)
+        """,
+        (assignment_id,),
+    ).fetchone()
+    return row[0]
+
+
+def get_answer_key(conn: sqlite3.Connection, assignment_id: int) -> AnswerKey:
+    """
+    The assignment's ``(question_id, normalized answer)`` pairs in question
+    order. Questions are never edited after an assignment is created, so
+    keys are cached per process; an empty key (unknown assignment) is not.
+    """
+    with _answer_keys_lock:
+        answer_key = _answer_keys.get(assignment_id)
+        if answer_key is not None:
+            _answer_keys.move_to_end(assignment_id)
+            return answer_key
+    answer_key = tuple(
+        (question_id, normalize_answer(answer))
+        for question_id, answer in conn.execute(
+            "SELECT id, answer FROM questions WHERE assignment_id = ? ORDER BY id",
+            (assignment_id,),
+        )
+    )
+    if answer_key:
+        with _answer_keys_lock:
+            _answer_keys[assignment_id] = answer_key
+            while len(_answer_keys) > ANSWER_KEY_CACHE_SIZE:
+                _answer_keys.popitem(last=False)
+    return answer_key
+
+
+def insert_questions(
+    conn: sqlite3.Connection, assignment_id: int, questions: List[Dict]
+) -> None:
+    """
+    Insert every question of an assignment with a single executemany.
+    Options are stored as a JSON array.
+    """
+    rows = []
+    for q in questions:
+        rows.append(
+            (assignment_id, q.get("question", ""), q.get("answer", ""), encode_options(q.get("options")))
+        )
+    conn.executemany(
+        "INSERT INTO questions (assignment_id, question, answer, options) VALUES (?, ?, ?, ?)",
+        rows,
+    )
+
+
+def insert_assignment(
+    conn: sqlite3.Connection,
+    classroom_id: int,
+    title: str,
+    subject: str,
+    difficulty: str,
+    due_date: str,
+    questions: List[Dict],
+) -> int:
+    """Insert an assignment and its questions; returns the assignment id."""
+    cursor = conn.execute(
+        "INSERT INTO assignments (classroom_id, title, subject, difficulty, due_date, questions) VALUES (?, ?, ?, ?, ?, ?)",
+        (classroom_id, title, subject, difficulty, due_date, len(questions)),
+    )
+    assignment_id = cursor.lastrowid
+    insert_questions(conn, assignment_id, questions)
+    conn.execute(
+        "UPDATE classroom SET assignment_count = assignment_count + 1 WHERE id = ?",
+        (classroom_id,),
+    )
+    return assignment_id
+
+
+def insert_student(conn: sqlite3.Connection, name: str, classroom_id: int) -> int:
+    cursor = conn.execute(
+        "INSERT INTO students (name, classroom_id) VALUES (?, ?)",
+        (name, classroom_id),
+    )
+    conn.execute(
+        "UPDATE classroom SET student_count = student_count + 1 WHERE id = ?",
+        (classroom_id,),
+    )
+    return cursor.lastrowid
+
+
+def insert_submission(
+    conn: sqlite3.Connection,
+    assignment_id: int,
+    student_id: int,
+    score: int,
+    graded: List[GradedAnswer],
+    submitted_at: Optional[str] = None,
+) -> int:
+    """Write one already graded submission; returns its id."""
+    return insert_submissions(conn, assignment_id, [(student_id, score, graded)], submitted_at)[0]
+
+
+def insert_submissions(
+    conn: sqlite3.Connection,
+    assignment_id: int,
+    submissions: Sequence[GradedSubmission],
+    submitted_at: Optional[str] = None,
+) -> List[int]:
+    """
+    Write already graded submissions for one assignment: each submission
+    row (with its final score) once, then every answer of every submission
+    with one executemany. The classroom's summary counters are updated once,
+    in the same transaction. Returns the submission ids in input order.
+    """
+    if not submissions:
+        return []
+    if submitted_at is None:
+        submitted_at = datetime.utcnow().isoformat()
+    # Students in this batch who already submitted, for completed_count
+    submitted = {
+        row[0] for row in conn.execute(
+            "SELECT DISTINCT student_id FROM submissions "
+            "WHERE assignment_id = ? AND student_id IN (SELECT value FROM json_each(?))",
+            (assignment_id, json.dumps(sorted({student_id for student_id, _, _ in submissions}))),
+        )
+    }
+    submission_ids: List[int] = []
+    answer_rows = []
+    first_attempts = score_sum = total_sum = 0
+    for student_id, score, graded in submissions:
+        if student_id not in submitted:
+            submitted.add(student_id)
+            first_attempts += 1
+        cursor = conn.execute(
+            "INSERT INTO submissions (assignment_id, student_id, submitted_at, score, total, status) VALUES (?, ?, ?, ?, ?, ?)",
+            (assignment_id, student_id, submitted_at, score, len(graded), "completed"),
+        )
+        submission_id = cursor.lastrowid
+        submission_ids.append(submission_id)
+        answer_rows.extend(
+            (submission_id, question_id, answer, is_correct) for question_id, answer, is_correct in graded
+        )
+        score_sum += score
+        total_sum += len(graded)
+    conn.executemany(
+        "INSERT INTO submission_answers (submission_id, question_id, student_answer, is_correct) VALUES (?, ?, ?, ?)",
+        answer_rows,
+    )
+    conn.execute(
+        """
+        UPDATE classroom SET
+            submission_count = submission_count + ?,
+            completed_count = completed_count + ?,
+            score_sum = score_sum + ?,
+            total_sum = total_sum + ?
+        WHERE id = (SELECT classroom_id FROM assignments WHERE id = ?)
+        """,
+        (len(submissions), first_attempts, score_sum, total_sum, assignment_id),
+    )
+    return submission_ids
+
+
+def get_classroom_summary(conn: sqlite3.Connection, classroom_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Classroom details plus its counters, read from the classroom row alone,
+    so the cost doesn't depend on class size.
+    """
+    row = conn.execute(
+        """
+        SELECT code, name, subject, pdf_filename, teacher_id, student_count,
+               assignment_count, submission_count, completed_count, score_sum, total_sum
+        FROM classroom WHERE id = ?
+        """,
+        (classroom_id,),
+    ).fetchone()
+    if row is None:
+        return None
+    (code, name, subject, pdf_filename, teacher_id, student_count,
+     assignment_count, submission_count, completed_count, score_sum, total_sum) = row
+    possible = student_count * assignment_count
+    return {
+        "classCode": code,
+        "className": name,
+        "subject": subject,
+        "pdf_filename": pdf_filename,
+        "teacherId": teacher_id,
+        "studentCount": student_count,
+        "activeQuizCount": assignment_count,
+        "submissionCount": submission_count,
+        # Percentage of all answers marked correct
+        "averageScore": round(100.0 * score_sum / total_sum, 1) if total_sum else None,
+        # Share of (student, quiz) pairs with at least one submission
+        "completionRate": round(min(completed_count / possible, 1.0), 3) if possible else None,
+    }
+
+
+def get_assignment_classroom_id(conn: sqlite3.Connection, assignment_id: int) -> Optional[int]:
+    row = conn.execute(
+        "SELECT classroom_id FROM assignments WHERE id = ?", (assignment_id,)
+    ).fetchone()
+    return row[0] if row else None
+
+
+def get_assignment_results(conn: sqlite3.Connection, assignment_id: int) -> Dict[str, Any]:
+    """
+    Live-results snapshot of an assignment: each student's latest
+    submission, oldest first, and the newest submission id covered (later
+    submission events are the deltas to apply on top).
+    """
+    rows = conn.execute(
+        """
+        SELECT s.id, s.student_id, st.name, s.score, s.total
+        FROM submissions s
+        LEFT JOIN students st ON st.id = s.student_id
+        WHERE s.id IN (
+            SELECT MAX(id) FROM submissions WHERE assignment_id = ? GROUP BY student_id
+        )
+        ORDER BY s.id
+        """,
+        (assignment_id,),
+    ).fetchall()
+    return {
+        "assignmentId": assignment_id,
+        "students": [
+            {"studentId": student_id, "name": name, "submissionId": submission_id,
+             "score": score, "total": total}
+            for submission_id, student_id, name, score, total in rows
+        ],
+        "lastSubmissionId": rows[-1][0] if rows else 0,
+    }
+
+
+def get_classroom_results(conn: sqlite3.Connection, classroom_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Live-results snapshot of a classroom: its summary, plus the students
+    who have submitted each assignment. None if the classroom doesn't
+    exist.
+    """
+    summary = get_classroom_summary(conn, classroom_id)
+    if summary is None:
+        return None
+    submitted: Dict[int, List[int]] = {}
+    last_submission_id = 0
+    for assignment_id, student_id, last in conn.execute(
+        """
+        SELECT assignment_id, student_id, MAX(id)
+        FROM submissions
+        WHERE assignment_id IN (SELECT id FROM assignments WHERE classroom_id = ?)
+        GROUP BY assignment_id, student_id
+        """,
+        (classroom_id,),
+    ):
+        submitted.setdefault(assignment_id, []).append(student_id)
+        last_submission_id = max(last_submission_id, last)
+    return {
+        "classroomId": classroom_id,
+        "summary": summary,
+        "assignments": [
+            {"assignmentId": assignment_id, "studentIds": student_ids}
+            for assignment_id, student_ids in submitted.items()
+        ],
+        "lastSubmissionId": last_submission_id,
+    }
+
+
+def recompute_classroom_counters(conn: sqlite3.Connection, classroom_id: Optional[int] = None) -> int:
+    """
+    Rebuild the classroom counters from the underlying tables, for one
+    classroom or all of them. Returns the number of classrooms updated.
+    """
+    sql = """
+        UPDATE classroom SET
+            student_count = (SELECT COUNT(*) FROM students s WHERE s.classroom_id = classroom.id),
+            assignment_count = (SELECT COUNT(*) FROM assignments a WHERE a.classroom_id = classroom.id),
+            submission_count = (
+                SELECT COUNT(*) FROM submissions sub
+                JOIN assignments a ON sub.assignment_id = a.id
+                WHERE a.classroom_id = classroom.id
+            ),
+            completed_count = (
+                SELECT COUNT(DISTINCT sub.assignment_id || ':' || sub.student_id) FROM submissions sub
+                JOIN assignments a ON sub.assignment_id = a.id
+                WHERE a.classroom_id = classroom.id
+            ),
+            score_sum = (
+                SELECT COALESCE(SUM(sub.score), 0) FROM submissions sub
+                JOIN assignments a ON sub.assignment_id = a.id
+                WHERE a.classroom_id = classroom.id
+            ),
+            total_sum = (
+                SELECT COALESCE(SUM(sub.total), 0) FROM submissions sub
+                JOIN assignments a ON sub.assignment_id = a.id
+                WHERE a.classroom_id = classroom.id
+            )
+    """
+    if classroom_id is None:
+        return conn.execute(sql).rowcount
+    return conn.execute(sql + " WHERE id = ?", (classroom_id,)).rowcount
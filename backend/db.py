@@ -1,20 +1,223 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, Optional
 
-DATABASE_URL = "sqlite:///./app.db"
+try:
+    from .metrics import DB_QUERY_SECONDS  # type: ignore
+except ImportError:
+    from metrics import DB_QUERY_SECONDS  # type: ignore
 
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False}
+DB_PATH = Path(os.getenv("DATABASE_PATH", Path(__file__).parent / "database.db"))
+
+# Pragmas applied once, when a pooled connection is first opened.
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA cache_size = -16000",  # ~16MB page cache per connection
+    "PRAGMA mmap_size = 268435456",  # 256MB memory-mapped I/O
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA busy_timeout = 5000",
+)
+
+# Statement kinds timed separately; anything else counts as "OTHER".
+STATEMENT_KINDS = frozenset(
+    ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE", "PRAGMA", "CREATE")
 )
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
 
+def statement_kind(sql: str) -> str:
+    words = sql.split(None, 1)
+    kind = words[0].upper() if words else ""
+    return kind if kind in STATEMENT_KINDS else "OTHER"
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Cursor whose statements are timed in ``db_query_duration_seconds``."""
+
+    def execute(self, sql: str, parameters: Any = ()) -> "InstrumentedCursor":
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - start, statement_kind(sql))
+
+    def executemany(self, sql: str, seq_of_parameters: Any) -> "InstrumentedCursor":
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - start, statement_kind(sql))
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    Connection that times every statement, and every commit, in
+    ``db_query_duration_seconds`` by statement kind. Statements run
+    through ``cursor()`` are timed by ``InstrumentedCursor``.
+    """
+
+    def cursor(self, factory: Any = InstrumentedCursor) -> sqlite3.Cursor:
+        return super().cursor(factory)
+
+    def execute(self, sql: str, parameters: Any = ()) -> sqlite3.Cursor:
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - start, statement_kind(sql))
+
+    def executemany(self, sql: str, seq_of_parameters: Any) -> sqlite3.Cursor:
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - start, statement_kind(sql))
+
+    def executescript(self, sql_script: str) -> sqlite3.Cursor:
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - start, "SCRIPT")
+
+    def commit(self) -> None:
+        start = time.perf_counter()
+        try:
+            super().commit()
+        finally:
+            DB_QUERY_SECONDS.observe(time.perf_counter() - start, "COMMIT")
+
+
+class ConnectionPool:
+    """
+    Bounded pool of SQLite connections shared by every request handler.
+
+    Connections are opened lazily (up to ``max_size``), configured once
+    with ``PRAGMAS`` and then reused, so each request only pays for a
+    queue get/put instead of a full ``sqlite3.connect``. Each connection
+    keeps its own prepared-statement cache (``cached_statements``).
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_size: int = 8,
+        timeout: float = 10.0,
+        cached_statements: int = 256,
+    ) -> None:
+        self.path = path
+        self.max_size = max_size
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self._idle: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            timeout=self.timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+            factory=InstrumentedConnection,
+        )
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._opened < self.max_size:
+                self._opened += 1
+                open_new = True
+            else:
+                open_new = False
+
+        if open_new:
+            try:
+                return self._connect()
+            except Exception:
+                with self._lock:
+                    self._opened -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(
+                f"No database connection available after {self.timeout}s"
+            ) from None
+
+    def release(self, conn: sqlite3.Connection) -> None:
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+    def discard(self, conn: sqlite3.Connection) -> None:
+        try:
+            conn.close()
+        finally:
+            with self._lock:
+                self._opened -= 1
+
+    def close(self) -> None:
+        """Close every idle connection (connections in use are left alone)."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self.discard(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Borrow a connection for the duration of the ``with`` block.
+
+        The transaction is committed when the block exits normally and
+        rolled back if it raises.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            try:
+                self.release(conn)
+            except sqlite3.Error:
+                # Rollback failed, so the connection is in an unknown state.
+                self.discard(conn)
+            raise
+        else:
+            self.release(conn)
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    DB_PATH,
+                    max_size=int(os.getenv("DATABASE_POOL_SIZE", "8")),
+                )
+    return _pool
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
 
+def get_connection():
+    """Shortcut for ``get_pool().connection()``."""
+    return get_pool().connection()
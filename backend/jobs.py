@@ -0,0 +1,314 @@
+"""
+SQLite-backed background job queue.
+
+Slow AI work (quiz generation, curriculum extraction) is enqueued as a row
+in the ``jobs`` table and executed by a small pool of asyncio worker tasks
+inside the server process; no external broker is involved. Because jobs
+live in the database, work queued before a restart is picked up again, and
+several server processes can share one queue: a worker claims a job with a
+single UPDATE, and holds it under a lease so that a job whose worker died
+is retried once the lease expires.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import AbstractContextManager
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+# Returns a context manager yielding a sqlite3 connection that commits on
+# success (``db.get_connection``).
+ConnectionFactory = Callable[[], AbstractContextManager]
+# Coroutine function run for a job; receives the job payload and returns a
+# JSON-serializable result.
+JobHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+# Called in a worker thread with the payload once a job is done for good
+# (succeeded, failed its last attempt or cancelled), e.g. to delete files
+# the payload refers to.
+JobFinalizer = Callable[[Dict[str, Any]], None]
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+# A running job not finished within this many seconds is assumed to have
+# lost its worker and becomes claimable again.
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "300"))
+# Delay before retry n is RETRY_BASE_SECONDS * 2 ** (n - 1).
+RETRY_BASE_SECONDS = 2.0
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+logger = logging.getLogger(__name__)
+
+
+def _row_to_job(row: Tuple) -> Dict[str, Any]:
+    (job_id, kind, status, attempts, max_attempts, result, error,
+     created_at, started_at, finished_at) = row
+    return {
+        "id": job_id,
+        "kind": kind,
+        "status": status,
+        "attempts": attempts,
+        "maxAttempts": max_attempts,
+        "result": json.loads(result) if result is not None else None,
+        "error": error,
+        "createdAt": created_at,
+        "startedAt": started_at,
+        "finishedAt": finished_at,
+    }
+
+
+class JobQueue:
+    """
+    Persistent queue plus the worker pool that drains it.
+
+    ``handlers`` maps a job kind to the coroutine function that runs it,
+    and ``finalizers`` optionally maps it to cleanup run once the job is done.
+    Call ``start`` from the running event loop (application startup) and
+    ``stop`` on shutdown; ``enqueue``, ``get``, ``cancel`` and ``metrics``
+    may be called at any time.
+    """
+
+    def __init__(
+        self,
+        connection_factory: ConnectionFactory,
+        handlers: Dict[str, JobHandler],
+        workers: int = JOB_WORKERS,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        lease_seconds: float = JOB_LEASE_SECONDS,
+        poll_interval: float = 1.0,
+        finalizers: Optional[Dict[str, JobFinalizer]] = None,
+    ) -> None:
+        self._connect = connection_factory
+        self.handlers = handlers
+        self.finalizers = finalizers or {}
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[int, asyncio.Task] = {}
+        self._cancelled: Set[int] = set()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # -- producer side -------------------------------------------------
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], max_attempts: Optional[int] = None) -> int:
+        """Persist a job and wake a worker; returns the job id."""
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        now = time.time()
+        with self._connect() as conn:
+            job_id = conn.execute(
+                "INSERT INTO jobs (kind, payload, status, max_attempts, run_at, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (kind, json.dumps(payload), QUEUED, max_attempts or self.max_attempts, now, now),
+            ).lastrowid
+        self._wake()
+        return job_id
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT id, kind, status, attempts, max_attempts, result, error, "
+                "created_at, started_at, finished_at FROM jobs WHERE id = ?",
+                (job_id,),
+            ).fetchone()
+        return _row_to_job(row) if row else None
+
+    def cancel(self, job_id: int) -> bool:
+        """
+        Cancel a queued or running job. Returns False if the job doesn't
+        exist or has already finished. A job running in another process
+        is marked cancelled and its eventual result is discarded.
+        """
+        with self._connect() as conn:
+            updated = conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status IN (?, ?) "
+                "RETURNING kind, payload, lease_expires",
+                (CANCELLED, time.time(), job_id, QUEUED, RUNNING),
+            ).fetchone()
+        if updated is None:
+            return False
+        kind, payload, lease_expires = updated
+        task = self._running.get(job_id)
+        if task is not None and self._loop is not None:
+            self._cancelled.add(job_id)
+            self._loop.call_soon_threadsafe(task.cancel)
+        elif lease_expires is None:
+            # It was queued, so no worker will finish it
+            self._finalize(kind, payload)
+        return True
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth by status, age of the oldest queued job, and workers."""
+        now = time.time()
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            oldest = conn.execute(
+                "SELECT MIN(created_at) FROM jobs WHERE status = ?", (QUEUED,)
+            ).fetchone()[0]
+        return {
+            "queued": counts.get(QUEUED, 0),
+            "running": counts.get(RUNNING, 0),
+            "succeeded": counts.get(SUCCEEDED, 0),
+            "failed": counts.get(FAILED, 0),
+            "cancelled": counts.get(CANCELLED, 0),
+            "oldestQueuedSeconds": round(now - oldest, 3) if oldest is not None else None,
+            "workers": len(self._tasks),
+            "busyWorkers": len(self._running),
+        }
+
+    # -- worker side ---------------------------------------------------
+
+    def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """
+        Stop the workers. Jobs they were running go back to the queue,
+        without using up an attempt, to be run after the next start.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+    def _wake(self) -> None:
+        if self._loop is not None and self._wakeup is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _worker(self) -> None:
+        while True:
+            # Cleared before looking, so an enqueue during the claim isn't missed
+            self._wakeup.clear()
+            claim = asyncio.ensure_future(asyncio.to_thread(self._claim))
+            try:
+                job = await asyncio.shield(claim)
+            except asyncio.CancelledError:
+                # Stopping mid-claim: hand a just-claimed job back
+                job = await claim
+                if job is not None:
+                    await asyncio.to_thread(self._requeue, job[0])
+                raise
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(*job)
+
+    def _claim(self):
+        now = time.time()
+        with self._connect() as conn:
+            # A job whose worker died during its last attempt is not run again
+            expired = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?, lease_expires = NULL "
+                "WHERE status = ? AND lease_expires < ? AND attempts >= max_attempts "
+                "RETURNING kind, payload",
+                (FAILED, "Lease expired on the last attempt", now, RUNNING, now),
+            ).fetchall()
+            job = conn.execute(
+                """
+                UPDATE jobs SET status = ?, attempts = attempts + 1,
+                    started_at = ?, lease_expires = ?
+                WHERE id = (
+                    SELECT id FROM jobs
+                    WHERE (status = ? AND run_at <= ?)
+                       OR (status = ? AND lease_expires < ? AND attempts < max_attempts)
+                    ORDER BY id LIMIT 1
+                )
+                RETURNING id, kind, payload, attempts, max_attempts
+                """,
+                (RUNNING, now, now + self.lease_seconds, QUEUED, now, RUNNING, now),
+            ).fetchone()
+        for kind, payload in expired:
+            self._finalize(kind, payload)
+        return job
+
+    async def _run(self, job_id: int, kind: str, payload: str, attempts: int, max_attempts: int) -> None:
+        handler = self.handlers.get(kind)
+        task = asyncio.create_task(
+            handler(json.loads(payload)) if handler else self._unknown(kind)
+        )
+        self._running[job_id] = task
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if job_id in self._cancelled:
+                # Cancelled through cancel(); the row is already updated
+                await asyncio.to_thread(self._finalize, kind, payload)
+                return
+            # The worker itself is stopping
+            task.cancel()
+            await asyncio.to_thread(self._requeue, job_id)
+            raise
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"
+            if attempts < max_attempts:
+                delay = RETRY_BASE_SECONDS * 2 ** (attempts - 1)
+                await asyncio.to_thread(
+                    self._settle, job_id, kind, payload,
+                    "status = ?, error = ?, run_at = ?", (QUEUED, error, time.time() + delay),
+                    False,
+                )
+            else:
+                await asyncio.to_thread(
+                    self._settle, job_id, kind, payload,
+                    "status = ?, error = ?, finished_at = ?", (FAILED, error, time.time()),
+                )
+        else:
+            await asyncio.to_thread(
+                self._settle, job_id, kind, payload,
+                "status = ?, result = ?, error = NULL, finished_at = ?",
+                (SUCCEEDED, json.dumps(result), time.time()),
+            )
+        finally:
+            self._running.pop(job_id, None)
+            self._cancelled.discard(job_id)
+
+    def _requeue(self, job_id: int) -> None:
+        # Put a job back without counting the interrupted attempt
+        self._finish(job_id, "status = ?, attempts = attempts - 1, run_at = ?", (QUEUED, time.time()))
+
+    def _finish(self, job_id: int, assignments: str, params: tuple) -> bool:
+        # Only a job still marked running is updated, so a cancellation
+        # recorded meanwhile (possibly by another process) wins.
+        with self._connect() as conn:
+            return conn.execute(
+                f"UPDATE jobs SET {assignments}, lease_expires = NULL WHERE id = ? AND status = ?",
+                params + (job_id, RUNNING),
+            ).rowcount > 0
+
+    def _settle(self, job_id: int, kind: str, payload: str, assignments: str, params: tuple,
+                final: bool = True) -> None:
+        # Recorded and cleaned up in one thread call, so a worker stopped
+        # in between can't leave the job's files behind. A retry that
+        # wasn't requeued (it was cancelled meanwhile, in any process) is
+        # done for good too.
+        requeued = self._finish(job_id, assignments, params) and not final
+        if not requeued:
+            self._finalize(kind, payload)
+
+    def _finalize(self, kind: str, payload: str) -> None:
+        finalizer = self.finalizers.get(kind)
+        if finalizer is None:
+            return
+        try:
+            finalizer(json.loads(payload))
+        except Exception:
+            logger.exception("Finalizer for %s job failed", kind)
+
+    @staticmethod
+    async def _unknown(kind: str) -> None:
+        raise ValueError(f"No handler for job kind: {kind}")
@@ -0,0 +1,90 @@
+"""
+In-process publish/subscribe for live classroom results.
+
+Submissions are published to the topic of their assignment and of its
+classroom (``assignment_topic`` / ``classroom_topic``); each WebSocket
+subscriber has a bounded queue that ``publish`` fills without waiting.
+Events are encoded once per publish and the same text is fanned out to
+every subscriber. A subscriber that falls more than ``max_pending``
+events behind is flagged to resynchronize from a fresh snapshot instead
+of slowing down publishers.
+
+Only subscribers in the publishing process are reached: when running
+several server processes, teachers must be routed to the process their
+students submit to (or events bridged between processes).
+"""
+import asyncio
+import json
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+
+# Events buffered per subscriber before it is told to resynchronize.
+LIVE_MAX_PENDING = 1000
+
+
+def assignment_topic(assignment_id: int) -> str:
+    return f"assignment:{assignment_id}"
+
+
+def classroom_topic(classroom_id: int) -> str:
+    return f"classroom:{classroom_id}"
+
+
+class Subscription:
+    """One subscriber's queue of ``(event, encoded event)`` pairs."""
+
+    def __init__(self, max_pending: int) -> None:
+        self.queue: "asyncio.Queue[Tuple[Dict[str, Any], str]]" = asyncio.Queue(max_pending)
+        # Set when events were dropped; the subscriber should discard what
+        # is queued and start again from a snapshot.
+        self.overflowed = False
+
+    def put(self, event: Dict[str, Any], message: str) -> None:
+        try:
+            self.queue.put_nowait((event, message))
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+    def reset(self) -> None:
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.overflowed = False
+
+
+class LiveResults:
+    """
+    Topic-based fan-out. ``subscribe`` and ``publish`` must be called from
+    the event loop thread (async endpoints); nothing here blocks.
+    """
+
+    def __init__(self, max_pending: int = LIVE_MAX_PENDING) -> None:
+        self.max_pending = max_pending
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+
+    @contextmanager
+    def subscribe(self, topic: str) -> Iterator[Subscription]:
+        subscription = Subscription(self.max_pending)
+        self._subscribers.setdefault(topic, set()).add(subscription)
+        try:
+            yield subscription
+        finally:
+            subscribers = self._subscribers.get(topic)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[topic]
+
+    def has_subscribers(self, topic: Optional[str] = None) -> bool:
+        if topic is None:
+            return bool(self._subscribers)
+        return topic in self._subscribers
+
+    def publish(self, topic: str, event: Dict[str, Any]) -> int:
+        """Queue ``event`` for every subscriber of ``topic``; returns how many."""
+        subscribers = self._subscribers.get(topic)
+        if not subscribers:
+            return 0
+        message = json.dumps(event, separators=(",", ":"))
+        for subscription in subscribers:
+            subscription.put(event, message)
+        return len(subscribers)
@@ -1,27 +1,161 @@
-from fastapi import FastAPI, UploadFile, File, Request, Body
+import asyncio
+from fastapi import FastAPI, UploadFile, File, Request, Body, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import sqlite3
-from pathlib import Path
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+import hashlib
+import json
+import logging
+import math
+import os
 import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from functools import wraps
+from typing import AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
 from fastapi import Query
-from datetime import datetime
+
+try:
+    from .db import get_connection, get_pool  # type: ignore
+    from . import analytics, crud, jobs, live, metrics, migrations, ratelimit  # type: ignore
+except ImportError:
+    from db import get_connection, get_pool  # type: ignore
+    import analytics  # type: ignore
+    import crud  # type: ignore
+    import jobs  # type: ignore
+    import live  # type: ignore
+    import metrics  # type: ignore
+    import migrations  # type: ignore
+    import ratelimit  # type: ignore
 
 try:
     # When running as a package: `uvicorn Minerva.backend.main:app` or similar
     from .agents.quiz import QuizAgent  # type: ignore
     from .agents.curriculum import CurriculumAgent  # type: ignore
+    from .agents.cache import GenerationCache  # type: ignore
+    from .agents.documents import CurriculumStore  # type: ignore
+    from .agents.question_bank import QuestionBank  # type: ignore
+    from .agents.passages import PassageIndex  # type: ignore
+    from .agents.pdf_text import shutdown_executor  # type: ignore
 except ImportError:
     # When running from the backend directory: `uvicorn main:app`
     try:
         from agents.quiz import QuizAgent  # type: ignore
         from agents.curriculum import CurriculumAgent  # type: ignore
+        from agents.cache import GenerationCache  # type: ignore
+        from agents.documents import CurriculumStore  # type: ignore
+        from agents.question_bank import QuestionBank  # type: ignore
+        from agents.passages import PassageIndex  # type: ignore
+        from agents.pdf_text import shutdown_executor  # type: ignore
     except ImportError:
         QuizAgent = None  # type: ignore
         CurriculumAgent = None  # type: ignore
+        GenerationCache = None  # type: ignore
+        CurriculumStore = None  # type: ignore
+        QuestionBank = None  # type: ignore
+        PassageIndex = None  # type: ignore
+        shutdown_executor = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# Largest curriculum PDF accepted, and the chunk size used to read uploads.
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Allowance for multipart boundaries and headers around the file itself.
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+# Where uploads processed by background jobs are kept, named by SHA-256.
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "uploads"))
+# Estimated tokens of curriculum excerpts added to a quiz generation prompt.
+QUIZ_CONTEXT_TOKENS = int(os.getenv("QUIZ_CONTEXT_TOKENS", "1500"))
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Reject oversized uploads from their Content-Length header, before the
+    multipart body is read or spooled at all.
+    """
+
+    def __init__(self, app, path: str, max_bytes: int) -> None:
+        self.app = app
+        self.path = path
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == self.path:
+            for name, value in scope["headers"]:
+                if name == b"content-length":
+                    if value.isdigit() and int(value) > self.max_bytes:
+                        response = JSONResponse(
+                            status_code=413, content={"error": "File too large"}
+                        )
+                        await response(scope, receive, send)
+                        return
+                    break
+        await self.app(scope, receive, send)
 
-app = FastAPI()
 
+class RequestMetricsMiddleware:
+    """
+    Time every HTTP request into ``http_request_duration_seconds``, labelled
+    by route template (``/api/assignments/{assignment_id}/questions``)
+    rather than the raw path, so the number of series stays bounded.
+    Streaming responses are timed until their last chunk is sent.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router records the matched route in the scope
+            route = scope.get("route")
+            metrics.HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                str(status),
+            )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Bring the SQLite schema up to date before serving requests
+    with get_connection() as conn:
+        migrations.migrate(conn)
+    job_queue.start()
+    yield
+    await job_queue.stop()
+    if shutdown_executor is not None:
+        shutdown_executor()
+    get_pool().close()
+
+
+app = FastAPI(lifespan=lifespan)
+
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    path="/api/upload/curriculum",
+    max_bytes=MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES,
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -29,98 +163,248 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so the time spent in the other middleware is included
+app.add_middleware(RequestMetricsMiddleware)
 
-# sInitialize SQLite database and create 'classroom' table if it doesn't exist
-DB_PATH = Path(__file__).parent / 'database.db'
-conn = sqlite3.connect(DB_PATH)
-cursor = conn.cursor()
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS classroom (
-        id INTEGER PRIMARY KEY,
-        code TEXT,
-        name TEXT,
-        subject TEXT,
-        pdf_filename TEXT,
-        teacher_id TEXT
-    )
-''')
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS students (
-        id INTEGER PRIMARY KEY,
-        name TEXT,
-        classroom_id INTEGER,
-        FOREIGN KEY(classroom_id) REFERENCES classroom(id)
-    )
-''')
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS assignments (
-        id INTEGER PRIMARY KEY,
-        classroom_id INTEGER,
-        title TEXT,
-        subject TEXT,
-        difficulty TEXT,
-        due_date TEXT,
-        questions INTEGER,
-        FOREIGN KEY(classroom_id) REFERENCES classroom(id)
-    )
-''')
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS questions (
-        id INTEGER PRIMARY KEY,
-        assignment_id INTEGER,
-        question TEXT,
-        answer TEXT,
-        options TEXT,
-        FOREIGN KEY(assignment_id) REFERENCES assignments(id)
-    )
-''')
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS submissions (
-        id INTEGER PRIMARY KEY,
-        assignment_id INTEGER,
-        student_id INTEGER,
-        submitted_at TEXT,
-        score INTEGER,
-        total INTEGER,
-        status TEXT DEFAULT 'pending',
-        FOREIGN KEY(assignment_id) REFERENCES assignments(id),
-        FOREIGN KEY(student_id) REFERENCES students(id)
+# Agents are built on first use: constructing one imports LangChain and
+# creates the OpenAI client, which read-only workers never need. That
+# takes over a second, so async code gets them through ``built_off_loop``.
+def build_once(factory: Callable):
+    """
+    Memoize a no-argument factory. Unlike ``lru_cache``, threads racing
+    on the first call wait for a single construction.
+    """
+    lock = threading.Lock()
+    built: List = []
+
+    @wraps(factory)
+    def get():
+        if not built:
+            with lock:
+                if not built:
+                    built.append(factory())
+        return built[0]
+
+    get.is_built = lambda: bool(built)
+    return get
+
+
+async def built_off_loop(getter):
+    """``getter()``, constructing it in a worker thread the first time."""
+    if getter.is_built():
+        return getter()
+    return await asyncio.to_thread(getter)
+
+
+@build_once
+def get_quiz_agent():
+    if QuizAgent is None:
+        return None
+    return QuizAgent(cache=GenerationCache(get_connection), bank=QuestionBank(get_connection))
+
+
+@build_once
+def get_curriculum_store():
+    return CurriculumStore(get_connection) if CurriculumStore is not None else None
+
+
+@build_once
+def get_passage_index():
+    return PassageIndex(get_connection) if PassageIndex is not None else None
+
+
+@build_once
+def get_curriculum_agent():
+    if CurriculumAgent is None:
+        return None
+    return CurriculumAgent(
+        store=get_curriculum_store(),
+        passages=get_passage_index(),
+        section_cache=GenerationCache(
+            get_connection, max_entries=2048, table="curriculum_section_cache"
+        ),
     )
-''')
-# Add status column to existing table if not present
-try:
-    cursor.execute("ALTER TABLE submissions ADD COLUMN status TEXT DEFAULT 'pending'")
-except Exception:
-    pass  # Ignore if already exists
-cursor.execute('''
-    CREATE TABLE IF NOT EXISTS submission_answers (
-        id INTEGER PRIMARY KEY,
-        submission_id INTEGER,
-        question_id INTEGER,
-        student_answer TEXT,
-        is_correct INTEGER,
-        FOREIGN KEY(submission_id) REFERENCES submissions(id),
-        FOREIGN KEY(question_id) REFERENCES questions(id)
+
+
+def find_curriculum_context(
+    data: dict, title: str, subject: str, classroom_id: Optional[int] = None
+) -> Optional[str]:
+    """
+    Curriculum excerpts relevant to a quiz, within ``QUIZ_CONTEXT_TOKENS``.
+
+    The document is ``data["documentId"]`` (as returned by the upload
+    endpoint), else the latest upload named ``data["pdf_filename"]``, else
+    the classroom's PDF. Returns None when there is no such document.
+    """
+    store = get_curriculum_store()
+    passages = get_passage_index()
+    if store is None or passages is None:
+        return None
+    digest = data.get("documentId")
+    if not digest:
+        filename = data.get("pdf_filename")
+        if not filename and classroom_id is not None:
+            with get_connection() as conn:
+                row = conn.execute(
+                    "SELECT pdf_filename FROM classroom WHERE id = ?", (classroom_id,)
+                ).fetchone()
+            filename = row[0] if row else None
+        document = store.find_by_filename(filename) if filename else None
+        if document is None:
+            return None
+        digest = document["digest"]
+    if not passages.has(digest):
+        # Uploaded before passages were indexed
+        text = store.get_text(digest)
+        if not text:
+            return None
+        passages.index_text(digest, text)
+    excerpts = passages.search(digest, f"{title} {subject}", QUIZ_CONTEXT_TOKENS)
+    return "\n\n".join(excerpts) or None
+
+
+async def curriculum_context(
+    data: dict, title: str, subject: str, classroom_id: Optional[int] = None
+) -> Optional[str]:
+    try:
+        return await asyncio.to_thread(find_curriculum_context, data, title, subject, classroom_id)
+    except Exception:
+        # Quizzes can always be generated without curriculum grounding
+        return None
+
+# AI generation requests per teacher, to protect the LLM budget and the
+# worker slots during spikes.
+generation_limiter = ratelimit.RateLimiter()
+
+def rate_limited(request: Request, teacher_id=None, cost: int = 1) -> Optional[JSONResponse]:
+    """
+    Charge a generation request to its client address and, when given,
+    its teacher (``teacherId``); ``cost`` is the number of generations.
+    The address bucket stops a client from escaping the limit by sending
+    a different teacherId each time. Returns the 429 response to send
+    when over the limit, else None.
+    """
+    keys = [f"client:{request.client.host if request.client else 'unknown'}"]
+    if teacher_id:
+        keys.append(f"teacher:{teacher_id}")
+    retry_after = generation_limiter.acquire(*keys, cost=cost)
+    if retry_after is None:
+        return None
+    metrics.GENERATION_RATE_LIMITED.inc()
+    return JSONResponse(
+        status_code=429,
+        headers={"Retry-After": str(math.ceil(retry_after))},
+        content={"error": "Too many generation requests; try again later"},
     )
-''')
-conn.commit()
-conn.close()
 
-quiz_agent = QuizAgent() if QuizAgent is not None else None
-curriculum_agent = CurriculumAgent() if "CurriculumAgent" in globals() and CurriculumAgent is not None else None
+def preview_mock_questions(title: str, subject: str, difficulty: str) -> List[Dict]:
+    return [
+        {
+            "question": f"What is the main concept in {subject} covered in {title}?",
+            "options": ["Option A", "Option B", "Option C", "Option D"],
+            "answer": "Option A"
+        },
+        {
+            "question": "Solve for x: 2x + 3 = 7.",
+            "options": ["x=1", "x=2", "x=3", "x=4"],
+            "answer": "x=2"
+        },
+        {
+            "question": f"Which of the following best describes {difficulty} level content?",
+            "options": ["Easy", "Medium", "Hard", "Expert"],
+            "answer": difficulty
+        }
+    ]
+
+async def iterate(items: List[Dict]) -> AsyncIterator[Dict]:
+    for item in items:
+        yield item
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def save_upload(stream, digest: str) -> str:
+    # One file per upload, even for identical PDFs: each job removes its own
+    # file when done (remove_upload), so files can't be shared.
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix=f"{digest}.", suffix=".pdf", dir=UPLOAD_DIR)
+    stream.seek(0)
+    with os.fdopen(fd, "wb") as out:
+        shutil.copyfileobj(stream, out, UPLOAD_CHUNK_SIZE)
+    return path
+
+def remove_upload(payload: dict) -> None:
+    try:
+        os.remove(payload["path"])
+    except FileNotFoundError:
+        pass
+
+def mock_questions(title: str, num_questions: int) -> List[Dict]:
+    return [
+        {
+            "question": f"Sample question {i+1} for {title}",
+            "answer": f"Sample answer {i+1}",
+            "options": [f"Option {chr(65+j)}" for j in range(4)],
+        }
+        for i in range(num_questions)
+    ]
+
+@app.get("/metrics")
+def get_metrics():
+    # Prometheus scrape target; see metrics.py for what is recorded
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 @app.post("/trigger")
 def trigger():
     return JSONResponse(content={"message": "Backend function triggered!"})
 
 @app.post("/api/upload/curriculum")
-async def upload_curriculum(file: UploadFile = File(...)):
-    print(f"Received file: {file.filename}")
-    pdf_bytes = await file.read()
+async def upload_curriculum(
+    request: Request,
+    file: UploadFile = File(...),
+    background: bool = False,
+    teacher_id: Optional[str] = Query(None, alias="teacherId"),
+):
+    limited = rate_limited(request, teacher_id)
+    if limited is not None:
+        return limited
+    # Starlette has already spooled the part to a temporary file (kept in
+    # memory only up to 1MB). Hash it in fixed-size chunks, enforcing the
+    # size limit for bodies sent without a Content-Length, then parse the
+    # PDF straight from that file instead of a bytes copy.
+    sha256 = hashlib.sha256()
+    size = 0
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > MAX_UPLOAD_BYTES:
+            return JSONResponse(status_code=413, content={"error": "File too large"})
+        sha256.update(chunk)
+    await file.seek(0)
 
+    curriculum_agent = await built_off_loop(get_curriculum_agent)
+    if curriculum_agent is not None and background:
+        # Keep the upload past this request, then let a worker parse it
+        digest = sha256.hexdigest()
+        path = await asyncio.to_thread(save_upload, file.file, digest)
+        job_id = await asyncio.to_thread(
+            job_queue.enqueue,
+            "extract_curriculum",
+            {"path": path, "filename": file.filename, "digest": digest},
+        )
+        return JSONResponse(
+            status_code=202,
+            content={"success": True, "jobId": job_id, "status": jobs.QUEUED, "documentId": digest},
+        )
     if curriculum_agent is not None:
-        result = curriculum_agent.extract_curriculum(pdf_bytes=pdf_bytes, filename=file.filename)
-        return JSONResponse(content=result)
+        digest = sha256.hexdigest()
+        result = await curriculum_agent.aextract_curriculum(
+            pdf=file.file, filename=file.filename, digest=digest
+        )
+        # documentId lets later requests refer to the stored curriculum text
+        return JSONResponse(content={**result, "documentId": digest})
 
     # Fallback to previous mock behaviour if curriculum_agent isn't available
     return JSONResponse(
@@ -136,6 +420,50 @@ async def upload_curriculum(file: UploadFile = File(...)):
         }
     )
 
+# Page sizes for the keyset-paginated listing endpoints. Without ``limit``
+# or ``cursor`` they return every row oldest first, as before paging.
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+MAX_ROW_ID = 2 ** 63 - 1
+# Most quiz specs accepted by one batch generation request.
+MAX_BATCH_QUIZZES = 100
+# Most questions one quiz in a batch may ask for.
+MAX_BATCH_QUIZ_QUESTIONS = 50
+# How often job event streams re-read the job's status.
+JOB_EVENTS_POLL_SECONDS = 0.5
+
+
+def page_etag(
+    kind: str, owner_id: int, newest_id: Optional[int], cursor: Optional[int], limit: Optional[int]
+) -> str:
+    # Listings are append-only, so the newest row id identifies the
+    # contents of every page.
+    return f'W/"{kind}-{owner_id}-{newest_id or 0}-{cursor or 0}-{limit or "all"}"'
+
+
+def http_date(iso_timestamp: Optional[str]) -> Optional[str]:
+    if not iso_timestamp:
+        return None
+    try:
+        moment = datetime.fromisoformat(iso_timestamp).replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    return format_datetime(moment, usegmt=True)
+
+
+def not_modified(request: Request, etag: str, last_modified: Optional[str] = None) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            return parsedate_to_datetime(last_modified) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
 def generate_class_code():
     return f"JOIN-{random.randint(10000, 99999)}"
 
@@ -143,44 +471,40 @@ def generate_class_code():
 async def create_classroom(request: Request):
     data = await request.json()
     name = data.get("name")
-    code = data.get("code") or generate_class_code()
+    requested_code = data.get("code")
     subject = data.get("subject")
     pdf_filename = data.get("pdf_filename")
     teacher_id = data.get("teacherId")
-    # Insert into database
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO classroom (code, name, subject, pdf_filename, teacher_id) VALUES (?, ?, ?, ?, ?)",
-        (code, name, subject, pdf_filename, teacher_id)
+    # The pool may block waiting for a connection, so the database work
+    # runs in a worker thread rather than on the event loop
+    return await asyncio.to_thread(
+        insert_classroom, requested_code, name, subject, pdf_filename, teacher_id
     )
-    classroom_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return {"success": True, "classroomId": classroom_id, "classCode": code}
+
+def insert_classroom(requested_code, name, subject, pdf_filename, teacher_id) -> Dict:
+    # Class codes are unique, so retry generated codes on the (rare) collision
+    for _ in range(5):
+        code = requested_code or generate_class_code()
+        try:
+            with get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "INSERT INTO classroom (code, name, subject, pdf_filename, teacher_id) VALUES (?, ?, ?, ?, ?)",
+                    (code, name, subject, pdf_filename, teacher_id)
+                )
+                classroom_id = cursor.lastrowid
+            return {"success": True, "classroomId": classroom_id, "classCode": code}
+        except sqlite3.IntegrityError:
+            if requested_code:
+                break
+    return {"success": False, "error": "Class code already in use"}
 
 @app.get("/api/classrooms/{classroom_id}")
 def get_classroom(classroom_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT code, name, subject, pdf_filename, teacher_id FROM classroom WHERE id = ?",
-        (classroom_id,)
-    )
-    row = cursor.fetchone()
-    conn.close()
-    if row:
-        code, name, subject, pdf_filename, teacher_id = row
-        # For now, mock studentCount and activeQuizCount
-        return {
-            "classCode": code,
-            "className": name,
-            "subject": subject,
-            "pdf_filename": pdf_filename,
-            "teacherId": teacher_id,
-            "studentCount": 2,
-            "activeQuizCount": 0
-        }
+    with get_connection() as conn:
+        summary = crud.get_classroom_summary(conn, classroom_id)
+    if summary:
+        return summary
     return {"error": "Classroom not found"}
 
 @app.post("/api/classrooms/join")
@@ -189,32 +513,55 @@ async def join_classroom(data: dict = Body(...)):
     student_name = data.get("studentName")
     if not code or not student_name:
         return {"success": False, "error": "Missing code or student name"}
-    # Find classroom by code
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT id FROM classroom WHERE code = ?", (code,))
-    row = cursor.fetchone()
-    if not row:
-        conn.close()
-        return {"success": False, "error": "Classroom not found"}
-    classroom_id = row[0]
-    # Add student
-    cursor.execute(
-        "INSERT INTO students (name, classroom_id) VALUES (?, ?)",
-        (student_name, classroom_id)
-    )
-    conn.commit()
-    conn.close()
+    return await asyncio.to_thread(insert_student_by_code, code, student_name)
+
+def insert_student_by_code(code: str, student_name: str) -> Dict:
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        # Find classroom by code
+        cursor.execute("SELECT id FROM classroom WHERE code = ?", (code,))
+        row = cursor.fetchone()
+        if not row:
+            return {"success": False, "error": "Classroom not found"}
+        classroom_id = row[0]
+        # Add student (and bump the classroom's student count)
+        crud.insert_student(conn, student_name, classroom_id)
     return {"success": True, "classroomId": classroom_id}
 
 @app.get("/api/classrooms/{classroom_id}/assignments")
-def get_assignments(classroom_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id, title, subject, difficulty, due_date, questions FROM assignments WHERE classroom_id = ?",
-        (classroom_id,)
-    )
+def get_assignments(
+    classroom_id: int,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[int] = None,
+):
+    # With limit or cursor: newest first, paged by id; pass the returned
+    # nextCursor to get older ones. Without either: the whole list, oldest first.
+    paged = limit is not None or cursor is not None
+    if paged:
+        limit = limit or DEFAULT_PAGE_SIZE
+    with get_connection() as conn:
+        newest_id = conn.execute(
+            "SELECT MAX(id) FROM assignments WHERE classroom_id = ?", (classroom_id,)
+        ).fetchone()[0]
+        etag = page_etag("assignments", classroom_id, newest_id, cursor, limit)
+        if not_modified(request, etag):
+            return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+        if paged:
+            rows = conn.execute(
+                "SELECT id, title, subject, difficulty, due_date, questions FROM assignments "
+                "WHERE classroom_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                (classroom_id, cursor if cursor is not None else MAX_ROW_ID, limit + 1)
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT id, title, subject, difficulty, due_date, questions FROM assignments "
+                "WHERE classroom_id = ? ORDER BY id",
+                (classroom_id,)
+            ).fetchall()
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
     assignments = [
         {
             "id": row[0],
@@ -224,13 +571,37 @@ def get_assignments(classroom_id: int):
             "dueDate": row[4],
             "questions": row[5],
         }
-        for row in cursor.fetchall()
+        for row in (rows[:limit] if paged else rows)
     ]
-    conn.close()
-    return {"assignments": assignments}
+    next_cursor = rows[limit - 1][0] if paged and len(rows) > limit else None
+    return {"assignments": assignments, "nextCursor": next_cursor}
 
 @app.post("/api/classrooms/{classroom_id}/generate-quiz")
-async def generate_ai_quiz(classroom_id: int, data: dict = Body(...)):
+async def generate_ai_quiz(
+    classroom_id: int, request: Request, data: dict = Body(...), background: bool = False
+):
+    teacher_id = await asyncio.to_thread(get_classroom_teacher_id, classroom_id)
+    limited = rate_limited(request, teacher_id or data.get("teacherId"))
+    if limited is not None:
+        return limited
+    if background:
+        job_id = await asyncio.to_thread(
+            job_queue.enqueue, "generate_quiz", {"classroomId": classroom_id, "data": data}
+        )
+        return JSONResponse(status_code=202, content={"success": True, "jobId": job_id, "status": jobs.QUEUED})
+    await create_ai_quiz(classroom_id, data)
+    return {"success": True}
+
+def get_classroom_teacher_id(classroom_id: int) -> Optional[str]:
+    with get_connection() as conn:
+        row = conn.execute("SELECT teacher_id FROM classroom WHERE id = ?", (classroom_id,)).fetchone()
+    return row[0] if row else None
+
+def insert_assignment(classroom_id: int, *fields) -> int:
+    with get_connection() as conn:
+        return crud.insert_assignment(conn, classroom_id, *fields)
+
+async def create_ai_quiz(classroom_id: int, data: dict) -> int:
     title = data.get("title", "AI Generated Quiz")
     subject = data.get("subject", "Mathematics")
     difficulty = data.get("difficulty", "Medium")
@@ -239,164 +610,443 @@ async def generate_ai_quiz(classroom_id: int, data: dict = Body(...)):
     num_questions = len(preview_questions) if preview_questions else data.get("questions", 5)
 
     # Use QuizAgent to generate or normalize questions
+    quiz_agent = await built_off_loop(get_quiz_agent)
     if quiz_agent is not None:
-        questions = quiz_agent.generate_questions(
+        questions = await quiz_agent.agenerate_questions(
             title=title,
             subject=subject,
             difficulty=difficulty,
             num_questions=num_questions,
             preview_questions=preview_questions,
+            use_cache=not data.get("fresh", False),
+            context=None if preview_questions else await curriculum_context(
+                data, title, subject, classroom_id
+            ),
         )
     else:
         # Fallback to the previous mock behaviour
-        if preview_questions:
-            questions = preview_questions
-        else:
-            questions = [
-                {
-                    "question": f"Sample question {i+1} for {title}",
-                    "answer": f"Sample answer {i+1}",
-                    "options": [f"Option {chr(65+j)}" for j in range(4)],
-                }
-                for i in range(num_questions)
-            ]
-
-    # Insert assignment
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(
-        "INSERT INTO assignments (classroom_id, title, subject, difficulty, due_date, questions) VALUES (?, ?, ?, ?, ?, ?)",
-        (classroom_id, title, subject, difficulty, due_date, len(questions))
+        questions = preview_questions or mock_questions(title, num_questions)
+
+    # Insert the assignment and all of its questions in one transaction
+    return await asyncio.to_thread(
+        insert_assignment, classroom_id, title, subject, difficulty, due_date, questions
     )
-    assignment_id = cursor.lastrowid
-    # Store questions
-    for q in questions:
-        options = q.get("options") or []
-        if isinstance(options, list):
-            options_str = ",".join(options)
-        else:
-            options_str = str(options)
-        cursor.execute(
-            "INSERT INTO questions (assignment_id, question, answer, options) VALUES (?, ?, ?, ?)",
-            (assignment_id, q.get("question", ""), q.get("answer", ""), options_str)
+
+@app.post("/api/quizzes/batch")
+async def generate_quiz_batch(request: Request, data: dict = Body(...)):
+    """
+    Create many quizzes in one call. Body: ``{"quizzes": [spec, ...],
+    "fresh": false}`` where each spec takes the ``generate-quiz`` fields
+    plus ``classroomId``. Repeated specs create one assignment, and specs
+    with the same prompt share one LLM call. Specs are validated before
+    anything is generated, and every item gets its own status:
+    ``created``, ``duplicate`` (of the item ``duplicateOf``) or
+    ``failed`` with an ``error``. An item whose generation failed is not
+    saved, and each created quiz is saved on its own, so one bad item
+    never fails the rest.
+    """
+    specs = data.get("quizzes") or []
+    if not isinstance(specs, list) or not specs:
+        return {"success": False, "error": "No quizzes"}
+    if len(specs) > MAX_BATCH_QUIZZES:
+        return {"success": False, "error": f"At most {MAX_BATCH_QUIZZES} quizzes per batch"}
+
+    results: List[Dict] = [{"index": i} for i in range(len(specs))]
+    known = await asyncio.to_thread(
+        existing_classroom_ids, [spec.get("classroomId") for spec in specs if isinstance(spec, dict)]
+    )
+
+    pending: List[int] = []
+    first_seen: Dict[str, int] = {}
+    for i, spec in enumerate(specs):
+        error = batch_spec_error(spec, known)
+        if error is not None:
+            results[i].update(status="failed", error=error)
+            continue
+        fingerprint = json.dumps(spec, sort_keys=True)
+        if fingerprint in first_seen:
+            results[i].update(status="duplicate", duplicateOf=first_seen[fingerprint])
+            continue
+        first_seen[fingerprint] = i
+        pending.append(i)
+
+    # Charged per quiz actually generated (not per repeat or bad spec)
+    limited = rate_limited(request, data.get("teacherId"), cost=max(len(pending), 1))
+    if limited is not None:
+        return limited
+
+    generation = [
+        {
+            "title": specs[i].get("title", "AI Generated Quiz"),
+            "subject": specs[i].get("subject", "Mathematics"),
+            "difficulty": specs[i].get("difficulty", "Medium"),
+            "num_questions": len(specs[i]["previewQuestions"]) if specs[i].get("previewQuestions") else specs[i].get("questions", 5),
+            "preview_questions": specs[i].get("previewQuestions"),
+        }
+        for i in pending
+    ]
+    quiz_agent = await built_off_loop(get_quiz_agent)
+    if quiz_agent is not None:
+        contexts = await asyncio.gather(
+            *(
+                curriculum_context(specs[i], spec["title"], spec["subject"], specs[i]["classroomId"])
+                for i, spec in zip(pending, generation)
+            )
         )
-    conn.commit()
-    conn.close()
-    return {"success": True}
+        for spec, context in zip(generation, contexts):
+            spec["context"] = context
+        generated = await quiz_agent.agenerate_batch(
+            generation, use_cache=not data.get("fresh", False)
+        )
+    else:
+        generated = [
+            (spec["preview_questions"] or mock_questions(spec["title"], spec["num_questions"]), "mock")
+            for spec in generation
+        ]
+
+    saving: List[int] = []
+    rows: List[Tuple] = []
+    for i, spec, (questions, source) in zip(pending, generation, generated):
+        if source == "fallback":
+            # The LLM failed; placeholder questions aren't worth saving
+            results[i].update(status="failed", error="Question generation failed")
+            continue
+        saving.append(i)
+        rows.append((
+            specs[i]["classroomId"],
+            spec["title"],
+            spec["subject"],
+            spec["difficulty"],
+            specs[i].get("due_date", "Due Soon"),
+            questions,
+        ))
+    saved = await asyncio.to_thread(insert_assignments, rows)
+    sources = {i: source for i, (_questions, source) in zip(pending, generated)}
+    for i, row, (assignment_id, error) in zip(saving, rows, saved):
+        if error is not None:
+            results[i].update(status="failed", error=error)
+        else:
+            results[i].update(
+                status="created", assignmentId=assignment_id, source=sources[i], questions=len(row[-1])
+            )
+    for result in results:
+        if result.get("status") == "duplicate":
+            original = results[result["duplicateOf"]]
+            if original["status"] == "created":
+                result["assignmentId"] = original["assignmentId"]
+            else:
+                result.update(status="failed", error=original["error"])
+    created = sum(1 for result in results if result.get("status") == "created")
+    return {
+        "success": created > 0,
+        "created": created,
+        "failed": sum(1 for result in results if result.get("status") == "failed"),
+        "results": results,
+    }
+
+def batch_spec_error(spec, known_classrooms: Set[int]) -> Optional[str]:
+    """Why a batch quiz spec can't be generated, or None if it can."""
+    if not isinstance(spec, dict):
+        return "Quiz spec must be an object"
+    if spec.get("classroomId") not in known_classrooms:
+        return "Classroom not found"
+    for field in ("title", "subject", "difficulty", "due_date"):
+        if field in spec and not isinstance(spec[field], str):
+            return f"{field} must be a string"
+    preview = spec.get("previewQuestions")
+    if preview is not None:
+        if not isinstance(preview, list) or not all(isinstance(q, dict) for q in preview):
+            return "previewQuestions must be a list of questions"
+        return None
+    count = spec.get("questions", 5)
+    if isinstance(count, bool) or not isinstance(count, int) or not 1 <= count <= MAX_BATCH_QUIZ_QUESTIONS:
+        return f"questions must be a whole number from 1 to {MAX_BATCH_QUIZ_QUESTIONS}"
+    return None
+
+def existing_classroom_ids(classroom_ids: List) -> Set[int]:
+    with get_connection() as conn:
+        return {
+            row[0] for row in conn.execute(
+                "SELECT id FROM classroom WHERE id IN (SELECT value FROM json_each(?))",
+                (json.dumps(classroom_ids),),
+            )
+        }
+
+def insert_assignments(rows: List[Tuple]) -> List[Tuple[Optional[int], Optional[str]]]:
+    # Each quiz in its own transaction, so one that can't be saved doesn't
+    # take the others with it. Returns (assignment id, error) per row.
+    saved: List[Tuple[Optional[int], Optional[str]]] = []
+    for row in rows:
+        try:
+            with get_connection() as conn:
+                saved.append((crud.insert_assignment(conn, *row), None))
+        except sqlite3.Error as exc:
+            logger.warning("Saving batch quiz failed: %s", exc)
+            saved.append((None, "Could not save quiz"))
+    return saved
 
 @app.post("/api/generate-quiz-questions")
-async def generate_quiz_questions(data: dict = Body(...)):
-    pdf_filename = data.get("pdf_filename")
+async def generate_quiz_questions(request: Request, data: dict = Body(...)):
+    limited = rate_limited(request, data.get("teacherId"))
+    if limited is not None:
+        return limited
     title = data.get("title", "AI Generated Quiz")
     subject = data.get("subject", "Mathematics")
     difficulty = data.get("difficulty", "Medium")
     num_questions = data.get("questions", 3)
 
-    # Currently pdf_filename is not used; it can be
-    # wired into the QuizAgent once curriculum parsing is added.
+    quiz_agent = await built_off_loop(get_quiz_agent)
     if quiz_agent is not None:
-        questions = quiz_agent.generate_questions(
+        # Grounded in the curriculum named by documentId or pdf_filename
+        questions = await quiz_agent.agenerate_questions(
             title=title,
             subject=subject,
             difficulty=difficulty,
             num_questions=num_questions,
             preview_questions=None,
+            use_cache=not data.get("fresh", False),
+            context=await curriculum_context(data, title, subject),
         )
     else:
         # Fallback to previous mock behaviour
-        questions = [
-            {
-                "question": f"What is the main concept in {subject} covered in {title}?",
-                "options": ["Option A", "Option B", "Option C", "Option D"],
-                "answer": "Option A"
-            },
+        questions = preview_mock_questions(title, subject, difficulty)
+    return {"questions": questions}
+
+@app.post("/api/generate-quiz-questions/stream")
+async def stream_quiz_questions(request: Request, data: dict = Body(...)):
+    """
+    Server-Sent Events variant of ``generate-quiz-questions``: a
+    ``question`` event per question as soon as the LLM has written it,
+    then a ``done`` event with the count.
+    """
+    limited = rate_limited(request, data.get("teacherId"))
+    if limited is not None:
+        return limited
+    title = data.get("title", "AI Generated Quiz")
+    subject = data.get("subject", "Mathematics")
+    difficulty = data.get("difficulty", "Medium")
+    num_questions = data.get("questions", 3)
+
+    quiz_agent = await built_off_loop(get_quiz_agent)
+    if quiz_agent is not None:
+        questions = quiz_agent.astream_questions(
+            title=title,
+            subject=subject,
+            difficulty=difficulty,
+            num_questions=num_questions,
+            use_cache=not data.get("fresh", False),
+            context=await curriculum_context(data, title, subject),
+        )
+    else:
+        questions = iterate(preview_mock_questions(title, subject, difficulty))
+
+    async def events():
+        count = 0
+        async for question in questions:
+            count += 1
+            yield sse_event("question", question)
+        yield sse_event("done", {"count": count})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Live results: submissions are pushed to teachers' WebSockets instead of
+# being polled. Each channel starts with a snapshot, then sends one
+# "submission" event per new submission.
+live_results = live.LiveResults()
+
+def submission_events(
+    conn: sqlite3.Connection, assignment_id: int, submissions: List[Tuple[int, int, int, int]]
+) -> List[Tuple[str, Dict]]:
+    """
+    ``(topic, event)`` pairs announcing ``(submission_id, student_id,
+    score, total)`` rows, read inside the submitting transaction and
+    published once it has committed. Nothing is read when nobody listens.
+    """
+    if not live_results.has_subscribers():
+        return []
+    classroom_id = crud.get_assignment_classroom_id(conn, assignment_id)
+    names = dict(conn.execute(
+        "SELECT id, name FROM students WHERE id IN (SELECT value FROM json_each(?))",
+        (json.dumps([student_id for _, student_id, _, _ in submissions]),),
+    ).fetchall())
+    topics = [live.assignment_topic(assignment_id)]
+    if classroom_id is not None:
+        topics.append(live.classroom_topic(classroom_id))
+    return [
+        (
+            topic,
             {
-                "question": "Solve for x: 2x + 3 = 7.",
-                "options": ["x=1", "x=2", "x=3", "x=4"],
-                "answer": "x=2"
+                "type": "submission",
+                "assignmentId": assignment_id,
+                "studentId": student_id,
+                "name": names.get(student_id),
+                "submissionId": submission_id,
+                "score": score,
+                "total": total,
             },
-            {
-                "question": f"Which of the following best describes {difficulty} level content?",
-                "options": ["Easy", "Medium", "Hard", "Expert"],
-                "answer": difficulty
-            }
-        ]
-    return {"questions": questions}
+        )
+        for submission_id, student_id, score, total in submissions
+        for topic in topics
+    ]
+
+def publish_submission_events(events: List[Tuple[str, Dict]]) -> None:
+    for topic, event in events:
+        live_results.publish(topic, event)
+
+def read_live_snapshot(load: Callable[[sqlite3.Connection], Optional[Dict]]) -> Optional[Dict]:
+    with get_connection() as conn:
+        return load(conn)
+
+async def stream_live_results(
+    websocket: WebSocket, topic: str, load: Callable[[sqlite3.Connection], Optional[Dict]]
+) -> None:
+    """
+    Serve one live-results channel: a snapshot from ``load`` (None closes
+    the socket with code 4404), then the events published to ``topic``
+    that the snapshot doesn't already include. A subscriber that fell too
+    far behind is sent a fresh snapshot instead of the events it missed.
+    """
+    await websocket.accept()
+    # Subscribed before the snapshot is read, so no event falls in between
+    with live_results.subscribe(topic) as subscription:
+        snapshot = await asyncio.to_thread(read_live_snapshot, load)
+        if snapshot is None:
+            await websocket.close(code=4404)
+            return
+
+        async def send_events(snapshot: Dict) -> None:
+            while True:
+                await websocket.send_text(json.dumps({"type": "snapshot", **snapshot}))
+                covered = snapshot["lastSubmissionId"]
+                while not subscription.overflowed:
+                    event, message = await subscription.queue.get()
+                    if event["submissionId"] > covered:
+                        await websocket.send_text(message)
+                subscription.reset()
+                snapshot = await asyncio.to_thread(read_live_snapshot, load) or snapshot
+
+        sender = asyncio.create_task(send_events(snapshot))
+        try:
+            # Clients only listen; reading is how a disconnect is noticed
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+        finally:
+            sender.cancel()
+            await asyncio.gather(sender, return_exceptions=True)
+
+@app.websocket("/ws/assignments/{assignment_id}/results")
+async def assignment_results_socket(websocket: WebSocket, assignment_id: int):
+    def load(conn: sqlite3.Connection) -> Optional[Dict]:
+        if crud.get_assignment_classroom_id(conn, assignment_id) is None:
+            return None
+        return crud.get_assignment_results(conn, assignment_id)
+
+    await stream_live_results(websocket, live.assignment_topic(assignment_id), load)
+
+@app.websocket("/ws/classrooms/{classroom_id}/results")
+async def classroom_results_socket(websocket: WebSocket, classroom_id: int):
+    await stream_live_results(
+        websocket,
+        live.classroom_topic(classroom_id),
+        lambda conn: crud.get_classroom_results(conn, classroom_id),
+    )
 
 @app.get("/api/assignments/{assignment_id}/questions")
 def get_assignment_questions(assignment_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id, question, answer, options FROM questions WHERE assignment_id = ?",
-        (assignment_id,)
-    )
-    questions = []
-    for row in cursor.fetchall():
-        qid, question, answer, options = row
-        options_list = options.split(",") if options else []
-        print(options_list)
-        questions.append({
-            "id": qid,
-            "question": question,
-            "answer": answer,
-            "options": options_list
-        })
-    conn.close()
-    return {"questions": questions}
+    # Hottest read during a live quiz: SQLite assembles the JSON body, so
+    # no per-row Python work or re-serialization is needed
+    with get_connection() as conn:
+        questions_json = crud.get_questions_json(conn, assignment_id)
+    return Response(content=f'{{"questions":{questions_json}}}', media_type="application/json")
 
 @app.post("/api/quiz-submissions")
 async def submit_quiz(data: dict = Body(...)):
     assignment_id = data.get("assignmentId")
     student_id = data.get("studentId")
     answers = data.get("answers", {})  # {questionIdx: answer}
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    # Get questions for assignment
-    cursor.execute("SELECT id, answer FROM questions WHERE assignment_id = ?", (assignment_id,))
-    question_rows = cursor.fetchall()
-    total = len(question_rows)
-    score = 0
-    # Insert submission with status 'completed' (instead of 'pending')
-    submitted_at = datetime.utcnow().isoformat()
-    cursor.execute(
-        "INSERT INTO submissions (assignment_id, student_id, submitted_at, score, total, status) VALUES (?, ?, ?, ?, ?, ?)",
-        (assignment_id, student_id, submitted_at, 0, total, 'completed')
+    # Database work in a worker thread (the pool may block); events are
+    # published back on the event loop, which owns the subscriber queues
+    submission_id, events = await asyncio.to_thread(
+        record_submission, assignment_id, student_id, answers
     )
-    submission_id = cursor.lastrowid
-    # Grade and insert answers
-    for idx, (question_id, correct_answer) in enumerate(question_rows):
-        student_answer = answers.get(str(idx), "")
-        is_correct = int(student_answer.strip().lower() == (correct_answer or "").strip().lower())
-        if is_correct:
-            score += 1
-        cursor.execute(
-            "INSERT INTO submission_answers (submission_id, question_id, student_answer, is_correct) VALUES (?, ?, ?, ?)",
-            (submission_id, question_id, student_answer, is_correct)
-        )
-    # Update score
-    cursor.execute("UPDATE submissions SET score = ? WHERE id = ?", (score, submission_id))
-    conn.commit()
-    conn.close()
+    publish_submission_events(events)
     return {"submissionId": submission_id}
 
+def record_submission(assignment_id, student_id, answers) -> Tuple[int, List[Tuple[str, Dict]]]:
+    with get_connection() as conn:
+        # Grade in memory, then write the submission (status 'completed',
+        # final score) and all of its answers in one transaction
+        answer_key = crud.get_answer_key(conn, assignment_id)
+        score, graded = crud.grade_answers(answer_key, answers)
+        submission_id = crud.insert_submission(conn, assignment_id, student_id, score, graded)
+        events = submission_events(conn, assignment_id, [(submission_id, student_id, score, len(graded))])
+    return submission_id, events
+
+@app.post("/api/assignments/{assignment_id}/submissions/bulk")
+async def submit_quiz_bulk(assignment_id: int, data: dict = Body(...)):
+    # {"submissions": [{"studentId": ..., "answers": {questionIdx: answer}}, ...]}
+    submissions = data.get("submissions") or []
+    if not isinstance(submissions, list) or not submissions:
+        return {"success": False, "error": "No submissions"}
+    recorded = await asyncio.to_thread(record_submissions, assignment_id, submissions)
+    if recorded is None:
+        return {"success": False, "error": "Assignment not found"}
+    graded, submission_ids, events = recorded
+    publish_submission_events(events)
+    return {
+        "success": True,
+        "results": [
+            {"studentId": student_id, "submissionId": submission_id, "score": score, "total": len(rows)}
+            for (student_id, score, rows), submission_id in zip(graded, submission_ids)
+        ],
+    }
+
+def record_submissions(assignment_id: int, submissions: List[Dict]) -> Optional[Tuple]:
+    """``(graded, submission_ids, events)``, or None if the assignment doesn't exist."""
+    with get_connection() as conn:
+        answer_key = crud.get_answer_key(conn, assignment_id)
+        if not answer_key and conn.execute(
+            "SELECT 1 FROM assignments WHERE id = ?", (assignment_id,)
+        ).fetchone() is None:
+            return None
+        # Grade every sheet against the one key, then write them all in
+        # this transaction
+        graded = []
+        for sub in submissions:
+            score, rows = crud.grade_answers(answer_key, sub.get("answers") or {})
+            graded.append((sub.get("studentId"), score, rows))
+        submission_ids = crud.insert_submissions(conn, assignment_id, graded)
+        events = submission_events(
+            conn,
+            assignment_id,
+            [
+                (submission_id, student_id, score, len(rows))
+                for (student_id, score, rows), submission_id in zip(graded, submission_ids)
+            ],
+        )
+    return graded, submission_ids, events
+
 @app.get("/api/quiz-submissions/{submission_id}")
 def get_quiz_submission(submission_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute("SELECT assignment_id, student_id, score, total, status FROM submissions WHERE id = ?", (submission_id,))
-    sub = cursor.fetchone()
-    if not sub:
-        conn.close()
-        return {"error": "Submission not found"}
-    assignment_id, student_id, score, total, status = sub
-    cursor.execute("""
-        SELECT q.id, q.question, sa.student_answer, q.answer, sa.is_correct
-        FROM submission_answers sa
-        JOIN questions q ON sa.question_id = q.id
-        WHERE sa.submission_id = ?
-        ORDER BY q.id
-    """, (submission_id,))
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT assignment_id, student_id, score, total, status FROM submissions WHERE id = ?", (submission_id,))
+        sub = cursor.fetchone()
+        if not sub:
+            return {"error": "Submission not found"}
+        assignment_id, student_id, score, total, status = sub
+        cursor.execute("""
+            SELECT q.id, q.question, sa.student_answer, q.answer, sa.is_correct
+            FROM submission_answers sa
+            JOIN questions q ON sa.question_id = q.id
+            WHERE sa.submission_id = ?
+            ORDER BY q.id
+        """, (submission_id,))
+        rows = cursor.fetchall()
     questions = [
         {
             "id": row[0],
@@ -406,19 +1056,68 @@ def get_quiz_submission(submission_id: int):
             "isCorrect": bool(row[4]),
             # Optionally add explanation if you want
         }
-        for row in cursor.fetchall()
+        for row in rows
     ]
-    conn.close()
     return {"score": score, "total": total, "status": status, "questions": questions}
 
+@app.get("/api/assignments/{assignment_id}/analytics")
+def get_assignment_analytics(assignment_id: int):
+    with get_connection() as conn:
+        result = analytics.assignment_analytics(conn, assignment_id)
+    if result is None:
+        return {"error": "Assignment not found"}
+    return result
+
+@app.get("/api/classrooms/{classroom_id}/analytics")
+def get_classroom_analytics(classroom_id: int):
+    with get_connection() as conn:
+        result = analytics.classroom_analytics(conn, classroom_id)
+    if result is None:
+        return {"error": "Classroom not found"}
+    return result
+
 @app.get("/api/students/{student_id}/submissions")
-def get_student_submissions(student_id: int):
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT id, assignment_id, score, total, submitted_at, status FROM submissions WHERE student_id = ?",
-        (student_id,)
-    )
+def get_student_submissions(
+    student_id: int,
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[int] = None,
+):
+    # With limit or cursor: newest first, paged by id; pass the returned
+    # nextCursor to get older ones. Without either: the whole list, oldest first.
+    paged = limit is not None or cursor is not None
+    if paged:
+        limit = limit or DEFAULT_PAGE_SIZE
+    with get_connection() as conn:
+        newest = conn.execute(
+            "SELECT id, submitted_at FROM submissions WHERE student_id = ? ORDER BY id DESC LIMIT 1",
+            (student_id,)
+        ).fetchone()
+        newest_id, newest_at = newest if newest else (None, None)
+        etag = page_etag("submissions", student_id, newest_id, cursor, limit)
+        last_modified = http_date(newest_at)
+        if not_modified(request, etag, last_modified):
+            headers = {"ETag": etag, "Cache-Control": "no-cache"}
+            if last_modified:
+                headers["Last-Modified"] = last_modified
+            return Response(status_code=304, headers=headers)
+        if paged:
+            rows = conn.execute(
+                "SELECT id, assignment_id, score, total, submitted_at, status FROM submissions "
+                "WHERE student_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                (student_id, cursor if cursor is not None else MAX_ROW_ID, limit + 1)
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                "SELECT id, assignment_id, score, total, submitted_at, status FROM submissions "
+                "WHERE student_id = ? ORDER BY id",
+                (student_id,)
+            ).fetchall()
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    if last_modified:
+        response.headers["Last-Modified"] = last_modified
     submissions = [
         {
             "submissionId": row[0],
@@ -428,7 +1127,75 @@ def get_student_submissions(student_id: int):
             "submittedAt": row[4],
             "status": row[5],
         }
-        for row in cursor.fetchall()
+        for row in (rows[:limit] if paged else rows)
     ]
-    conn.close()
-    return {"submissions": submissions}
+    next_cursor = rows[limit - 1][0] if paged and len(rows) > limit else None
+    return {"submissions": submissions, "nextCursor": next_cursor}
+
+# Background jobs: handlers for each kind of queued work, and the queue.
+async def run_generate_quiz_job(payload: dict) -> dict:
+    assignment_id = await create_ai_quiz(payload["classroomId"], payload["data"])
+    return {"assignmentId": assignment_id}
+
+async def run_extract_curriculum_job(payload: dict) -> dict:
+    curriculum_agent = await built_off_loop(get_curriculum_agent)
+    if curriculum_agent is None:
+        raise RuntimeError("Curriculum agent unavailable")
+    with open(payload["path"], "rb") as pdf:
+        result = await curriculum_agent.aextract_curriculum(
+            pdf=pdf, filename=payload["filename"], digest=payload["digest"]
+        )
+    return {**result, "documentId": payload["digest"]}
+
+job_queue = jobs.JobQueue(
+    get_connection,
+    {
+        "generate_quiz": run_generate_quiz_job,
+        "extract_curriculum": run_extract_curriculum_job,
+    },
+    # The saved PDF is needed until the job's last attempt
+    finalizers={"extract_curriculum": remove_upload},
+)
+
+@app.get("/api/jobs/metrics")
+def get_job_metrics():
+    return job_queue.metrics()
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: int):
+    job = job_queue.get(job_id)
+    if job is None:
+        return {"error": "Job not found"}
+    return job
+
+@app.post("/api/jobs/{job_id}/cancel")
+def cancel_job(job_id: int):
+    if job_queue.cancel(job_id):
+        return {"success": True}
+    return {"success": False, "error": "Job not found or already finished"}
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: int):
+    """
+    Server-Sent Events: a ``status`` event whenever the job's status
+    changes, ending once the job has finished.
+    """
+    async def events():
+        last = None
+        while True:
+            job = await asyncio.to_thread(job_queue.get, job_id)
+            if job is None:
+                yield sse_event("error", {"error": "Job not found"})
+                return
+            if (job["status"], job["attempts"]) != last:
+                last = (job["status"], job["attempts"])
+                yield sse_event("status", job)
+            if job["status"] in jobs.FINISHED:
+                return
+            await asyncio.sleep(JOB_EVENTS_POLL_SECONDS)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,38 @@
+"""
+Maintenance jobs for the backend database.
+
+Run from the backend directory:
+
+    python maintenance.py repair-counters [classroom_id]
+"""
+import sys
+from typing import List
+
+try:
+    from .db import get_connection  # type: ignore
+    from . import crud, migrations  # type: ignore
+except ImportError:
+    from db import get_connection  # type: ignore
+    import crud  # type: ignore
+    import migrations  # type: ignore
+
+
+def repair_counters(classroom_id=None) -> int:
+    """Recompute classroom summary counters from the underlying rows."""
+    with get_connection() as conn:
+        migrations.migrate(conn)
+        return crud.recompute_classroom_counters(conn, classroom_id)
+
+
+def main(argv: List[str]) -> int:
+    if not argv or argv[0] != "repair-counters":
+        print(__doc__.strip())
+        return 2
+    classroom_id = int(argv[1]) if len(argv) > 1 else None
+    updated = repair_counters(classroom_id)
+    print(f"Recomputed counters for {updated} classroom(s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,466 @@
+"""
+Versioned schema migrations.
+
+The applied version is stored in SQLite's ``PRAGMA user_version``. Each
+migration runs in its own transaction together with the version bump, so
+a failed migration leaves the database at the previous version. Add new
+migrations to the end of ``MIGRATIONS``; never edit one that has shipped.
+
+Run from the backend directory:
+
+    python migrations.py                 # apply pending migrations
+    python migrations.py --check-plans   # verify hot queries use indexes
+"""
+import json
+import sqlite3
+import sys
+from typing import Callable, List, Set, Tuple
+
+
+def _columns(conn: sqlite3.Connection, table: str) -> Set[str]:
+    return {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def _create_base_tables(conn: sqlite3.Connection) -> None:
+    # IF NOT EXISTS: databases created before versioning already have these.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS classroom (
+            id INTEGER PRIMARY KEY,
+            code TEXT,
+            name TEXT,
+            subject TEXT,
+            pdf_filename TEXT,
+            teacher_id TEXT
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS students (
+            id INTEGER PRIMARY KEY,
+            name TEXT,
+            classroom_id INTEGER,
+            FOREIGN KEY(classroom_id) REFERENCES classroom(id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS assignments (
+            id INTEGER PRIMARY KEY,
+            classroom_id INTEGER,
+            title TEXT,
+            subject TEXT,
+            difficulty TEXT,
+            due_date TEXT,
+            questions INTEGER,
+            FOREIGN KEY(classroom_id) REFERENCES classroom(id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS questions (
+            id INTEGER PRIMARY KEY,
+            assignment_id INTEGER,
+            question TEXT,
+            answer TEXT,
+            options TEXT,
+            FOREIGN KEY(assignment_id) REFERENCES assignments(id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS submissions (
+            id INTEGER PRIMARY KEY,
+            assignment_id INTEGER,
+            student_id INTEGER,
+            submitted_at TEXT,
+            score INTEGER,
+            total INTEGER,
+            status TEXT DEFAULT 'pending',
+            FOREIGN KEY(assignment_id) REFERENCES assignments(id),
+            FOREIGN KEY(student_id) REFERENCES students(id)
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS submission_answers (
+            id INTEGER PRIMARY KEY,
+            submission_id INTEGER,
+            question_id INTEGER,
+            student_answer TEXT,
+            is_correct INTEGER,
+            FOREIGN KEY(submission_id) REFERENCES submissions(id),
+            FOREIGN KEY(question_id) REFERENCES questions(id)
+        )
+    ''')
+
+
+def _add_submission_status(conn: sqlite3.Connection) -> None:
+    if "status" not in _columns(conn, "submissions"):
+        conn.execute("ALTER TABLE submissions ADD COLUMN status TEXT DEFAULT 'pending'")
+
+
+def _add_lookup_indexes(conn: sqlite3.Connection) -> None:
+    # Class codes must be unique before the unique index can exist: keep
+    # the oldest classroom's code and suffix later duplicates with their id.
+    conn.execute('''
+        UPDATE classroom SET code = code || '-' || id
+        WHERE code IS NOT NULL AND id NOT IN (
+            SELECT MIN(id) FROM classroom WHERE code IS NOT NULL GROUP BY code
+        )
+    ''')
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_classroom_code ON classroom(code)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_assignments_classroom_id ON assignments(classroom_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_questions_assignment_id ON questions(assignment_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_submissions_student_id ON submissions(student_id)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_submission_answers_submission_id "
+        "ON submission_answers(submission_id)"
+    )
+
+
+def _options_to_json(conn: sqlite3.Connection) -> None:
+    # questions.options held comma-joined strings; store JSON arrays so
+    # options containing commas survive and reads need no splitting.
+    rows = conn.execute("SELECT id, options FROM questions").fetchall()
+    conn.executemany(
+        "UPDATE questions SET options = ? WHERE id = ?",
+        [
+            (json.dumps(options.split(",") if options else []), question_id)
+            for question_id, options in rows
+        ],
+    )
+
+
+def _add_classroom_counters(conn: sqlite3.Connection) -> None:
+    existing = _columns(conn, "classroom")
+    for column in (
+        "student_count", "assignment_count", "submission_count",
+        "completed_count", "score_sum", "total_sum",
+    ):
+        if column not in existing:
+            conn.execute(f"ALTER TABLE classroom ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_students_classroom_id ON students(classroom_id)")
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_submissions_assignment_student "
+        "ON submissions(assignment_id, student_id)"
+    )
+    # Backfill from the tables as they are at this version. Kept here
+    # rather than calling crud.recompute_classroom_counters, so later
+    # changes to app code can't change what this migration does.
+    conn.execute('''
+        UPDATE classroom SET
+            student_count = (SELECT COUNT(*) FROM students s WHERE s.classroom_id = classroom.id),
+            assignment_count = (SELECT COUNT(*) FROM assignments a WHERE a.classroom_id = classroom.id),
+            submission_count = (
+                SELECT COUNT(*) FROM submissions sub
+                JOIN assignments a ON sub.assignment_id = a.id
+                WHERE a.classroom_id = classroom.id
+            ),
+            completed_count = (
+                SELECT COUNT(DISTINCT sub.assignment_id || ':' || sub.student_id) FROM submissions sub
+                JOIN assignments a ON sub.assignment_id = a.id
+                WHERE a.classroom_id = classroom.id
+            ),
+            score_sum = (
+                SELECT COALESCE(SUM(sub.score), 0) FROM submissions sub
+                JOIN assignments a ON sub.assignment_id = a.id
+                WHERE a.classroom_id = classroom.id
+            ),
+            total_sum = (
+                SELECT COALESCE(SUM(sub.total), 0) FROM submissions sub
+                JOIN assignments a ON sub.assignment_id = a.id
+                WHERE a.classroom_id = classroom.id
+            )
+    ''')
+
+
+def _add_answer_analytics_index(conn: sqlite3.Connection) -> None:
+    # Covers the per-question aggregations in analytics.py.
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_submission_answers_question "
+        "ON submission_answers(question_id, is_correct, student_answer)"
+    )
+
+
+def _create_jobs_table(conn: sqlite3.Connection) -> None:
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS jobs (
+            id INTEGER PRIMARY KEY,
+            kind TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            max_attempts INTEGER NOT NULL,
+            result TEXT,
+            error TEXT,
+            run_at REAL NOT NULL,
+            lease_expires REAL,
+            created_at REAL NOT NULL,
+            started_at REAL,
+            finished_at REAL
+        )
+    ''')
+    # Workers look for claimable jobs by status on every poll
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, id)")
+
+
+def _create_question_bank(conn: sqlite3.Connection) -> None:
+    # Full-text index over stored questions for agents/question_bank.py.
+    # Contentless: the text stays in questions, the index holds only the
+    # posting lists. Placeholder questions from the no-LLM fallback are
+    # never indexed, so they can't be reused.
+    conn.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS question_bank USING fts5(question, content='')"
+    )
+    conn.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS question_bank_vocab "
+        "USING fts5vocab(question_bank, 'row')"
+    )
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS questions_question_bank_insert
+        AFTER INSERT ON questions
+        WHEN NEW.question NOT LIKE 'Sample question % for %'
+        BEGIN
+            INSERT INTO question_bank (rowid, question) VALUES (NEW.id, NEW.question);
+        END
+    ''')
+    conn.execute('''
+        INSERT INTO question_bank (rowid, question)
+        SELECT id, question FROM questions
+        WHERE question NOT LIKE 'Sample question % for %'
+    ''')
+
+
+def _create_cache_table(conn: sqlite3.Connection, table: str) -> None:
+    # Key/value table used by agents/cache.py GenerationCache
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            created_at REAL NOT NULL
+        )
+    ''')
+    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_created_at ON {table}(created_at)")
+
+
+def _create_curriculum_tables(conn: sqlite3.Connection) -> None:
+    # IF NOT EXISTS: these used to be created lazily by the agents, so
+    # existing databases may already have them.
+    _create_cache_table(conn, "generation_cache")
+    # agents/documents.py CurriculumStore
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS curriculum_documents (
+            digest TEXT PRIMARY KEY,
+            filename TEXT,
+            text TEXT NOT NULL,
+            curriculum TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+    ''')
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_curriculum_documents_filename "
+        "ON curriculum_documents(filename, updated_at)"
+    )
+    # agents/passages.py PassageIndex, with its FTS5 index kept in sync
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS curriculum_passages (
+            id INTEGER PRIMARY KEY,
+            digest TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            text TEXT NOT NULL,
+            tokens INTEGER NOT NULL
+        )
+    ''')
+    conn.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_curriculum_passages_digest "
+        "ON curriculum_passages(digest, position)"
+    )
+    conn.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS curriculum_passages_fts "
+        "USING fts5(text, content='curriculum_passages', content_rowid='id')"
+    )
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS curriculum_passages_fts_insert
+        AFTER INSERT ON curriculum_passages
+        BEGIN
+            INSERT INTO curriculum_passages_fts (rowid, text) VALUES (NEW.id, NEW.text);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS curriculum_passages_fts_delete
+        AFTER DELETE ON curriculum_passages
+        BEGIN
+            INSERT INTO curriculum_passages_fts (curriculum_passages_fts, rowid, text)
+            VALUES ('delete', OLD.id, OLD.text);
+        END
+    ''')
+
+
+def _create_section_cache(conn: sqlite3.Connection) -> None:
+    # Per-section curriculum summaries, keyed by section hash
+    _create_cache_table(conn, "curriculum_section_cache")
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[sqlite3.Connection], None]]] = [
+    (1, "create base tables", _create_base_tables),
+    (2, "add submissions.status", _add_submission_status),
+    (3, "add lookup indexes and unique class codes", _add_lookup_indexes),
+    (4, "store question options as JSON arrays", _options_to_json),
+    (5, "add classroom summary counters", _add_classroom_counters),
+    (6, "index answers by question for analytics", _add_answer_analytics_index),
+    (7, "create background jobs table", _create_jobs_table),
+    (8, "index questions for reuse and duplicate checks", _create_question_bank),
+    (9, "create generation cache and curriculum tables", _create_curriculum_tables),
+    (10, "create curriculum section summary cache", _create_section_cache),
+]
+
+# Queries on request hot paths; each must be answered through an index.
+HOT_QUERIES: List[Tuple[str, tuple]] = [
+    ("SELECT id FROM classroom WHERE code = ?", ("JOIN-12345",)),
+    ("SELECT MAX(id) FROM assignments WHERE classroom_id = ?", (1,)),
+    (
+        "SELECT (SELECT MAX(id) FROM submissions WHERE assignment_id = a.id) "
+        "FROM assignments a WHERE a.id = ?",
+        (1,),
+    ),
+    (
+        "SELECT id, title, subject, difficulty, due_date, questions FROM assignments "
+        "WHERE classroom_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+        (1, 100, 51),
+    ),
+    (
+        "SELECT id, title, subject, difficulty, due_date, questions FROM assignments "
+        "WHERE classroom_id = ? ORDER BY id",
+        (1,),
+    ),
+    (
+        "SELECT id, question, answer, options FROM questions WHERE assignment_id = ? ORDER BY id",
+        (1,),
+    ),
+    ("SELECT id, answer FROM questions WHERE assignment_id = ? ORDER BY id", (1,)),
+    (
+        "SELECT DISTINCT student_id FROM submissions "
+        "WHERE assignment_id = ? AND student_id IN (SELECT value FROM json_each(?))",
+        (1, "[1, 2]"),
+    ),
+    (
+        "SELECT id, submitted_at FROM submissions WHERE student_id = ? ORDER BY id DESC LIMIT 1",
+        (1,),
+    ),
+    (
+        "SELECT id, assignment_id, score, total, submitted_at, status FROM submissions "
+        "WHERE student_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+        (1, 100, 51),
+    ),
+    (
+        "SELECT id, assignment_id, score, total, submitted_at, status FROM submissions "
+        "WHERE student_id = ? ORDER BY id",
+        (1,),
+    ),
+    (
+        """
+        SELECT q.id, q.question, sa.student_answer, q.answer, sa.is_correct
+        FROM submission_answers sa
+        JOIN questions q ON sa.question_id = q.id
+        WHERE sa.submission_id = ?
+        ORDER BY q.id
+        """,
+        (1,),
+    ),
+    (
+        """
+        SELECT s.id, s.student_id, st.name, s.score, s.total
+        FROM submissions s
+        LEFT JOIN students st ON st.id = s.student_id
+        WHERE s.id IN (
+            SELECT MAX(id) FROM submissions WHERE assignment_id = ? GROUP BY student_id
+        )
+        ORDER BY s.id
+        """,
+        (1,),
+    ),
+    (
+        """
+        SELECT assignment_id, student_id, MAX(id)
+        FROM submissions
+        WHERE assignment_id IN (SELECT id FROM assignments WHERE classroom_id = ?)
+        GROUP BY assignment_id, student_id
+        """,
+        (1,),
+    ),
+    (
+        "SELECT id FROM jobs WHERE (status = ? AND run_at <= ?) "
+        "OR (status = ? AND lease_expires < ? AND attempts < max_attempts) ORDER BY id LIMIT 1",
+        ("queued", 0.0, "running", 0.0),
+    ),
+    (
+        "SELECT id FROM jobs "
+        "WHERE status = ? AND lease_expires < ? AND attempts >= max_attempts",
+        ("running", 0.0),
+    ),
+]
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Apply every pending migration in order; returns the final version."""
+    version = current_version(conn)
+    for target, _name, apply in MIGRATIONS:
+        if target <= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated while we waited for the lock.
+            if current_version(conn) >= target:
+                conn.rollback()
+                version = current_version(conn)
+                continue
+            apply(conn)
+            conn.execute(f"PRAGMA user_version = {target}")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        version = target
+    return version
+
+
+def unindexed_queries(conn: sqlite3.Connection) -> List[Tuple[str, List[str]]]:
+    """
+    Run EXPLAIN QUERY PLAN over ``HOT_QUERIES`` and return the queries
+    whose plan contains a full table scan, with the offending plan lines.
+    Scans of virtual tables (``json_each`` over a bound parameter) are
+    bounded by the parameter and don't count.
+    """
+    failures = []
+    for sql, params in HOT_QUERIES:
+        plan = [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+        scans = [
+            line for line in plan
+            if line.startswith("SCAN") and "USING" not in line and "VIRTUAL TABLE" not in line
+        ]
+        if scans:
+            failures.append((" ".join(sql.split()), scans))
+    return failures
+
+
+def main(argv: List[str]) -> int:
+    try:
+        from .db import get_connection  # type: ignore
+    except ImportError:
+        from db import get_connection  # type: ignore
+
+    with get_connection() as conn:
+        version = migrate(conn)
+        print(f"Schema at version {version}")
+        if "--check-plans" in argv:
+            failures = unindexed_queries(conn)
+            for sql, scans in failures:
+                print(f"FULL SCAN: {sql}\n    {'; '.join(scans)}")
+            if failures:
+                return 1
+            print(f"All {len(HOT_QUERIES)} hot queries use indexes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,68 @@
+"""
+Per-teacher and per-client token-bucket rate limiting for AI generation
+endpoints.
+
+Each key (a teacher id, a client address) gets a bucket of ``burst``
+tokens refilled at ``rate_per_minute``. A request is charged to every key
+it names at once and refused, with the seconds until it would fit, when
+any of those buckets is short. A request costing more than ``burst`` (a
+large batch) is let in once a bucket is full and charged in full, leaving
+the bucket in debt until it refills. Buckets live in this process only,
+so with N server processes a teacher can spend up to N times the limit.
+"""
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+GENERATION_RATE_PER_MINUTE = float(os.getenv("GENERATION_RATE_PER_MINUTE", "30"))
+GENERATION_BURST = float(os.getenv("GENERATION_BURST", "10"))
+# Buckets kept before idle (full) ones are dropped.
+MAX_BUCKETS = 10_000
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        rate_per_minute: float = GENERATION_RATE_PER_MINUTE,
+        burst: float = GENERATION_BURST,
+        max_buckets: int = MAX_BUCKETS,
+    ) -> None:
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.max_buckets = max_buckets
+        # key -> (tokens, monotonic time of that count)
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, *keys: str, cost: float = 1.0) -> Optional[float]:
+        """
+        Take ``cost`` tokens from the bucket of every key in ``keys``.
+        Returns None when allowed, otherwise the seconds to wait before
+        retrying; nothing is charged then. A cost above ``burst`` needs a
+        full bucket and then drives it below zero, so large batches pay
+        for every generation instead of being refused forever.
+        """
+        needed = min(cost, self.burst)
+        now = time.monotonic()
+        with self._lock:
+            levels: Dict[str, float] = {}
+            for key in keys:
+                tokens, updated = self._buckets.get(key, (self.burst, now))
+                levels[key] = min(self.burst, tokens + (now - updated) * self.rate)
+            short = max((needed - tokens for tokens in levels.values()), default=0.0)
+            if short > 0:
+                for key, tokens in levels.items():
+                    self._buckets[key] = (tokens, now)
+                return short / self.rate if self.rate > 0 else float("inf")
+            for key, tokens in levels.items():
+                self._buckets[key] = (tokens - cost, now)
+            if len(self._buckets) > self.max_buckets:
+                self._prune(now)
+        return None
+
+    def _prune(self, now: float) -> None:
+        # Buckets that have refilled completely carry no state
+        for key, (tokens, updated) in list(self._buckets.items()):
+            if tokens + (now - updated) * self.rate >= self.burst:
+                del self._buckets[key]
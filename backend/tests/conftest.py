@@ -0,0 +1,31 @@
+import os
+import sqlite3
+import sys
+from contextlib import contextmanager
+
+import pytest
+
+# Tests import backend modules the way the app does: from the backend directory
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import migrations  # noqa: E402
+
+
+@pytest.fixture
+def connection_factory(tmp_path):
+    """Connection factory over a freshly migrated database, like ``db.get_connection``."""
+    path = str(tmp_path / "test.db")
+    conn = sqlite3.connect(path)
+    migrations.migrate(conn)
+    conn.close()
+
+    @contextmanager
+    def connect():
+        conn = sqlite3.connect(path)
+        try:
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    return connect
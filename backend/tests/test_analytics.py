@@ -0,0 +1,48 @@
+import pytest
+
+import analytics
+import crud
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    monkeypatch.setattr(analytics, "_cache", analytics.AnalyticsCache())
+
+
+def submit(connection_factory, assignment_id, student_id):
+    with connection_factory() as conn:
+        (question_id,) = conn.execute(
+            "SELECT id FROM questions WHERE assignment_id = ?", (assignment_id,)
+        ).fetchone()
+        crud.insert_submission(conn, assignment_id, student_id, 1, [(question_id, "4", 1)])
+
+
+def assignment_submissions(connection_factory, assignment_id):
+    with connection_factory() as conn:
+        return analytics.assignment_analytics(conn, assignment_id)["scores"]["submissions"]
+
+
+@pytest.mark.parametrize("classroom_exists", [True, False])
+def test_assignment_analytics_follow_new_submissions(connection_factory, classroom_exists):
+    with connection_factory() as conn:
+        classroom_id = 1 if classroom_exists else 999
+        conn.execute("INSERT INTO classroom (id, name) VALUES (1, 'A')")
+        assignment_id = crud.insert_assignment(
+            conn, classroom_id, "Sums", "Math", "Easy", "soon",
+            [{"question": "2 + 2?", "answer": "4", "options": []}],
+        )
+    assert assignment_submissions(connection_factory, assignment_id) == 0
+    submit(connection_factory, assignment_id, 1)
+    assert assignment_submissions(connection_factory, assignment_id) == 1
+    submit(connection_factory, assignment_id, 2)
+    assert assignment_submissions(connection_factory, assignment_id) == 2
+
+
+def test_classroom_analytics_include_new_assignments(connection_factory):
+    with connection_factory() as conn:
+        conn.execute("INSERT INTO classroom (id, name) VALUES (1, 'A')")
+        crud.insert_assignment(conn, 1, "One", "Math", "Easy", "soon", [{"question": "a?", "answer": "a"}])
+        assert len(analytics.classroom_analytics(conn, 1)["questions"]) == 1
+        crud.insert_assignment(conn, 1, "Two", "Math", "Easy", "soon", [{"question": "b?", "answer": "b"}])
+        assert len(analytics.classroom_analytics(conn, 1)["questions"]) == 2
+        assert analytics.classroom_analytics(conn, 2) is None
@@ -0,0 +1,312 @@
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+import jobs
+from jobs import JobQueue
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(jobs, "RETRY_BASE_SECONDS", 0.01)
+
+
+async def ok(payload):
+    return {"echo": payload["n"]}
+
+
+async def slow(payload):
+    await asyncio.sleep(30)
+
+
+def make_queue(connection_factory, finalized, **handlers):
+    handlers = handlers or {"ok": ok}
+    return JobQueue(
+        connection_factory,
+        handlers,
+        workers=1,
+        max_attempts=2,
+        poll_interval=0.01,
+        finalizers={kind: finalized.append for kind in handlers},
+    )
+
+
+async def wait_for(queue, job_id, *statuses, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in statuses:
+            return job
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"job {job_id} still {queue.get(job_id)['status']}")
+
+
+def insert_running(connection_factory, payload, attempts, max_attempts, lease_expires):
+    with connection_factory() as conn:
+        return conn.execute(
+            "INSERT INTO jobs (kind, payload, status, attempts, max_attempts, run_at, "
+            "created_at, lease_expires) VALUES ('ok', ?, 'running', ?, ?, 0, 0, ?)",
+            (json.dumps(payload), attempts, max_attempts, lease_expires),
+        ).lastrowid
+
+
+def test_claim_holds_a_lease(connection_factory):
+    queue = make_queue(connection_factory, [])
+    job_id = queue.enqueue("ok", {"n": 1})
+
+    claimed = queue._claim()
+    assert claimed[0] == job_id and claimed[3] == 1
+    with connection_factory() as conn:
+        status, lease = conn.execute(
+            "SELECT status, lease_expires FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+    assert status == jobs.RUNNING
+    assert lease > time.time() + queue.lease_seconds - 5
+    # Held under its lease, so no other worker can take it
+    assert queue._claim() is None
+
+
+def test_job_runs_and_is_finalized(connection_factory):
+    finalized = []
+
+    async def scenario():
+        queue = make_queue(connection_factory, finalized)
+        queue.start()
+        job_id = queue.enqueue("ok", {"n": 7})
+        job = await wait_for(queue, job_id, jobs.SUCCEEDED)
+        await queue.stop()
+        return job
+
+    job = asyncio.run(scenario())
+    assert job["result"] == {"echo": 7}
+    assert job["attempts"] == 1
+    assert finalized == [{"n": 7}]
+
+
+def test_expired_lease_is_claimed_again_while_attempts_remain(connection_factory):
+    finalized = []
+    queue = make_queue(connection_factory, finalized)
+    job_id = insert_running(connection_factory, {"n": 1}, attempts=1, max_attempts=2, lease_expires=1)
+
+    claimed = queue._claim()
+    assert claimed[0] == job_id and claimed[3] == 2
+    assert finalized == []
+
+
+def test_expired_lease_on_last_attempt_fails_the_job(connection_factory):
+    finalized = []
+    queue = make_queue(connection_factory, finalized)
+    job_id = insert_running(connection_factory, {"n": 1}, attempts=2, max_attempts=2, lease_expires=1)
+
+    assert queue._claim() is None
+    job = queue.get(job_id)
+    assert job["status"] == jobs.FAILED
+    assert job["attempts"] == 2
+    assert "Lease expired" in job["error"]
+    assert finalized == [{"n": 1}]
+
+
+def test_unexpired_lease_is_left_alone(connection_factory):
+    finalized = []
+    queue = make_queue(connection_factory, finalized)
+    job_id = insert_running(
+        connection_factory, {"n": 1}, attempts=2, max_attempts=2, lease_expires=time.time() + 60
+    )
+
+    assert queue._claim() is None
+    assert queue.get(job_id)["status"] == jobs.RUNNING
+    assert finalized == []
+
+
+def test_failure_is_retried_with_backoff_then_fails(connection_factory):
+    finalized = []
+    calls = []
+
+    async def flaky(payload):
+        calls.append(time.monotonic())
+        raise RuntimeError("boom")
+
+    async def scenario():
+        queue = make_queue(connection_factory, finalized, flaky=flaky)
+        queue.start()
+        job_id = queue.enqueue("flaky", {"n": 1}, max_attempts=3)
+        job = await wait_for(queue, job_id, jobs.FAILED)
+        await queue.stop()
+        return job
+
+    job = asyncio.run(scenario())
+    assert len(calls) == 3
+    assert job["attempts"] == 3
+    assert job["error"] == "RuntimeError: boom"
+    # Delays of 0.01 then 0.02 seconds before the retries
+    assert calls[1] - calls[0] >= 0.01
+    assert calls[2] - calls[1] >= 0.02
+    # Finalized once, after the last attempt
+    assert finalized == [{"n": 1}]
+
+
+def test_retry_is_scheduled_after_the_backoff(connection_factory, monkeypatch):
+    monkeypatch.setattr(jobs, "RETRY_BASE_SECONDS", 60.0)
+    finalized = []
+
+    async def failing(payload):
+        raise RuntimeError("boom")
+
+    async def scenario():
+        queue = make_queue(connection_factory, finalized, failing=failing)
+        queue.start()
+        job_id = queue.enqueue("failing", {"n": 1})
+        job = await wait_for(queue, job_id, jobs.QUEUED)
+        while job["attempts"] == 0 or job["error"] is None:
+            await asyncio.sleep(0.01)
+            job = queue.get(job_id)
+        await queue.stop()
+        return job_id, job
+
+    job_id, job = asyncio.run(scenario())
+    assert job["status"] == jobs.QUEUED and job["attempts"] == 1
+    with connection_factory() as conn:
+        run_at = conn.execute("SELECT run_at FROM jobs WHERE id = ?", (job_id,)).fetchone()[0]
+    assert run_at > time.time() + 55
+    assert finalized == []
+
+
+def test_cancel_running_job(connection_factory):
+    finalized = []
+
+    async def scenario():
+        queue = make_queue(connection_factory, finalized, slow=slow)
+        queue.start()
+        job_id = queue.enqueue("slow", {"n": 1})
+        await wait_for(queue, job_id, jobs.RUNNING)
+        while job_id not in queue._running:
+            await asyncio.sleep(0.01)
+        assert queue.cancel(job_id)
+        while queue._running:
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return queue.get(job_id)
+
+    job = asyncio.run(scenario())
+    assert job["status"] == jobs.CANCELLED
+    assert finalized == [{"n": 1}]
+
+
+def test_cancel_queued_job(connection_factory):
+    finalized = []
+    queue = make_queue(connection_factory, finalized)
+    job_id = queue.enqueue("ok", {"n": 1})
+
+    assert queue.cancel(job_id)
+    assert queue.get(job_id)["status"] == jobs.CANCELLED
+    assert finalized == [{"n": 1}]
+    # Finished jobs can't be cancelled again
+    assert not queue.cancel(job_id)
+    assert finalized == [{"n": 1}]
+    assert queue._claim() is None
+
+
+def test_cancelled_job_finishing_elsewhere_keeps_its_status(connection_factory):
+    finalized = []
+    queue = make_queue(connection_factory, finalized)
+    job_id = queue.enqueue("ok", {"n": 1})
+    queue._claim()
+    # Cancelled by another process while this one runs it
+    with connection_factory() as conn:
+        conn.execute("UPDATE jobs SET status = 'cancelled' WHERE id = ?", (job_id,))
+
+    assert not queue._finish(job_id, "status = ?", (jobs.SUCCEEDED,))
+    assert queue.get(job_id)["status"] == jobs.CANCELLED
+
+
+def test_stop_requeues_running_job_without_using_an_attempt(connection_factory):
+    async def scenario():
+        queue = make_queue(connection_factory, [], slow=slow)
+        queue.start()
+        job_id = queue.enqueue("slow", {"n": 1})
+        await wait_for(queue, job_id, jobs.RUNNING)
+        while job_id not in queue._running:
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return queue.get(job_id)
+
+    job = asyncio.run(scenario())
+    assert job["status"] == jobs.QUEUED
+    assert job["attempts"] == 0
+
+
+def test_stop_while_recording_the_outcome_still_finalizes(connection_factory):
+    finalized = []
+    recording = threading.Event()
+
+    async def scenario():
+        queue = make_queue(connection_factory, finalized)
+        finish = queue._finish
+
+        def slow_finish(*args):
+            recording.set()
+            time.sleep(0.1)
+            return finish(*args)
+
+        queue._finish = slow_finish
+        queue.start()
+        job_id = queue.enqueue("ok", {"n": 1})
+        while not recording.is_set():
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        return queue, job_id
+
+    # asyncio.run waits for the worker thread still recording the outcome
+    queue, job_id = asyncio.run(scenario())
+    assert queue.get(job_id)["status"] == jobs.SUCCEEDED
+    assert finalized == [{"n": 1}]
+
+
+def test_upload_is_removed_once_the_job_is_done(connection_factory, tmp_path):
+    def remove_upload(payload):
+        # As main.remove_upload does for extract_curriculum jobs
+        (tmp_path / payload["file"]).unlink()
+
+    async def extract(payload):
+        return (tmp_path / payload["file"]).read_text()
+
+    async def failing(payload):
+        assert (tmp_path / payload["file"]).exists()
+        raise RuntimeError("bad pdf")
+
+    handlers = {"extract": extract, "failing": failing, "slow": slow}
+    for name in ("done.pdf", "failed.pdf", "cancelled.pdf"):
+        (tmp_path / name).write_text(name)
+
+    async def scenario():
+        queue = JobQueue(
+            connection_factory, handlers, workers=1, max_attempts=2, poll_interval=0.01,
+            finalizers={kind: remove_upload for kind in handlers},
+        )
+        queue.start()
+        done = queue.enqueue("extract", {"file": "done.pdf"})
+        failed = queue.enqueue("failing", {"file": "failed.pdf"})
+        cancelled = queue.enqueue("slow", {"file": "cancelled.pdf"})
+        assert queue.cancel(cancelled)
+        await wait_for(queue, done, jobs.SUCCEEDED)
+        await wait_for(queue, failed, jobs.FAILED)
+        await queue.stop()
+        return queue.get(done)
+
+    job = asyncio.run(scenario())
+    assert job["result"] == "done.pdf"
+    assert list(tmp_path.glob("*.pdf")) == []
+
+
+def test_failing_finalizer_is_logged_not_raised(connection_factory, caplog):
+    def broken(payload):
+        raise OSError("disk gone")
+
+    queue = JobQueue(connection_factory, {"ok": ok}, finalizers={"ok": broken})
+    job_id = queue.enqueue("ok", {"n": 1})
+
+    assert queue.cancel(job_id)
+    assert "Finalizer for ok job failed" in caplog.text
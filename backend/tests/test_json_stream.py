@@ -0,0 +1,76 @@
+import json
+
+import pytest
+
+from agents.json_stream import JsonArrayStream
+
+QUESTIONS = [
+    {"question": 'Say "hi" [politely]', "answer": "a\\b", "options": ["[x]", "{y}"]},
+    {"question": "Unit [1], part {2}", "answer": "é", "options": []},
+]
+
+
+def parse(text, size):
+    parser = JsonArrayStream()
+    elements = []
+    for start in range(0, len(text), size):
+        elements.extend(parser.feed(text[start:start + size]))
+    return elements, parser.closed
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 1000])
+def test_chunk_boundaries_inside_strings_and_escapes(size):
+    # Chunks of 1-5 characters split every string, escape and \uXXXX sequence
+    text = json.dumps(QUESTIONS, ensure_ascii=True)
+    assert parse(text, size) == (QUESTIONS, True)
+
+
+def test_elements_are_returned_as_they_complete():
+    parser = JsonArrayStream()
+    text = json.dumps(QUESTIONS)
+    split = text.index("}, {") + 2
+    assert parser.feed(text[:split]) == QUESTIONS[:1]
+    assert parser.feed(text[split:]) == QUESTIONS[1:]
+    assert parser.closed
+
+
+@pytest.mark.parametrize("size", [1, 4, 1000])
+def test_wrapper_object_skips_brackets_in_earlier_values(size):
+    text = json.dumps({"quiz": "Unit [1]", "meta": {"tags": "[a]"}, "questions": QUESTIONS, "n": [9]})
+    assert parse(text, size) == (QUESTIONS, True)
+
+
+def test_wrapper_object_without_array_closes_empty():
+    assert parse('{"quiz": "Unit [1]"} [1, 2]', 3) == ([], True)
+
+
+@pytest.mark.parametrize("size", [1, 4, 1000])
+def test_prose_before_the_array(size):
+    text = 'Here are [5] questions, as "requested [sic]":\n```json\n' + json.dumps(QUESTIONS) + "\n```"
+    assert parse(text, size) == (QUESTIONS, True)
+
+
+def test_bare_array_of_scalars():
+    assert parse(' [1, "two", true, null]', 2) == ([1, "two", True, None], True)
+
+
+def test_truncated_output_keeps_complete_elements():
+    text = json.dumps(QUESTIONS)
+    cut = text.index('"answer": "\\u00e9"')
+    elements, closed = parse(text[:cut], 3)
+    assert elements == QUESTIONS[:1]
+    assert not closed
+
+
+def test_truncated_before_the_array():
+    assert parse('{"quiz": "Unit [1', 2) == ([], False)
+
+
+def test_malformed_element_is_skipped():
+    assert parse('[{"a": 1}, {"b": oops}, {"c": 3}]', 4) == ([{"a": 1}, {"c": 3}], True)
+
+
+def test_feed_after_close_returns_nothing():
+    parser = JsonArrayStream()
+    assert parser.feed("[1]") == [1]
+    assert parser.feed("[2]") == []
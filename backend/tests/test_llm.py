@@ -0,0 +1,280 @@
+import asyncio
+import time
+
+import pytest
+
+from agents import llm
+from agents.llm import CircuitBreaker, CircuitOpenError, LLMGateway
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Only for synchronous tests: the event loop reads time.monotonic too
+    clock = Clock()
+    monkeypatch.setattr(llm.time, "monotonic", clock)
+    monkeypatch.setattr(llm.time, "sleep", clock.sleep)
+    return clock
+
+
+class Message:
+    def __init__(self, content):
+        self.content = content
+
+
+class ServerError(Exception):
+    status_code = 503
+
+
+class BadRequest(Exception):
+    status_code = 400
+
+
+class StubModel:
+    """Raises the scripted errors in turn, then answers "ok"."""
+
+    def __init__(self, *errors, clock=None, seconds=0.0):
+        self.errors = list(errors)
+        self.calls = 0
+        self.clock = clock
+        self.seconds = seconds
+
+    def invoke(self, prompt):
+        self.calls += 1
+        if self.clock is not None:
+            self.clock.now += self.seconds
+        if self.errors:
+            raise self.errors.pop(0)
+        return Message("ok")
+
+
+class AsyncStubModel(StubModel):
+    async def ainvoke(self, prompt):
+        self.calls += 1
+        await asyncio.sleep(self.seconds)
+        if self.errors:
+            raise self.errors.pop(0)
+        return Message("ok")
+
+
+def gateway(breaker=None, max_retries=2):
+    return LLMGateway(
+        max_retries=max_retries,
+        retry_base=0.001,
+        retry_max=0.001,
+        breaker=breaker or CircuitBreaker(failure_threshold=100, reset_seconds=30),
+    )
+
+
+# -- circuit breaker -------------------------------------------------------
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+    assert breaker.rejecting()
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    clock.now += 29.9
+    assert breaker.state == "open" and not breaker.allow()
+
+    clock.now += 0.1
+    assert breaker.state == "half_open"
+    assert not breaker.rejecting()
+    assert breaker.allow()
+    # The probe is in flight: everyone else is still refused
+    assert breaker.rejecting()
+    assert not breaker.allow()
+
+
+def test_probe_success_closes_the_circuit(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow() and breaker.allow()
+
+
+def test_probe_failure_opens_the_circuit_again(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30)
+    for _ in range(3):
+        breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+
+    # One failed probe is enough, below the threshold
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock.now += 29
+    assert not breaker.allow()
+    clock.now += 1
+    assert breaker.allow()
+
+
+def test_released_probe_can_be_claimed_again(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    clock.now += 30
+    assert breaker.allow()
+
+    breaker.release()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+
+
+def test_failures_while_open_do_not_extend_it(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    clock.now += 20
+    # A call that started before the circuit opened fails late
+    breaker.record_failure()
+    clock.now += 10
+    assert breaker.state == "half_open"
+
+
+# -- gateway ---------------------------------------------------------------
+
+def test_transient_failures_are_retried(clock):
+    model = StubModel(ServerError("down"), ConnectionError("reset"))
+    assert gateway().invoke(model, "hi") == "ok"
+    assert model.calls == 3
+    assert len(clock.sleeps) == 2
+
+
+def test_retries_stop_at_max_retries(clock):
+    model = StubModel(*(ServerError("down") for _ in range(5)))
+    with pytest.raises(ServerError):
+        gateway(max_retries=2).invoke(model, "hi")
+    assert model.calls == 3
+
+
+def test_bad_request_is_not_retried_and_keeps_the_circuit_closed(clock):
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    model = StubModel(BadRequest("no"))
+    with pytest.raises(BadRequest):
+        gateway(breaker).invoke(model, "hi")
+    assert model.calls == 1
+    assert breaker.state == "closed"
+
+
+def test_deadline_covers_the_retries(clock):
+    # Each attempt takes 10 seconds: the second one ends past the deadline
+    model = StubModel(*(ServerError("down") for _ in range(5)), clock=clock, seconds=10)
+    with pytest.raises(ServerError):
+        gateway(max_retries=5).invoke(model, "hi", timeout=15)
+    assert model.calls == 2
+
+
+def test_no_attempt_is_made_past_the_deadline(clock):
+    model = StubModel()
+    with pytest.raises(asyncio.TimeoutError):
+        gateway().invoke(model, "hi", timeout=0)
+    assert model.calls == 0
+
+
+def test_open_circuit_fails_fast_until_the_probe(clock):
+    breaker = CircuitBreaker(failure_threshold=3, reset_seconds=30)
+    gw = gateway(breaker, max_retries=0)
+    failing = StubModel(*(ServerError("down") for _ in range(3)))
+    for _ in range(3):
+        with pytest.raises(ServerError):
+            gw.invoke(failing, "hi")
+    assert breaker.state == "open"
+
+    model = StubModel()
+    with pytest.raises(CircuitOpenError):
+        gw.invoke(model, "hi")
+    assert model.calls == 0
+
+    clock.now += 30
+    assert gw.invoke(model, "hi") == "ok"
+    assert model.calls == 1
+    assert breaker.state == "closed"
+
+
+def test_retries_that_open_the_circuit_stop_at_once(clock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=30)
+    model = StubModel(*(ServerError("down") for _ in range(5)))
+    with pytest.raises(CircuitOpenError):
+        gateway(breaker, max_retries=5).invoke(model, "hi")
+    assert model.calls == 2
+
+
+def test_async_deadline_interrupts_a_slow_attempt():
+    model = AsyncStubModel(seconds=5)
+    start = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(gateway().ainvoke(model, "hi", timeout=0.05))
+    assert time.monotonic() - start < 1
+    assert model.calls == 1
+
+
+def test_async_transient_failures_are_retried():
+    breaker = CircuitBreaker(failure_threshold=100, reset_seconds=30)
+    model = AsyncStubModel(ServerError("down"), ServerError("down"))
+    assert asyncio.run(gateway(breaker).ainvoke(model, "hi", timeout=5)) == "ok"
+    assert model.calls == 3
+    assert breaker.state == "closed"
+
+
+def test_async_open_circuit_fails_fast():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=30)
+    breaker.record_failure()
+    model = AsyncStubModel()
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(gateway(breaker).ainvoke(model, "hi"))
+    assert model.calls == 0
+
+
+def test_cancelled_probe_is_released():
+    breaker = CircuitBreaker(failure_threshold=1, reset_seconds=0.2)
+    breaker.record_failure()
+    model = AsyncStubModel(seconds=5)
+
+    async def scenario():
+        await asyncio.sleep(0.2)
+        call = asyncio.ensure_future(gateway(breaker).ainvoke(model, "hi"))
+        await asyncio.sleep(0.05)
+        assert breaker.rejecting()
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+
+    asyncio.run(scenario())
+    assert model.calls == 1
+    # Neither closed nor reopened: the next call may probe
+    assert breaker.state == "half_open"
+    assert breaker.allow()
@@ -0,0 +1,47 @@
+import sqlite3
+
+import migrations
+
+
+def test_fresh_database_hot_queries_use_indexes(tmp_path):
+    conn = sqlite3.connect(tmp_path / "test.db")
+    try:
+        assert migrations.migrate(conn) == migrations.MIGRATIONS[-1][0]
+        assert migrations.unindexed_queries(conn) == []
+    finally:
+        conn.close()
+
+
+def test_migrate_is_idempotent(tmp_path):
+    conn = sqlite3.connect(tmp_path / "test.db")
+    try:
+        version = migrations.migrate(conn)
+        assert migrations.migrate(conn) == version
+        assert migrations.current_version(conn) == version
+    finally:
+        conn.close()
+
+
+def test_classroom_counters_are_backfilled(tmp_path):
+    conn = sqlite3.connect(tmp_path / "test.db")
+    try:
+        for version, _name, apply in migrations.MIGRATIONS[:4]:
+            apply(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+        conn.execute("INSERT INTO classroom (id, name) VALUES (1, 'A'), (2, 'B')")
+        conn.execute("INSERT INTO students (id, name, classroom_id) VALUES (1, 's', 1), (2, 't', 1)")
+        conn.execute("INSERT INTO assignments (id, classroom_id, title) VALUES (1, 1, 'q')")
+        conn.execute(
+            "INSERT INTO submissions (assignment_id, student_id, score, total) "
+            "VALUES (1, 1, 2, 3), (1, 1, 3, 3), (1, 2, 1, 3)"
+        )
+        conn.commit()
+
+        migrations.migrate(conn)
+        rows = conn.execute(
+            "SELECT id, student_count, assignment_count, submission_count, completed_count, "
+            "score_sum, total_sum FROM classroom ORDER BY id"
+        ).fetchall()
+        assert rows == [(1, 2, 1, 3, 2, 6, 9), (2, 0, 0, 0, 0, 0, 0)]
+    finally:
+        conn.close()
@@ -0,0 +1,27 @@
+from agents.passages import PassageIndex
+
+
+def test_search_stays_within_the_document(connection_factory):
+    index = PassageIndex(connection_factory)
+    # Rowids of the two documents interleave
+    with connection_factory() as conn:
+        conn.executemany(
+            "INSERT INTO curriculum_passages (id, digest, position, text, tokens) VALUES (?, ?, ?, ?, 10)",
+            [
+                (1, "a", 0, "photosynthesis in plants"),
+                (2, "b", 0, "photosynthesis in algae"),
+                (3, "a", 1, "photosynthesis needs light"),
+            ],
+        )
+    assert index.search("a", "photosynthesis", token_budget=100) == [
+        "photosynthesis in plants",
+        "photosynthesis needs light",
+    ]
+    assert index.search("b", "photosynthesis", token_budget=100) == ["photosynthesis in algae"]
+
+
+def test_search_without_matches_spreads_over_the_document(connection_factory):
+    index = PassageIndex(connection_factory)
+    index.put("a", ["first part", "second part"])
+    assert index.search("a", "volcano", token_budget=100) == ["first part", "second part"]
+    assert index.search("missing", "volcano", token_budget=100) == []
@@ -0,0 +1,104 @@
+import asyncio
+import json
+
+from agents.cache import GenerationCache
+from agents.question_bank import QuestionBank, jaccard, tokens
+from agents.quiz import QuizAgent
+
+PLANTS = "What gas do plants absorb during photosynthesis?"
+PLANTS_AGAIN = "What gas do the plants absorb during photosynthesis?"
+WATER = "At what temperature does water boil at sea level?"
+
+
+class Message:
+    def __init__(self, content):
+        self.content = content
+
+
+class ScriptedLLM:
+    """Answers each call with the next list of question texts."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.prompts = []
+
+    def _next(self, prompt):
+        self.prompts.append(prompt)
+        texts = self.responses[min(len(self.prompts), len(self.responses)) - 1]
+        return Message(json.dumps([{"question": text, "answer": "a", "options": []} for text in texts]))
+
+    def invoke(self, prompt):
+        return self._next(prompt)
+
+    async def ainvoke(self, prompt):
+        return self._next(prompt)
+
+    async def astream(self, prompt):
+        content = self._next(prompt).content
+        for start in range(0, len(content), 7):
+            yield Message(content[start:start + 7])
+
+
+def make_agent(connection_factory, llm):
+    agent = QuizAgent(
+        cache=GenerationCache(connection_factory),
+        bank=QuestionBank(connection_factory),
+    )
+    agent._llm = llm
+    return agent
+
+
+def assert_no_near_duplicates(questions):
+    texts = [tokens(question["question"]) for question in questions]
+    for i, words in enumerate(texts):
+        for other in texts[i + 1:]:
+            assert jaccard(words, other) < QuestionBank.duplicate_threshold
+
+
+def generate_all_ways(agent, num_questions):
+    async def stream():
+        return [q async for q in agent.astream_questions("Plants", "Biology", "Easy", num_questions)]
+
+    return {
+        "sync": agent.generate_questions("Plants", "Biology", "Easy", num_questions),
+        "async": asyncio.run(agent.agenerate_questions("Plants", "Biology", "Easy", num_questions)),
+        "stream": asyncio.run(stream()),
+    }
+
+
+def test_dropped_near_duplicate_is_not_added_back(connection_factory):
+    llm = ScriptedLLM([PLANTS, PLANTS_AGAIN])
+    agent = make_agent(connection_factory, llm)
+    for way, questions in generate_all_ways(agent, 2).items():
+        assert len(questions) == 2, way
+        assert_no_near_duplicates(questions)
+    key = agent._cache_key("Plants", "Biology", "Easy", 2)
+    # Still short after asking again: padded with fallbacks, never cached
+    assert agent._cache.get(key) is None
+
+
+def test_shortfall_is_requested_again(connection_factory):
+    llm = ScriptedLLM([PLANTS, PLANTS_AGAIN], [PLANTS, WATER])
+    agent = make_agent(connection_factory, llm)
+    questions = agent.generate_questions("Plants", "Biology", "Easy", 2)
+    assert [question["question"] for question in questions] == [PLANTS, WATER]
+    assert len(llm.prompts) == 2
+    assert PLANTS in llm.prompts[1]
+    assert agent._cache.get(agent._cache_key("Plants", "Biology", "Easy", 2)) == questions
+
+
+def test_stored_duplicate_refills_a_short_quiz(connection_factory):
+    with connection_factory() as conn:
+        conn.execute(
+            "INSERT INTO assignments (classroom_id, title, subject, difficulty, due_date, questions) "
+            "VALUES (1, 'Other', 'Chemistry', 'Hard', 'soon', 1)"
+        )
+        conn.execute(
+            "INSERT INTO questions (assignment_id, question, answer, options) VALUES (1, ?, 'b', '[]')",
+            (WATER,),
+        )
+    # WATER matches a stored question but nothing in this quiz, so it may
+    # make up the shortfall
+    agent = make_agent(connection_factory, ScriptedLLM([PLANTS, WATER]))
+    questions = agent.generate_questions("Plants", "Biology", "Easy", 2, use_cache=False)
+    assert [question["question"] for question in questions] == [PLANTS, WATER]
@@ -0,0 +1,47 @@
+import pytest
+
+import ratelimit
+from ratelimit import RateLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(ratelimit.time, "monotonic", clock)
+    return clock
+
+
+def test_refuses_when_empty_and_refills(clock):
+    limiter = RateLimiter(rate_per_minute=60, burst=2)
+    assert limiter.acquire("a") is None
+    assert limiter.acquire("a") is None
+    assert limiter.acquire("a") == pytest.approx(1.0)
+    clock.now += 1.0
+    assert limiter.acquire("a") is None
+
+
+def test_large_batch_is_charged_in_full(clock):
+    limiter = RateLimiter(rate_per_minute=60, burst=10)
+    assert limiter.acquire("a", cost=100) is None
+    # 90 tokens in debt: the next generation waits for 91 to refill
+    assert limiter.acquire("a") == pytest.approx(91.0)
+    clock.now += 91.0
+    assert limiter.acquire("a") is None
+
+
+def test_every_key_is_charged(clock):
+    limiter = RateLimiter(rate_per_minute=60, burst=2)
+    assert limiter.acquire("client:1", "teacher:x") is None
+    assert limiter.acquire("client:1", "teacher:y") is None
+    # A new teacher id doesn't get the same client a fresh bucket
+    assert limiter.acquire("client:1", "teacher:z") is not None
+    # A refused request charges nothing
+    assert limiter.acquire("client:2", "teacher:z") is None